@@ -0,0 +1,101 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from btree import BTree
+from latches import WouldBlock
+
+
+class AsyncBTree:
+    """Fachada asyncio para uma BTree (ou BPlusTree) aberta com concurrent=True.
+
+    A árvore, e com ela o buffer pool, é a mesma usada pelo código
+    síncrono. Buscas começam no próprio event loop, sem esperar por latches
+    nem ler do disco: se todo o caminho está no cache a resposta sai sem
+    trocar de thread. Quando falta algum nó, a busca continua em uma thread
+    do executor, e faltas simultâneas no mesmo nó compartilham uma única
+    leitura do pager (veja BufferPool.get). As escritas rodam em uma thread
+    própria, na ordem em que foram pedidas.
+    """
+
+    # Pares lidos por vez do gerador síncrono em range()
+    RANGE_BATCH = 256
+
+    def __init__(self, tree: BTree, executor=None):
+        if tree._latches is None:
+            raise ValueError(
+                'AsyncBTree exige uma árvore aberta com concurrent=True')
+        self.tree = tree
+        self.executor = executor  # Leituras (None = executor padrão do loop)
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    async def _run(self, executor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(func, *args, **kwargs))
+
+    async def _read(self, func, *args, **kwargs):
+        return await self._run(self.executor, func, *args, **kwargs)
+
+    async def _write(self, func, *args, **kwargs):
+        return await self._run(self._writer, func, *args, **kwargs)
+
+    async def _find(self, k):
+        """(nó, i, rid) ou None, tentando antes a busca só no cache."""
+        k = self.tree._encode(k)
+        try:
+            return self.tree._search_shared(k, blocking=False)
+        except WouldBlock:
+            return await self._read(self.tree._search_shared, k)
+
+    async def search(self, k):
+        """Busca a chave k; retorna (nó, i) ou None, como BTree.search."""
+        found = await self._find(k)
+        return found and found[:2]
+
+    async def get(self, k, default=None):
+        """Retorna o valor associado à chave k (default se a chave não existe)."""
+        found = await self._find(k)
+        if found is None:
+            return default
+        if not found[2]:
+            return None
+        # O valor é lido sob o latch da folha (veja BTree._search_shared)
+        return await self._read(self.tree.get, k, default)
+
+    async def search_many(self, keys):
+        return await self._read(self.tree.search_many, keys)
+
+    async def insert(self, k, value=None):
+        return await self._write(self.tree.insert, k, value)
+
+    async def insert_many(self, items, pairs=False):
+        return await self._write(self.tree.insert_many, items, pairs)
+
+    async def update(self, old_k, new_k=None, value=None):
+        return await self._write(self.tree.update, old_k, new_k, value)
+
+    async def delete(self, k):
+        return await self._write(self.tree.delete, k)
+
+    async def delete_many(self, keys):
+        return await self._write(self.tree.delete_many, keys)
+
+    async def range(self, lo=None, hi=None, reverse=False):
+        """Versão assíncrona de BPlusTree.range, lendo RANGE_BATCH pares por vez no executor."""
+        pairs = self.tree.range(lo, hi, reverse)
+        while True:
+            batch = await self._read(list, islice(pairs, self.RANGE_BATCH))
+            for pair in batch:
+                yield pair
+            if len(batch) < self.RANGE_BATCH:
+                return
+
+    async def flush(self):
+        await self._write(self.tree.flush)
+
+    async def close(self):
+        """Fecha a árvore depois das escritas pendentes e encerra a thread escritora."""
+        await self._write(self.tree.close)
+        self._writer.shutdown()
@@ -0,0 +1,306 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from array import array
+
+import psutil
+
+from bplustree import BPlusTree
+from btree import BTree
+from btree_node import BTreeNode
+from pager import FilePager
+from records import RecordHeap
+from wal import WriteAheadLog
+
+DISTRIBUTIONS = ('sequential', 'uniform', 'zipfian')
+PERCENTILES = (50, 99, 99.9)
+
+
+class Zipfian:
+    """Índices em [0, n) com distribuição de Zipf: o índice 0 é o mais sorteado.
+
+    É o gerador de Gray et al. usado pelo YCSB: depois de calcular zeta(n)
+    uma vez, cada sorteio custa O(1).
+    """
+
+    def __init__(self, n, theta=0.99, rng=random):
+        if n < 2:
+            raise ValueError('Zipfian exige n >= 2')
+        self.n = n
+        self.rng = rng
+        zeta2 = 1 + 0.5 ** theta
+        self.zetan = math.fsum(i ** -theta for i in range(1, n + 1))
+        self.alpha = 1 / (1 - theta)
+        self.eta = (1 - (2 / n) ** (1 - theta)) / (1 - zeta2 / self.zetan)
+        self.half = zeta2
+
+    def next(self):
+        u = self.rng.random()
+        uz = u * self.zetan
+        if uz < 1:
+            return 0
+        if uz < self.half:
+            return 1
+        return min(self.n - 1,
+                   int(self.n * (self.eta * u - self.eta + 1) ** self.alpha))
+
+
+def percentile(sorted_values, p):
+    """Percentil p (0 a 100) de uma sequência já ordenada, pelo posto mais próximo."""
+    if not sorted_values:
+        return 0
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[max(0, rank - 1)]
+
+
+def open_tree(args, directory, t):
+    cls = BPlusTree if args.tree == 'bplus' else BTree
+    page_size = args.page_size or FilePager.page_size_for(t)
+    return cls(t, pager=FilePager(os.path.join(directory, 'btree.db'),
+                                  page_size),
+               records=RecordHeap(os.path.join(directory, 'records.db')),
+               wal=WriteAheadLog(os.path.join(directory, 'btree.wal'))
+               if args.wal else None,
+               cache_size=args.cache_size)
+
+
+def load_order(n, distribution, rng):
+    """Ordem em que as chaves 0..n-1 são inseridas."""
+    order = array('q', range(n))
+    if distribution != 'sequential':
+        rng.shuffle(order)
+    return order
+
+
+def key_picker(order, distribution, rng):
+    """Função que sorteia a próxima chave acessada nas fases de leitura e escrita.
+
+    sequential percorre as chaves em ordem crescente, uniform sorteia
+    qualquer chave e zipfian concentra os acessos em poucas chaves quentes,
+    espalhadas pela árvore (as primeiras da ordem embaralhada de inserção).
+    """
+    n = len(order)
+    if distribution == 'sequential':
+        position = iter(range(1 << 62))
+        return lambda: next(position) % n
+    if distribution == 'uniform':
+        return lambda: rng.randrange(n)
+    zipf = Zipfian(n, rng=rng)
+    return lambda: order[zipf.next()]
+
+
+def run_phase(tree, name, ops, operation):
+    """Executa operation(i) ops vezes, medindo cada chamada, e torna o resultado durável."""
+    latencies = array('q', bytes(8 * ops))
+    gc.collect()
+    before = tree.io_stats()
+    clock = time.perf_counter_ns
+    start = clock()
+    for i in range(ops):
+        began = clock()
+        operation(i)
+        latencies[i] = clock() - began
+    elapsed = clock() - start
+    flush_start = clock()
+    tree.flush()
+    flush_ns = clock() - flush_start
+    after = tree.io_stats()
+
+    latencies = sorted(latencies)
+    result = {
+        'phase': name,
+        'ops': ops,
+        'seconds': elapsed / 1e9,
+        'ops_per_sec': ops / (elapsed / 1e9) if elapsed else 0.0,
+        'mean_us': sum(latencies) / ops / 1000 if ops else 0.0,
+        'flush_ms': flush_ns / 1e6,
+    }
+    for p in PERCENTILES:
+        result[f'p{p:g}_us'.replace('.', '')] = percentile(latencies, p) / 1000
+    result['max_us'] = latencies[-1] / 1000 if ops else 0.0
+    for counter in after:
+        result[counter] = after[counter] - before[counter]
+    return result
+
+
+def value_for(key, size):
+    return None if not size else format(key, 'x').zfill(size)[-size:]
+
+
+def run_case(args, n, t, distribution, seed):
+    """Carrega n chaves em uma árvore nova e mede as fases do caso."""
+    rng = random.Random(seed)
+    directory = tempfile.mkdtemp(prefix='bench-', dir=args.dir)
+    tree = open_tree(args, directory, t)
+    try:
+        order = load_order(n, distribution, rng)
+        size = args.value_size
+        ops = min(n, args.ops)
+        phases = [run_phase(tree, 'insert', n, lambda i: tree.insert(
+            order[i], value_for(order[i], size)))]
+
+        pick = key_picker(order, distribution, rng)
+        phases.append(run_phase(tree, 'search', ops,
+                                lambda i: tree.search(pick())))
+        for ratio in args.read_ratios:
+            def mixed(i, ratio=ratio):
+                k = pick()
+                if rng.random() < ratio:
+                    tree.get(k)
+                else:
+                    tree.update(k, value=value_for(k + i + 1, size) or k)
+            phases.append(run_phase(tree, f'mixed_r{int(ratio * 100)}', ops,
+                                    mixed))
+
+        # Chaves crescentes saem do início (fila); as demais em ordem aleatória
+        phases.append(run_phase(tree, 'delete', ops,
+                                lambda i: tree.delete(order[i])))
+
+        tree.close()
+        files = {name: os.path.getsize(os.path.join(directory, name))
+                 for name in sorted(os.listdir(directory))}
+    finally:
+        if not tree.pager.file.closed:
+            tree.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'tree': args.tree, 'wal': args.wal, 'n': n, 't': t,
+        'distribution': distribution, 'cache_size': args.cache_size,
+        'value_size': args.value_size, 'files': files,
+        'rss_bytes': psutil.Process(os.getpid()).memory_info().rss,
+        'phases': phases,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def case_id(case, phase):
+    return (case['tree'], case['wal'], case['n'], case['t'],
+            case['distribution'], phase['phase'])
+
+
+def compare(baseline_path, results, tolerance):
+    """Compara ops/s e p99 com um resultado anterior; retorna o nº de regressões."""
+    with open(baseline_path) as f:
+        baseline = {case_id(case, phase): phase
+                    for case in json.load(f)['cases']
+                    for phase in case['phases']}
+    regressions = 0
+    print(f"\n{'caso':<52} {'ops/s':>9} {'p99':>9}")
+    for case in results['cases']:
+        for phase in case['phases']:
+            old = baseline.get(case_id(case, phase))
+            if old is None:
+                continue
+            speed = phase['ops_per_sec'] / old['ops_per_sec'] \
+                if old['ops_per_sec'] else 1.0
+            p99 = phase['p99_us'] / old['p99_us'] if old['p99_us'] else 1.0
+            worse = speed < 1 - tolerance or p99 > 1 + tolerance
+            regressions += worse
+            label = '/'.join(str(part) for part in case_id(case, phase))
+            print(f"{label:<52} {speed:>8.2f}x {p99:>8.2f}x"
+                  f"{'  <- regressão' if worse else ''}")
+    return regressions
+
+
+def print_case(case):
+    print(f"\n{case['tree']} t={case['t']} n={case['n']} "
+          f"{case['distribution']}{' wal' if case['wal'] else ''}")
+    print(f"{'fase':<12} {'ops/s':>10} {'p50 µs':>9} {'p99 µs':>9} "
+          f"{'p99.9 µs':>9} {'lidas':>8} {'gravadas':>9} {'MB grav.':>9}")
+    for phase in case['phases']:
+        print(f"{phase['phase']:<12} {phase['ops_per_sec']:>10.0f} "
+              f"{phase['p50_us']:>9.1f} {phase['p99_us']:>9.1f} "
+              f"{phase['p999_us']:>9.1f} {phase['pages_read']:>8} "
+              f"{phase['pages_written']:>9} "
+              f"{phase['bytes_written'] / 1024 ** 2:>9.2f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark da árvore B: latências por operação, vazão e E/S.')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10 ** 3, 10 ** 4, 10 ** 5],
+                        help='nº de chaves de cada caso (até 10^7)')
+    parser.add_argument('--t', type=int, nargs='+', default=[8, 32, 100],
+                        dest='degrees', help='graus mínimos testados')
+    parser.add_argument('--distributions', nargs='+', choices=DISTRIBUTIONS,
+                        default=list(DISTRIBUTIONS))
+    parser.add_argument('--read-ratios', type=float, nargs='+',
+                        default=[0.95, 0.5],
+                        help='fração de leituras de cada fase mista')
+    parser.add_argument('--ops', type=int, default=100_000,
+                        help='operações por fase (limitadas a n)')
+    parser.add_argument('--page-size', type=int, default=None,
+                        help='tamanho das páginas em bytes (padrão: o menor '
+                             'que comporta um nó cheio de cada t)')
+    parser.add_argument('--tree', choices=('btree', 'bplus'), default='btree')
+    parser.add_argument('--wal', action='store_true')
+    parser.add_argument('--cache-size', type=int, default=100)
+    parser.add_argument('--value-size', type=int, default=16,
+                        help='tamanho dos valores em caracteres (0 = só chaves)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dir', default=None,
+                        help='diretório dos arquivos temporários')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='variação aceita antes de acusar regressão')
+    args = parser.parse_args(argv)
+    # Recusa antes de começar um t cujo nó cheio não cabe nas páginas
+    if args.page_size:
+        for t in args.degrees:
+            if FilePager.PAGE_HEADER.size + \
+                    BTreeNode.max_size(2 * t - 1) > args.page_size:
+                parser.error(f'--page-size {args.page_size} não comporta '
+                             f'um nó cheio com t={t}')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {'environment': environment(), 'config': vars(args),
+               'cases': []}
+    for n in args.sizes:
+        for t in args.degrees:
+            for distribution in args.distributions:
+                case = run_case(args, n, t, distribution, args.seed)
+                results['cases'].append(case)
+                print_case(case)
+                # Grava a cada caso, para não perder uma execução longa
+                with open(args.output, 'w') as f:
+                    json.dump(results, f, indent=2)
+    print(f'\nResultados em {args.output}')
+    if args.compare:
+        regressions = compare(args.compare, results, args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,324 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from btree import BTree
+from btree_node import BTreeNode
+
+
+class BPlusTree(BTree):
+    """Variante B+ da árvore B.
+
+    Todas as chaves e registros ficam nas folhas, que são encadeadas com as
+    vizinhas (prev_leaf/next_leaf). Os nós internos guardam apenas cópias
+    das chaves como separadores: o filho i contém as chaves k com
+    keys[i - 1] <= k < keys[i]. As varreduras por intervalo descem uma vez
+    até a primeira folha e depois seguem os ponteiros, uma folha por vez.
+
+    Com chaves em bytes (key_codec) os separadores são truncados: em vez da
+    primeira chave da folha da direita sobe o menor prefixo dela que ainda
+    é maior que a última chave da folha da esquerda.
+    """
+
+    INTERNAL_ENTRIES = False
+
+    def _split_point(self, child: BTreeNode, append):
+        if not child.leaf:
+            return super()._split_point(child, append)
+        # Nenhuma chave sai da folha, que recebe a chave nova logo em
+        # seguida: a proporção é tomada sobre 2t chaves
+        fill = self.append_fill if append else self.split_fill
+        return max(1, min(2 * self.t - 2, round(fill * 2 * self.t)))
+
+    def _split_child(self, parent: BTreeNode, index, append=False):
+        """Divide o filho no índice especificado; folhas copiam o separador para o pai."""
+        child = self.load_node(parent.children[index])
+        if not child.leaf:
+            # Nós internos se dividem como na árvore B: a chave do meio sobe
+            return super()._split_child(parent, index, append)
+
+        new_child = self._new_node(leaf=True)
+        next_leaf = None
+        if child.next_leaf is not None:
+            next_leaf = self.load_node(child.next_leaf)
+        s = self._split_point(child, append)
+        self._count_split(append)
+
+        new_child.keys = child.keys[s:]
+        new_child.values = child.values[s:]
+        child.keys = child.keys[:s]
+        child.values = child.values[:s]
+
+        # Encadeia a nova folha entre child e a sua antiga vizinha
+        new_child.prev_leaf = child.node_id
+        new_child.next_leaf = child.next_leaf
+        child.next_leaf = new_child.node_id
+        if next_leaf is not None:
+            next_leaf.prev_leaf = new_child.node_id
+            self.save_node(next_leaf)
+
+        parent.keys.insert(index,
+                           self._separator(child.keys[-1], new_child.keys[0]))
+        parent.values.insert(index, 0)
+        parent.children.insert(index + 1, new_child.node_id)
+
+        self.save_node(child)
+        self.save_node(new_child)
+        self.save_node(parent)
+
+    @staticmethod
+    def _separator(left, right):
+        """Menor separador s com left < s <= right: um prefixo de right quando as chaves são bytes."""
+        if not isinstance(right, bytes):
+            return right
+        size = 0
+        while size < len(left) and left[size] == right[size]:
+            size += 1
+        return right[:size + 1]
+
+    def _locate(self, node: BTreeNode, k):
+        """Nos nós internos só há separadores: a chave nunca é encontrada fora das folhas."""
+        if node.leaf:
+            return super()._locate(node, k)
+        return bisect_right(node.keys, k), False
+
+    def _merge(self, node: BTreeNode, i):
+        child = self.load_node(node.children[i])
+        if not child.leaf:
+            return super()._merge(node, i)
+        self.metrics.inc('merges_total')
+
+        sibling = self.load_node(node.children[i + 1])
+        next_leaf = None
+        if sibling.next_leaf is not None:
+            next_leaf = self.load_node(sibling.next_leaf)
+
+        # Em folhas o separador do pai é só uma cópia e é descartado
+        child.keys.extend(sibling.keys)
+        child.values.extend(sibling.values)
+        child.next_leaf = sibling.next_leaf
+        if next_leaf is not None:
+            next_leaf.prev_leaf = child.node_id
+            self.save_node(next_leaf)
+
+        node.keys.pop(i)
+        node.values.pop(i)
+        node.children.pop(i + 1)
+
+        self.save_node(child)
+        self.save_node(node)
+        self._free_node(sibling.node_id)
+
+    def _borrow_from_prev(self, node: BTreeNode, i):
+        child = self.load_node(node.children[i])
+        if not child.leaf:
+            return super()._borrow_from_prev(node, i)
+        sibling = self.load_node(node.children[i - 1])
+        child.keys.insert(0, sibling.keys.pop())
+        child.values.insert(0, sibling.values.pop())
+        node.keys[i - 1] = self._separator(sibling.keys[-1], child.keys[0])
+        self.save_node(child)
+        self.save_node(sibling)
+        self.save_node(node)
+
+    def _borrow_from_next(self, node: BTreeNode, i):
+        child = self.load_node(node.children[i])
+        if not child.leaf:
+            return super()._borrow_from_next(node, i)
+        sibling = self.load_node(node.children[i + 1])
+        child.keys.append(sibling.keys.pop(0))
+        child.values.append(sibling.values.pop(0))
+        node.keys[i] = self._separator(child.keys[-1], sibling.keys[0])
+        self.save_node(child)
+        self.save_node(sibling)
+        self.save_node(node)
+
+    def _build_leaves(self, keys, rids, cap):
+        """Grava as folhas encadeadas; o separador de cada folha é uma cópia da primeira chave."""
+        sizes = self._partition(len(keys), cap, gap=0)
+        ids = [self.pager.allocate() for _ in sizes]
+        pos = 0
+        node = None
+        for n, size in enumerate(sizes):
+            node = BTreeNode(leaf=True, node_id=ids[n])
+            node.keys = self._key_array(keys[pos:pos + size])
+            node.values = BTreeNode.int_array(rids[pos:pos + size])
+            node.prev_leaf = ids[n - 1] if n > 0 else None
+            node.next_leaf = ids[n + 1] if n + 1 < len(ids) else None
+            pos += size
+            self.pager.write_node(node)
+        up_keys = list(self._leaf_starts(keys, sizes))
+        return ids, up_keys, [0] * len(up_keys), node
+
+    def _leaf_starts(self, keys, sizes):
+        """Separador de cada folha, a partir da segunda (a sua primeira chave, truncada)."""
+        pos = 0
+        for size in sizes[:-1]:
+            pos += size
+            yield self._separator(keys[pos - 1], keys[pos])
+
+    def _find_leaf(self, k, reverse=False):
+        """Desce até a folha por onde começa uma varredura a partir de k."""
+        node = self.root
+        while node is not None and not node.leaf:
+            if k is None:
+                i = len(node.children) - 1 if reverse else 0
+            else:
+                # Na ida, chaves iguais a k podem estar antes do separador k
+                i = bisect_left(node.keys, k) if not reverse \
+                    else bisect_right(node.keys, k)
+            node = self.load_node(node.children[i])
+        return node
+
+    def _scan(self, start, reverse, inclusive=True, end=None):
+        """Gera os pares (chave, valor) a partir de start, lendo uma folha por vez.
+
+        A varredura para antes da primeira chave >= end (ou < end, com
+        reverse=True).
+        """
+        if self._latches is not None and \
+                self._writer_thread != threading.get_ident():
+            yield from self._scan_shared(start, reverse, inclusive, end)
+            return
+        for key, rid in self._scan_leaves(start, reverse, inclusive):
+            if self._past_end(key, end, reverse):
+                return
+            yield key, self._read_record(rid)
+
+    @staticmethod
+    def _past_end(key, end, reverse):
+        return end is not None and (key < end if reverse else key >= end)
+
+    def _scan_leaves(self, start, reverse, inclusive):
+        """Gera os pares (chave, rid) a partir de start, seguindo os elos entre as folhas."""
+        leaf = self._find_leaf(start, reverse)
+        if leaf is None:
+            return
+        if reverse:
+            if start is None:
+                i = len(leaf.keys) - 1
+            elif inclusive:
+                i = bisect_right(leaf.keys, start) - 1
+            else:
+                i = bisect_left(leaf.keys, start) - 1
+            while True:
+                while i >= 0:
+                    yield leaf.keys[i], leaf.values[i]
+                    i -= 1
+                if leaf.prev_leaf is None:
+                    return
+                leaf = self.load_node(leaf.prev_leaf)
+                i = len(leaf.keys) - 1
+        else:
+            i = 0 if start is None else bisect_left(leaf.keys, start)
+            while True:
+                while i < len(leaf.keys):
+                    yield leaf.keys[i], leaf.values[i]
+                    i += 1
+                if leaf.next_leaf is None:
+                    return
+                leaf = self.load_node(leaf.next_leaf)
+                i = 0
+
+    def _find_leaf_shared(self, k, reverse):
+        """_find_leaf com crabbing de leitura; retorna a folha e o seu latch."""
+        node, latch = self._shared_root()
+        while node is not None and not node.leaf:
+            if k is None:
+                i = len(node.children) - 1 if reverse else 0
+            else:
+                i = bisect_left(node.keys, k) if not reverse \
+                    else bisect_right(node.keys, k)
+            node, latch = self._shared_child(latch, node.children[i])
+        return node, latch
+
+    @staticmethod
+    def _leaf_entries(leaf, bound, reverse, inclusive):
+        """Copia os pares (chave, rid) da folha que vêm depois de bound na varredura."""
+        keys, values = leaf.keys, leaf.values
+        if reverse:
+            if bound is None:
+                end = len(keys)
+            else:
+                end = (bisect_right if inclusive else bisect_left)(keys, bound)
+            return [(keys[i], values[i]) for i in range(end - 1, -1, -1)]
+        if bound is None:
+            start = 0
+        else:
+            start = (bisect_left if inclusive else bisect_right)(keys, bound)
+        return list(zip(keys[start:], values[start:]))
+
+    def _scan_shared(self, start, reverse, inclusive, end):
+        """_scan para o modo concorrente: copia uma folha por vez sob latch de leitura.
+
+        Os valores também são lidos sob o latch, pois sem ele um escritor
+        pode liberar um registro e reaproveitar o slot para outra chave.
+        Nenhum latch fica preso enquanto o chamador consome os pares. Cada
+        folha é achada por uma nova descida a partir da última chave lida;
+        o salto para a folha vizinha só é usado para passar por folhas sem
+        chaves novas, e apenas se o latch dela estiver livre, já que um
+        escritor pode estar esperando pela folha atual enquanto segura a
+        vizinha.
+        """
+        bound = start
+        while True:
+            leaf, latch = self._find_leaf_shared(bound, reverse)
+            if leaf is None:
+                return
+            entries = self._leaf_entries(leaf, bound, reverse, inclusive)
+            while not entries:
+                next_id = leaf.prev_leaf if reverse else leaf.next_leaf
+                if next_id is None:
+                    latch.release_shared()
+                    return
+                next_latch = self._latches.get(next_id)
+                if not next_latch.acquire_shared(blocking=False):
+                    break
+                latch.release_shared()
+                latch = next_latch
+                leaf = self.load_node(next_id)
+                entries = self._leaf_entries(leaf, bound, reverse, inclusive)
+            if not entries:
+                latch.release_shared()
+                time.sleep(0)  # Vizinha ocupada: cede a vez e desce de novo
+                continue
+            try:
+                count = len(entries)
+                entries = [(key, self._read_record(rid))
+                           for key, rid in entries
+                           if not self._past_end(key, end, reverse)]
+            finally:
+                latch.release_shared()
+            yield from entries
+            if len(entries) < count:
+                return
+            bound, inclusive = entries[-1][0], False
+
+    def scan_from(self, k=None, reverse=False):
+        """Gera pares (chave, valor) a partir de k em ordem crescente.
+
+        Com reverse=True gera em ordem decrescente a partir da maior chave
+        <= k. Sem k, começa na primeira (ou na última) chave da árvore.
+        """
+        if k is not None:
+            k = self._encode(k)
+        for key, value in self._scan(k, reverse):
+            yield self._decode(key), value
+
+    def range(self, lo=None, hi=None, reverse=False):
+        """Gera os pares (chave, valor) com lo <= chave < hi, de forma preguiçosa.
+
+        Limites None deixam o intervalo aberto daquele lado.
+        """
+        lo = None if lo is None else self._encode(lo)
+        hi = None if hi is None else self._encode(hi)
+        if reverse:
+            scan = self._scan(hi, True, inclusive=False, end=lo)
+        else:
+            scan = self._scan(lo, False, end=hi)
+        for key, value in scan:
+            yield self._decode(key), value
+
+    def items(self, reverse=False):
+        """Gera todos os pares (chave, valor) em ordem."""
+        return self.scan_from(None, reverse)
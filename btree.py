@@ -1,271 +1,1315 @@
-from btree_node import BTreeNode
-import uuid
+import functools
 import json
 import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from btree_node import BTreeNode
+from buffer_pool import BufferPool
+from filters import CuckooFilter
+from inner_index import InnerIndex
+from latches import LatchTable, RWLatch, WouldBlock
+from metrics import Metrics, NullMetrics
+from pager import FilePager
+from records import RecordHeap, decode_value, encode_value
+from snapshot import Snapshot
+
+
+def _writer(method):
+    """Executa o método como o único escritor da árvore."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._writer_thread == threading.get_ident():
+            return method(self, *args, **kwargs)
+        with self._writer_lock:
+            self._writer_thread = threading.get_ident()
+            if self._snapshots:
+                # A raiz fica na memória e é alterada sem passar por load_node
+                self._preserve(self.root)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._unlatch_all()
+                self._writer_thread = None
+    return wrapper
+
+
+def _timed(method):
+    """Mede a duração da operação pública nas métricas da árvore."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return method(self, *args, **kwargs)
+        before = self._trace_counters() if metrics.tracer is not None \
+            else None
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            details = None
+            if before is not None:
+                after = self._trace_counters()
+                details = {key: after[key] - before[key] for key in after}
+            metrics.operation(name, elapsed, details)
+    return wrapper
 
 
 class BTree:
-    def __init__(self, t):
+    # As chaves dos nós internos também são entradas (na B+ são só separadores)
+    INTERNAL_ENTRIES = True
+
+    def __init__(self, t, pager=None, cache_size=100, cache_bytes=None,
+                 eviction='lru', wal=None, checkpoint_bytes=4 * 1024 * 1024,
+                 records=None, concurrent=False, key_codec=None,
+                 filter_fp_rate=None, split_fill=0.5, append_fill=0.9,
+                 min_fill=0.5, metrics=None, inner_index=False):
         self.t = t  # Grau mínimo da árvore B
-        self.cache = {}  # Cache para nós carregados
-        self.max_cache_size = 100  # Limite para o cache
+        # Fração das chaves que fica no nó da esquerda ao dividir um nó
+        # cheio: split_fill nas divisões comuns e append_fill quando a chave
+        # nova passa da maior chave da árvore (chaves crescentes), para que
+        # as páginas deixadas para trás fiquem quase cheias
+        if not 0 < split_fill < 1 or not 0 < append_fill <= 1:
+            raise ValueError('split_fill deve estar em (0, 1) e append_fill em (0, 1]')
+        self.split_fill = split_fill
+        self.append_fill = append_fill
+        # Remoções só rebalanceiam um nó que chegou a min_fill da capacidade;
+        # abaixo de 0.5 nós pouco cheios são tolerados e as fusões e
+        # empréstimos ficam raros
+        if not 0 <= min_fill <= 0.5:
+            raise ValueError('min_fill deve estar em [0, 0.5]')
+        self.min_fill = min_fill
+        self._min_keys = max(1, min(t - 1, int(min_fill * (2 * t - 1))))
+        # Codec que transforma as chaves em bytes ordenáveis (keys.py); sem
+        # ele as chaves são inteiros guardados em array('q')
+        self.key_codec = key_codec
+        # Backend de armazenamento dos nós (arquivo paginado por padrão, com
+        # páginas grandes o bastante para um nó cheio)
+        self.pager = pager or FilePager(page_size=FilePager.page_size_for(t))
+        self._check_node_size()
+        # Superbloco: o t com que o banco foi criado e o nº de chaves, que
+        # só vale se o último close() terminou (senão é contado sob demanda;
+        # um banco sem raiz começa com zero)
+        meta = self.pager.load_meta()
+        if meta.get('t') and meta['t'] != t:
+            raise ValueError(f'O banco foi criado com t={meta["t"]} e não '
+                             f'pode ser aberto com t={t}')
+        self._key_count = meta.get('keys')
+        # Cache de nós com escrita adiada (limite em nós e/ou em bytes)
+        self.pool = BufferPool(self.pager, capacity=cache_size,
+                               max_bytes=cache_bytes, policy=eviction)
+        # Métricas (metrics.py): desligadas por padrão; metrics=True cria
+        # um Metrics próprio da árvore
+        if metrics is True:
+            metrics = Metrics()
+        self.metrics = metrics or NullMetrics()
+        if self.metrics.enabled:
+            self.pool.metrics = self.metrics
+            self.metrics.collectors.append(self._collect_metrics)
 
-        # Tenta carregar o UUID da raiz da árvore de root.json
-        self.root = self.load_root()
+        # Modo concorrente: leitores descem com latches compartilhados,
+        # soltando o pai depois de travar o filho (crabbing), enquanto um
+        # único escritor por vez altera a árvore com latches exclusivos
+        self._latches = LatchTable() if concurrent else None
+        # Cópia dos níveis internos para buscas pontuais (inner_index.py);
+        # as buscas do modo concorrente seguem os latches e não a usam
+        if inner_index and concurrent:
+            raise ValueError('inner_index não pode ser usado com concurrent=True')
+        self._inner = InnerIndex(self.INTERNAL_ENTRIES) if inner_index \
+            else None
+        self._root_latch = RWLatch()  # Protege o ponteiro self.root
+        self._root_held = False
+        self._writer_lock = threading.Lock()
+        self._writer_thread = None
+        self._held = {}  # Latches exclusivos do escritor: node_id -> latch
 
-        if self.root:
-            self.root = self.load_node(self.root) or BTreeNode(leaf=True)
-        else:
+        # Snapshots: cada snapshot() abre uma nova época. Na primeira vez
+        # que o escritor carrega um nó em uma época, a imagem anterior dele
+        # é guardada; um snapshot da época v lê a primeira imagem de época
+        # maior que v ou, se não houver, o nó atual
+        self._epoch = 0
+        self._snapshots = {}  # Época -> nº de snapshots abertos nela
+        self._versions = {}  # node_id -> [(época, imagem), ...]
+        self._versions_lock = threading.Lock()
+        self._snapshot_record_frees = []  # Liberados com snapshots abertos
+
+        # Arquivo com os valores associados às chaves (aberto sob demanda)
+        self._records = records
+        self._records_lock = threading.Lock()
+        self._pending_record_frees = []
+
+        # Log de escrita antecipada opcional; com ele as páginas de dados só
+        # são atualizadas nos checkpoints
+        self.wal = wal
+        self.checkpoint_bytes = checkpoint_bytes
+        self._txn_nodes = {}  # Nós alterados pela operação em andamento
+        self._txn_frees = []
+        self._txn_root = None  # (root_id,) se a raiz mudou na operação
+        self._pending_frees = []  # Liberados já no log, aplicados no checkpoint
+        self._pending_root = None
+        if wal is not None:
+            self.pool.before_write = wal.sync
+            # Registros referenciados pelo log precisam estar no disco antes dele
+            wal.before_sync = self._flush_records
+            self._recover()
+
+        # Tenta carregar o identificador da raiz a partir do pager
+        self.root = None
+        root_id = self.load_root()
+        if root_id is not None:
+            self.root = self.load_node(root_id)
+
+        if self.root is None:
             # Se não há raiz, cria uma nova árvore B
-            self.root = BTreeNode(leaf=True)
-            self.save_root(self.root.node_id)
+            self._key_count = 0
+            self._set_root(self._new_node(leaf=True))
             self.save_node(self.root)
+            self._commit()
+            self._unlatch_all()
+        else:
+            self.pool.pin(self.root.node_id)
+
+        # Filtro cuckoo opcional com as chaves da árvore: buscas e remoções
+        # de chaves que ele diz ausentes não descem pela árvore
+        self.filter_fp_rate = filter_fp_rate
+        self._filter = None
+        if filter_fp_rate is not None:
+            self._open_filter()
+        elif not self.pager.read_only:
+            # Sem o filtro as alterações não o atualizam: o arquivo salvo
+            # deixaria de fora as chaves novas na próxima abertura com ele
+            CuckooFilter.discard(self._filter_path())
+
+        if not self.pager.read_only:
+            # Até o close() o nº de chaves no disco fica desconhecido: se o
+            # processo cair, a próxima abertura não confia em um valor velho
+            self.pager.save_meta({'t': t, 'height': meta.get('height', 0),
+                                  'keys': None})
+            self.pager.flush()
+
+    def _check_node_size(self):
+        """Recusa um t cujo nó cheio não cabe em uma página, antes de alterar a árvore.
+
+        Com um key_codec as divisões contam chaves e não bytes, então o
+        tamanho das chaves é limitado a max_key_size, o maior com que um
+        nó cheio ainda cabe na página.
+        """
+        self.max_key_size = None
+        limit = self.pager.max_node_size
+        if limit is None:
+            return
+        max_keys = 2 * self.t - 1
+        if self.key_codec is None:
+            size = BTreeNode.max_size(max_keys)
+            if size <= limit:
+                return
+        else:
+            self.max_key_size = min(
+                (limit - BTreeNode.max_size(max_keys, 0)) // max_keys,
+                (1 << 8 * BTreeNode.KEY_LENGTH.size) - 1)
+            if self.max_key_size >= 1:
+                return
+        raise ValueError(
+            f'Um nó cheio com t={self.t} não cabe nas páginas de '
+            f'{self.pager.page_size} bytes; use um FilePager com '
+            f'page_size maior ou um t menor')
+
+    def _check_key_size(self, keys):
+        """Recusa chaves codificadas maiores que max_key_size, antes de gravar qualquer coisa."""
+        if self.max_key_size is None:
+            return
+        for k in keys:
+            if len(k) > self.max_key_size:
+                raise ValueError(
+                    f'Chave de {len(k)} bytes passa do limite de '
+                    f'{self.max_key_size} bytes para t={self.t} e páginas de '
+                    f'{self.pager.page_size} bytes')
+
+    def _new_node(self, leaf):
+        """Cria um nó com um identificador reservado pelo pager."""
+        node = BTreeNode(leaf=leaf, node_id=self.pager.allocate())
+        if self.key_codec is not None:
+            node.keys = []
+        return node
+
+    def _encode(self, k):
+        """Chave como ela é guardada nos nós (codificada, se há um key_codec)."""
+        return k if self.key_codec is None else self.key_codec.encode(k)
+
+    def _decode(self, k):
+        return k if self.key_codec is None else self.key_codec.decode(k)
+
+    def _key_array(self, keys):
+        """Chaves de um nó: array('q') para inteiros ou lista de bytes com um codec."""
+        if self.key_codec is not None:
+            return list(keys)
+        return BTreeNode.int_array(keys)
+
+    def _set_root(self, node):
+        """Troca a raiz da árvore, mantendo-a sempre pinada no cache."""
+        self._latch_root_pointer()
+        if self.root is not None:
+            self.pool.unpin(self.root.node_id)
+        if self._inner is not None:
+            self._inner.invalidate()
+        self.root = node
+        if node is not None:
+            self.pool.pin(node.node_id)
+            self.save_root(node.node_id)
+        else:
+            self.save_root(None)
 
     def load_root(self):
-        """Carrega o UUID do nó raiz de root.json."""
-        try:
-            with open('database/root.json', 'r') as f:
-                data = json.load(f)
-                return data['root_id']
-        except FileNotFoundError:
-            return None
+        """Carrega o identificador do nó raiz."""
+        return self.pager.load_root()
 
     def save_root(self, root_id):
-        """Salva o UUID do nó raiz em root.json."""
-        with open('database/root.json', 'w') as f:
-            json.dump({'root_id': root_id}, f)
+        """Salva o identificador do nó raiz (no próximo checkpoint, se há WAL)."""
+        if self.wal is not None:
+            self._txn_root = (root_id,)
+        else:
+            self.pager.save_root(root_id)
 
     def load_node(self, node_id):
         """Carrega um nó do cache ou do disco, se necessário."""
-        if node_id in self.cache:
-            return self.cache[node_id]
-        else:
-            node = BTreeNode.load_from_disk(node_id)
-            if node:
-                self.cache[node_id] = node
-                self._ensure_cache_limit()
-            return node
+        if self._latches is not None and \
+                self._writer_thread == threading.get_ident():
+            self._latch(node_id)
+        node = self.pool.get(node_id)
+        if self._snapshots and self._writer_thread == threading.get_ident():
+            self._preserve(node)
+        return node
+
+    # Latches do modo concorrente. O escritor trava com exclusividade cada
+    # nó que carrega e, ao descer para um filho, solta tudo o que está
+    # acima: as divisões e fusões são feitas antes da descida, então os
+    # ancestrais não serão mais alterados pela operação.
+
+    def _latch_root_pointer(self):
+        if self._latches is not None and not self._root_held:
+            self._root_latch.acquire_exclusive()
+            self._root_held = True
+
+    def _latch_root(self):
+        """Escritor: trava o ponteiro da raiz e a própria raiz antes de uma descida."""
+        if self._latches is None:
+            return
+        self._latch_root_pointer()
+        if self.root is not None:
+            self._latch(self.root.node_id)
+
+    def _latch(self, node_id):
+        if node_id not in self._held:
+            latch = self._latches.get(node_id)
+            latch.acquire_exclusive()
+            self._held[node_id] = latch
+
+    def _crab(self, node):
+        """Escritor: ao descer para node, solta os latches dos nós acima dele."""
+        if self._latches is None:
+            return
+        for node_id in [n for n in self._held if n != node.node_id]:
+            self._held.pop(node_id).release_exclusive()
+        if self._root_held:
+            self._root_held = False
+            self._root_latch.release_exclusive()
+
+    def _unlatch_all(self):
+        if self._latches is None:
+            return
+        for latch in self._held.values():
+            latch.release_exclusive()
+        self._held = {}
+        if self._root_held:
+            self._root_held = False
+            self._root_latch.release_exclusive()
+
+    def _shared_root(self, blocking=True):
+        """Leitor: retorna a raiz travada para leitura e o seu latch."""
+        if not self._root_latch.acquire_shared(blocking):
+            raise WouldBlock
+        try:
+            node = self.root
+            if node is None:
+                return None, None
+            latch = self._latches.get(node.node_id)
+            if not latch.acquire_shared(blocking):
+                raise WouldBlock
+            return node, latch
+        finally:
+            self._root_latch.release_shared()
+
+    def _shared_child(self, latch, child_id, blocking=True):
+        """Leitor: trava o filho antes de soltar o pai e então o carrega.
+
+        Com blocking=False levanta WouldBlock, ainda com o pai travado, se
+        o filho estiver travado por um escritor ou fora do cache.
+        """
+        child_latch = self._latches.get(child_id)
+        if not child_latch.acquire_shared(blocking):
+            raise WouldBlock
+        if blocking:
+            latch.release_shared()
+            return self.load_node(child_id), child_latch
+        child = self.pool.peek(child_id)
+        if child is None:
+            child_latch.release_shared()
+            raise WouldBlock
+        latch.release_shared()
+        return child, child_latch
 
     def save_node(self, node):
-        """Salva um nó no disco e no cache."""
-        self.cache[node.node_id] = node
-        if node.keys:  # Salva o nó apenas se houver chaves
-            node.save_to_disk()
+        """Marca o nó como alterado; ele é gravado ao sair do cache ou no flush."""
+        if self.wal is not None:
+            # Nós da operação em andamento não podem ir ao disco antes do log
+            if node.node_id not in self._txn_nodes:
+                self.pool.pin(node.node_id)
+            self._txn_nodes[node.node_id] = node
+        self.pool.put(node)
+        if self._inner is not None:
+            self._inner.node_saved(node)
+
+    def _free_node(self, node_id):
+        """Remove um nó do cache e libera seu espaço no armazenamento."""
+        self.pool.discard(node_id)
+        if self._inner is not None:
+            self._inner.node_freed(node_id)
+        if self.wal is not None:
+            self._txn_nodes.pop(node_id, None)
+            self._txn_frees.append(node_id)
         else:
-            # Se o nó está vazio e é folha, podemos remover o arquivo se ele existir
-            if node.leaf:
-                file_path = f'database/{node.node_id}.json'
-                # Verifica se o arquivo existe antes de remover
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-        self._ensure_cache_limit()
-
-    def _ensure_cache_limit(self):
-        """Garante que o cache não exceda seu tamanho máximo."""
-        if len(self.cache) > self.max_cache_size:
-            node_id_to_evict = next(iter(self.cache))
-            self.cache[node_id_to_evict].save_to_disk()
-            del self.cache[node_id_to_evict]
-
-    def insert(self, k):
-        """Insere uma nova chave k na árvore B."""
+            self.pager.free_node(node_id)
+
+    @property
+    def records(self):
+        """Arquivo de registros (heap) que guarda os valores das chaves."""
+        if self._records is None:
+            with self._records_lock:
+                if self._records is None:
+                    self._records = RecordHeap(os.path.join(
+                        self.pager.directory or '.', 'records.db'))
+        return self._records
+
+    def _write_record(self, value, rid=0):
+        """Grava o valor no heap (regravando o registro rid, se houver) e retorna o rid."""
+        data = encode_value(value)
+        if rid and (self._snapshots or self.wal is not None):
+            # O valor antigo ainda pode ser lido por um snapshot, por uma
+            # réplica ou pelos nós do último checkpoint (com WAL): grava um
+            # registro novo e o antigo só é liberado depois
+            self._free_record(rid)
+            rid = 0
+        if rid:
+            return self.records.update(rid, data)
+        return self.records.insert(data)
+
+    def _read_record(self, rid):
+        """Lê o valor de um registro (None para chaves sem registro)."""
+        if not rid:
+            return None
+        data = self.records.read(rid)
+        # No modo concorrente, um rid lido fora do latch da folha pode
+        # apontar para um registro já removido
+        return None if data is None else decode_value(data)
+
+    def _free_record(self, rid):
+        """Remove um registro; com WAL a remoção espera o próximo checkpoint."""
+        if not rid:
+            return
+        if self._snapshots:
+            self._snapshot_record_frees.append(rid)
+        elif self.wal is not None:
+            self._pending_record_frees.append(rid)
+        else:
+            self.records.delete(rid)
+
+    def _flush_records(self):
+        if self._records is not None:
+            self._records.flush()
+
+    def _check_writable(self):
+        if self.pager.read_only:
+            raise ValueError('A árvore foi aberta somente para leitura')
+
+    def _commit(self):
+        """Registra no WAL as alterações da operação que acabou de terminar."""
+        if self.wal is None:
+            return
+        if not (self._txn_nodes or self._txn_frees or self._txn_root):
+            return
+
+        nodes = [(node_id, self.pager.encode_node(node))
+                 for node_id, node in self._txn_nodes.items()]
+        # Um nó que não cabe em uma página não pode entrar no log: a
+        # recuperação falharia em toda abertura seguinte
+        limit = self.pager.max_node_size
+        for node_id, data in nodes:
+            if limit is not None and len(data) > limit:
+                raise ValueError(
+                    f'O nó {node_id} ocupa {len(data)} bytes e não cabe em '
+                    f'uma página; a transação não foi registrada')
+        self.wal.log_transaction(nodes, self._txn_frees, self._txn_root,
+                                 self.pager.allocation_state())
+
+        for node_id in self._txn_nodes:
+            self.pool.unpin(node_id)
+        self._pending_frees.extend(self._txn_frees)
+        if self._txn_root:
+            self._pending_root = self._txn_root
+        self._txn_nodes = {}
+        self._txn_frees = []
+        self._txn_root = None
+
+        if self.wal.size() >= self.checkpoint_bytes:
+            self.checkpoint()
+
+    @_timed
+    @_writer
+    def checkpoint(self):
+        """Aplica no arquivo de dados tudo o que está no WAL e esvazia o log."""
+        if self.wal is None:
+            self.pool.flush()
+            self._flush_records()
+            return
+        self.wal.sync()
+        self.pool.flush()
+        for node_id in self._pending_frees:
+            self.pager.free_node(node_id)
+        for rid in self._pending_record_frees:
+            self.records.delete(rid)
+        self._flush_records()
+        if self._pending_root:
+            self.pager.save_root(self._pending_root[0])
+        self.pager.flush()
+        self.wal.truncate()
+        self._pending_frees = []
+        self._pending_record_frees = []
+        self._pending_root = None
+
+    def _recover(self):
+        """Reaplica as transações completas do WAL deixadas por uma queda."""
+        frees = []
+        root = alloc = None
+        for txn_nodes, txn_frees, txn_root, txn_alloc in self.wal.replay():
+            for node_id, data in txn_nodes:
+                self.pager.write_node(self.pager.decode_node(data, node_id))
+            frees.extend(txn_frees)
+            root = txn_root or root
+            alloc = txn_alloc if txn_alloc is not None else alloc
+        if alloc is not None:
+            # As alterações do cabeçalho feitas após o último checkpoint
+            # podem não ter chegado ao disco
+            self.pager.restore_allocation_state(alloc)
+        self._pending_frees = frees
+        self._pending_root = root
+        self.checkpoint()
+
+    def cache_stats(self):
+        """Retorna os contadores do cache (acertos, faltas, despejos e gravações)."""
+        return self.pool.stats()
+
+    def io_stats(self):
+        """Soma os contadores de E/S do arquivo de nós, dos registros e do WAL."""
+        stats = self.pager.io_stats()
+        if self._records is not None:
+            stats['pages_read'] += self._records.pages_read
+            stats['pages_written'] += self._records.pages_written
+            stats['bytes_read'] += self._records.bytes_read
+            stats['bytes_written'] += self._records.bytes_written
+        if self.wal is not None:
+            stats['bytes_written'] += self.wal.bytes_written
+        return stats
+
+    @_writer
+    def height(self):
+        """Nº de níveis da árvore (0 se ela está vazia)."""
+        levels = 0
+        node = self.root
+        while node is not None:
+            levels += 1
+            node = None if node.leaf else self.load_node(node.children[0])
+        return levels
+
+    def _trace_counters(self):
+        """Contadores cuja variação durante uma operação vai para o tracer."""
+        pool = self.pool
+        counters = self.metrics.counters
+        return {'cache_misses': pool.misses, 'evictions': pool.evictions,
+                'dirty_flushes': pool.dirty_flushes,
+                'splits': counters.get('splits_total', 0),
+                'merges': counters.get('merges_total', 0),
+                'borrows': counters.get('borrows_total', 0),
+                **self.io_stats()}
+
+    def _collect_metrics(self):
+        pool = self.pool
+        values = {f'{key}_total': value
+                  for key, value in self.io_stats().items()}
+        values.update({
+            'node_loads_hit_total': pool.hits,
+            'node_loads_miss_total': pool.misses,
+            'node_loads_coalesced_total': pool.coalesced,
+            'evictions_total': pool.evictions,
+            'dirty_flushes_total': pool.dirty_flushes,
+            'cached_nodes': len(pool),
+            'dirty_nodes': len(pool.dirty),
+            'height': self.height(),
+        })
+        if self.wal is not None:
+            values['wal_syncs_total'] = self.wal.syncs
+        return values
+
+    @_writer
+    def flush(self):
+        """Torna duráveis as alterações feitas até aqui."""
+        if self.wal is not None:
+            self.wal.sync()
+        else:
+            self.pool.flush()
+            self._flush_records()
+
+    def _filter_path(self):
+        base = getattr(self.pager, 'path', None) or \
+            os.path.join(self.pager.directory or '.', 'btree')
+        return base + '.filter'
+
+    def _open_filter(self):
+        """Carrega o filtro salvo no último close ou o reconstrói a partir das chaves."""
+        path = self._filter_path()
+        self._filter = CuckooFilter.load(path, self.filter_fp_rate)
+        if not self.pager.read_only:
+            # O arquivo só vale até a próxima alteração: se o processo cair,
+            # o filtro é reconstruído na próxima abertura
+            CuckooFilter.discard(path)
+        if self._filter is None:
+            self.rebuild_filter()
+
+    def _all_nodes(self):
+        """Gera todos os nós da árvore, em qualquer ordem (só para o escritor)."""
+        pending = [] if self.root is None else [self.root.node_id]
+        while pending:
+            node = self.load_node(pending.pop())
+            # Nada é alterado: basta o latch do nó atual
+            self._crab(node)
+            if not node.leaf:
+                pending.extend(node.children)
+            yield node
+
+    def _all_keys(self):
+        """Gera todas as chaves guardadas na árvore, em qualquer ordem."""
+        for node in self._all_nodes():
+            if node.leaf or self.INTERNAL_ENTRIES:
+                yield from node.keys
+
+    @_writer
+    def rebuild_filter(self, capacity=0):
+        """Recria o filtro de chaves com espaço para ao menos capacity chaves."""
+        self._build_filter(list(self._all_keys()), capacity)
+
+    def _build_filter(self, keys, capacity=0):
+        capacity = max(capacity, 2 * len(keys), 1024)
+        while True:
+            flt = CuckooFilter(capacity, self.filter_fp_rate)
+            if all(flt.add(k) for k in keys):
+                break
+            capacity *= 2
+        self._filter = flt
+
+    def _filter_add(self, keys):
+        """Acrescenta as chaves ao filtro antes de inseri-las, para que ele nunca as negue."""
+        if self._filter is not None and \
+                not all(self._filter.add(k) for k in keys):
+            # Filtro cheio: recria um maior com as chaves da árvore e as do
+            # lote, cujas primeiras já estavam só no filtro antigo
+            self._build_filter(list(self._all_keys()) + list(keys),
+                               2 * self._filter.capacity)
+
+    def _maybe_present(self, k):
+        return self._filter is None or k in self._filter
+
+    def _count_keys(self, delta):
+        if self._key_count is not None:
+            self._key_count += delta
+
+    @_writer
+    def __len__(self):
+        """Nº de chaves; após uma queda ele é contado uma vez, percorrendo a árvore."""
+        if self._key_count is None:
+            self._key_count = sum(1 for _ in self._all_keys())
+        return self._key_count
+
+    def _hot_path(self):
+        return os.path.splitext(self._filter_path())[0] + '.hot'
+
+    @_writer
+    def warm_up(self, levels=None):
+        """Pré-carrega o cache, para que as primeiras buscas não esperem pelo disco.
+
+        Com levels, lê os levels níveis de cima da árvore; sem ele, relê os
+        nós que estavam no cache no último close(). Para quando o cache
+        enche e retorna o nº de nós carregados.
+        """
+        pool = self.pool
+        room = float('inf') if pool.capacity is None else \
+            pool.capacity - len(pool)
+        if levels is None:
+            try:
+                with open(self._hot_path()) as f:
+                    node_ids = json.load(f)
+            except (OSError, ValueError):
+                return 0
+            # O arquivo está em ordem LRU: os mais recentes ficam no fim
+            if room < len(node_ids):
+                node_ids = node_ids[len(node_ids) - max(0, room):]
+            # Nós que saíram da árvore desde então são ignorados pelo pager
+            return self._preload(sorted(node_ids), room)
+        loaded = 0
+        level = [] if self.root is None else [self.root.node_id]
+        for _ in range(levels):
+            loaded += self._preload(sorted(level), room - loaded)
+            if loaded >= room:
+                break
+            level = [child for node_id in level
+                     for child in getattr(pool.peek(node_id), 'children', ())]
+        return loaded
+
+    def _preload(self, node_ids, room):
+        """Lê os nós para o cache, em ordem de página; retorna quantos eram novos."""
+        loaded = 0
+        for node_id in node_ids:
+            if loaded >= room or self.pool.max_bytes is not None and \
+                    self.pool.used_bytes >= self.pool.max_bytes:
+                break
+            if node_id not in self.pool and self.pool.get(node_id) is not None:
+                loaded += 1
+        return loaded
+
+    @_writer
+    def close(self):
+        """Grava as alterações pendentes e fecha o armazenamento da árvore."""
+        self.checkpoint()
+        if not self.pager.read_only:
+            self.pager.save_meta({'t': self.t, 'height': self.height(),
+                                  'keys': self._key_count})
+            with open(self._hot_path(), 'w') as f:
+                json.dump(list(self.pool.frames), f)
+        if self._filter is not None and not self.pager.read_only:
+            self._filter.save(self._filter_path())
+        if self.wal is not None:
+            self.wal.close()
+        if self._records is not None:
+            self._records.close()
+        self.pager.close()
+
+    @_timed
+    @_writer
+    def insert(self, k, value=None):
+        """Insere uma nova chave k na árvore B, com um valor opcional."""
+        self._check_writable()
+        k = self._encode(k)
+        self._check_key_size((k,))
+        rid = self._write_record(value) if value is not None else 0
+        self._filter_add((k,))
+        self._insert_key(k, rid)
+        self._count_keys(1)
+        self._commit()
+
+    @_timed
+    @_writer
+    def insert_many(self, items, pairs=False):
+        """Insere um lote de chaves (ou pares (chave, valor) com pairs=True).
+
+        O lote é ordenado e as chaves que caem na mesma folha entram juntas,
+        com uma descida e uma gravação por folha. Todo o lote vira uma única
+        transação. Retorna o nº de chaves inseridas.
+        """
+        self._check_writable()
+        if pairs:
+            items = sorted(((self._encode(key), value) for key, value in items),
+                           key=lambda item: item[0])
+            keys = [key for key, _ in items]
+            self._check_key_size(keys)
+            rids = [self._write_record(value) if value is not None else 0
+                    for _, value in items]
+        else:
+            keys = sorted(map(self._encode, items))
+            self._check_key_size(keys)
+            rids = [0] * len(keys)
+
+        self._filter_add(keys)
+        if keys and self.root is None:
+            self._set_root(self._new_node(leaf=True))
+        pos = 0
+        while pos < len(keys):
+            pos = self._insert_run(keys, rids, pos)
+        self._count_keys(len(keys))
+        self._commit()
+        return len(keys)
+
+    def _insert_run(self, keys, rids, pos):
+        """Insere, a partir de keys[pos], as chaves que cabem na mesma folha; retorna a próxima posição."""
+        max_keys = (2 * self.t) - 1
+        k = keys[pos]
+        self._latch_root()
+        if len(self.root.keys) == max_keys:
+            new_root = self._new_node(leaf=False)
+            new_root.children.append(self.root.node_id)
+            append = k > self.root.keys[-1]
+            self._set_root(new_root)
+            self._split_child(new_root, 0, append)
+
+        # Desce como _insert_non_full, dividindo os filhos cheios, e guarda o
+        # menor separador à direita do caminho: as chaves abaixo dele caem na folha
+        node = self.root
+        bound = None
+        rightmost = True
+        path = []
+        try:
+            while not node.leaf:
+                self.pool.pin(node.node_id)
+                path.append(node.node_id)
+                i = bisect_right(node.keys, k)
+                rightmost = rightmost and i == len(node.keys)
+                child = self.load_node(node.children[i])
+                if len(child.keys) == max_keys:
+                    self._split_child(node, i,
+                                      rightmost and k > child.keys[-1])
+                    i = bisect_right(node.keys, k)
+                if i < len(node.keys):
+                    bound = node.keys[i]
+                node = self.load_node(node.children[i])
+                self._crab(node)
+
+            end = min(len(keys), pos + max_keys - len(node.keys))
+            if bound is not None:
+                end = bisect_left(keys, bound, pos, end)
+            merged = sorted(list(zip(node.keys, node.values)) +
+                            list(zip(keys[pos:end], rids[pos:end])),
+                            key=lambda item: item[0])
+            node.keys = self._key_array(key for key, _ in merged)
+            node.values = BTreeNode.int_array(rid for _, rid in merged)
+            self.save_node(node)
+        finally:
+            for node_id in path:
+                self.pool.unpin(node_id)
+            self._unlatch_all()
+        return end
+
+    def _insert_key(self, k, rid):
+        """Insere a chave k apontando para o registro rid (0 = sem registro)."""
+        self._latch_root()
+        if self.root is None:
+            # A árvore ficou vazia depois de remover todas as chaves
+            self._set_root(self._new_node(leaf=True))
         root = self.root
         if len(root.keys) == (2 * self.t) - 1:
             # A raiz está cheia, criar uma nova raiz e dividir
-            new_root = BTreeNode(leaf=False)
+            new_root = self._new_node(leaf=False)
             new_root.children.append(root.node_id)  # Referência ao antigo root
-            # Gera um novo UUID para o novo nó raiz
-            new_root.node_id = str(uuid.uuid4())
-            self.root = new_root
-            self._split_child(new_root, 0)
-            self._insert_non_full(new_root, k)
-            self.save_root(new_root.node_id)  # Atualiza o UUID da nova raiz
-            self.save_node(new_root)  # Salva a nova raiz
+            self._set_root(new_root)  # Atualiza o ID da nova raiz
+            self._split_child(new_root, 0, k > root.keys[-1])
+            self._insert_non_full(new_root, k, rid)
         else:
-            self._insert_non_full(root, k)
-        self.save_node(self.root)
-
-    def _insert_non_full(self, node: BTreeNode, k):
-        """Insere a chave k em um nó não cheio."""
-        i = len(node.keys) - 1
-        if node.leaf:
-            node.keys.append(None)
-            while i >= 0 and k < node.keys[i]:
-                node.keys[i + 1] = node.keys[i]
-                i -= 1
-            node.keys[i + 1] = k
+            self._insert_non_full(root, k, rid)
+
+    def _insert_non_full(self, node: BTreeNode, k, rid):
+        """Insere a chave k a partir de um nó não cheio, descendo iterativamente até a folha."""
+        max_keys = (2 * self.t) - 1
+        # O caminho só desceu pelos filhos mais à direita até aqui?
+        rightmost = node is self.root
+        path = []
+        try:
+            while not node.leaf:
+                # Mantém o caminho pinado enquanto a descida passa pelos filhos
+                self.pool.pin(node.node_id)
+                path.append(node.node_id)
+                i = bisect_right(node.keys, k)
+                rightmost = rightmost and i == len(node.keys)
+                child = self.load_node(node.children[i])
+                if len(child.keys) == max_keys:
+                    # Chave nova depois de todas as da árvore: divisão de append
+                    self._split_child(node, i,
+                                      rightmost and k > child.keys[-1])
+                    i = bisect_right(node.keys, k)
+                node = self.load_node(node.children[i])
+                self._crab(node)
+
+            i = bisect_right(node.keys, k)
+            node.keys.insert(i, k)
+            node.values.insert(i, rid)
             self.save_node(node)
-        else:
-            while i >= 0 and k < node.keys[i]:
-                i -= 1
-            i += 1
-            child = self.load_node(node.children[i])
-            if len(child.keys) == (2 * self.t) - 1:
-                self._split_child(node, i)
-                if k > node.keys[i]:
-                    i += 1
-            self._insert_non_full(self.load_node(node.children[i]), k)
-
-    def _split_child(self, parent: BTreeNode, index):
-        """Divide o filho no índice especificado."""
-        t = self.t
+        finally:
+            for node_id in path:
+                self.pool.unpin(node_id)
+            self._unlatch_all()
+
+    def _split_point(self, child: BTreeNode, append):
+        """Nº de chaves que ficam no nó da esquerda ao dividir child."""
+        fill = self.append_fill if append else self.split_fill
+        # Uma chave sobe para o pai; as outras 2t - 2 se dividem entre os
+        # dois nós, e cada um fica com ao menos uma
+        return max(1, min(2 * self.t - 3,
+                          round(fill * (2 * self.t - 2))))
+
+    def _count_split(self, append):
+        self.metrics.inc('splits_total')
+        if append:
+            self.metrics.inc('append_splits_total')
+
+    def _split_child(self, parent: BTreeNode, index, append=False):
+        """Divide o filho no índice especificado.
+
+        Com append=True a chave que vai entrar é maior que todas as do
+        filho, e a divisão usa append_fill em vez de split_fill.
+        """
         child_id = parent.children[index]
         child = self.load_node(child_id)
-        new_child = BTreeNode(leaf=child.leaf)
-        new_child.node_id = str(uuid.uuid4())  # Novo ID único para o novo nó
+        new_child = self._new_node(leaf=child.leaf)  # Novo ID único para o novo nó
+        s = self._split_point(child, append)
+        self._count_split(append)
 
         # Mover as chaves e filhos apropriados para o novo nó
-        parent.keys.insert(index, child.keys[t - 1])
+        parent.keys.insert(index, child.keys[s])
+        parent.values.insert(index, child.values[s])
         parent.children.insert(index + 1, new_child.node_id)
 
         # Chaves e filhos do novo nó
-        new_child.keys = child.keys[t:(2 * t) - 1]
-        child.keys = child.keys[:t - 1]
+        new_child.keys = child.keys[s + 1:]
+        new_child.values = child.values[s + 1:]
+        child.keys = child.keys[:s]
+        child.values = child.values[:s]
 
         if not child.leaf:
-            new_child.children = child.children[t:(2 * t)]
-            child.children = child.children[:t]
+            new_child.children = child.children[s + 1:]
+            child.children = child.children[:s + 1]
 
         # Salvar nós no disco após a divisão
         self.save_node(child)
         self.save_node(new_child)
         self.save_node(parent)
 
+    @_timed
     def search(self, k, node=None):
-        """Busca uma chave k na árvore B."""
+        """Busca uma chave k na árvore B, descendo iterativamente a partir de node (ou da raiz)."""
+        k = self._encode(k)
+        if node is None and not self._maybe_present(k):
+            return None
+        return self._search(k, node)
+
+    def _search(self, k, node=None):
         if node is None:
+            if self._latches is not None:
+                if self._writer_thread != threading.get_ident():
+                    found = self._search_shared(k)
+                    return found and found[:2]
+                # O escritor mantém o caminho travado até o fim da operação
+                self._latch_root()
+            elif self._inner is not None:
+                return self._search_leaf(k)
             node = self.root
-        i = 0
-        while i < len(node.keys) and k > node.keys[i]:
-            i += 1
-        if i < len(node.keys) and k == node.keys[i]:
-            return (node, i)
-        elif node.leaf:
+        while node is not None:
+            i, match = self._locate(node, k)
+            if match:
+                return (node, i)
+            if node.leaf:
+                return None
+            node = self.load_node(node.children[i])
+        return None
+
+    def _search_leaf(self, k):
+        """Busca pela cópia dos níveis internos: só a folha é carregada."""
+        inner = self._inner
+        if inner.stale:
+            inner.rebuild(self.root, self.pool.get)
+            self.metrics.inc('inner_index_rebuilds_total')
+        leaf_id = inner.leaf_for(k)
+        if leaf_id is None:
+            return self._search(k, self.root)
+        node = self.load_node(leaf_id)
+        i, match = self._locate(node, k)
+        return (node, i) if match else None
+
+    def _search_shared(self, k, blocking=True, read=False):
+        """Busca com crabbing de leitura; retorna (nó, i, rid) ou None.
+
+        Com blocking=False a busca nunca espera: levanta WouldBlock se
+        precisar de um latch ocupado ou de um nó fora do cache. Com
+        read=True o terceiro item é o valor, lido ainda sob o latch da
+        folha: depois de soltá-lo, um escritor pode liberar o registro e
+        reaproveitar o slot para outra chave.
+        """
+        node, latch = self._shared_root(blocking)
+        if node is None:
             return None
-        else:
-            return self.search(k, self.load_node(node.children[i]))
+        try:
+            while True:
+                i, match = self._locate(node, k)
+                if match:
+                    # O rid é lido enquanto o nó ainda está travado
+                    rid = node.values[i]
+                    return node, i, self._read_record(rid) if read else rid
+                if node.leaf:
+                    return None
+                node, latch = self._shared_child(
+                    latch, node.children[i], blocking)
+        finally:
+            latch.release_shared()
+
+    def _locate(self, node: BTreeNode, k):
+        """Posição de k em node: retorna (i, True) se node.keys[i] == k ou (filho a descer, False)."""
+        i = bisect_left(node.keys, k)
+        return i, i < len(node.keys) and node.keys[i] == k
+
+    @_timed
+    def search_many(self, keys):
+        """Busca várias chaves com uma única descida compartilhada.
 
-    def update(self, old_k, new_k):
-        """Atualiza uma chave na árvore B."""
+        As chaves são ordenadas e repartidas entre os filhos de cada nó, de
+        modo que cada nó é lido uma só vez por lote. Retorna uma lista
+        alinhada com keys, com (nó, i) ou None para cada chave.
+        """
+        keys = [self._encode(k) for k in keys]
+        # Só descem as chaves que o filtro não descarta
+        group = sorted({k for k in keys if self._maybe_present(k)})
+        found = {}
+        if self._latches is not None:
+            node, latch = self._shared_root()
+            if node is not None:
+                try:
+                    self._search_group(node, group, found)
+                finally:
+                    latch.release_shared()
+        elif self.root is not None:
+            self._search_group(self.root, group, found)
+        return [found.get(k) for k in keys]
 
-        deleted = self.delete(old_k)  # Remove a chave antiga
-        if deleted:
-            self.insert(new_k)  # Insere a chave nova
+    def _search_group(self, node: BTreeNode, keys, found):
+        groups = {}
+        for k in keys:
+            i, match = self._locate(node, k)
+            if match:
+                found[k] = (node, i)
+            elif not node.leaf:
+                groups.setdefault(i, []).append(k)
+        for i, group in groups.items():
+            child_id = node.children[i]
+            if self._latches is None:
+                self._search_group(self.load_node(child_id), group, found)
+                continue
+            # O nó continua travado enquanto os seus filhos são visitados
+            latch = self._latches.get(child_id)
+            latch.acquire_shared()
+            try:
+                self._search_group(self.load_node(child_id), group, found)
+            finally:
+                latch.release_shared()
+
+    @_timed
+    def get(self, k, default=None):
+        """Retorna o valor associado à chave k (default se a chave não existe)."""
+        k = self._encode(k)
+        if not self._maybe_present(k):
+            return default
+        if self._latches is not None and \
+                self._writer_thread != threading.get_ident():
+            found = self._search_shared(k, read=True)
+            return default if found is None else found[2]
+        result = self._search(k)
+        if result is None:
+            return default
+        node, i = result
+        return self._read_record(node.values[i])
+
+    @_timed
+    @_writer
+    def update(self, old_k, new_k=None, value=None):
+        """Atualiza uma chave na árvore B e/ou o valor associado a ela.
+
+        Se new_k é omitido (ou igual a old_k), só o valor é regravado, no
+        próprio registro, sem remover e reinserir a chave.
+        """
+        self._check_writable()
+        old_k = self._encode(old_k)
+        if new_k is not None:
+            new_k = self._encode(new_k)
+            self._check_key_size((new_k,))
+        if not self._maybe_present(old_k):
+            return False
+        if new_k is None or new_k == old_k:
+            result = self._search(old_k)
+            if result is None:
+                return False
+            if value is not None:
+                node, i = result
+                rid = self._write_record(value, node.values[i])
+                if rid != node.values[i]:
+                    node.values[i] = rid
+                    self.save_node(node)
+                    self._commit()
             return True
-        else:
+
+        # Remove a chave antiga e insere a nova apontando para o mesmo registro
+        rid = self._delete_key(old_k)
+        if rid is None:
+            self._commit()
             return False
+        if self._filter is not None:
+            self._filter.remove(old_k)
+        if value is not None:
+            rid = self._write_record(value, rid)
+        self._filter_add((new_k,))
+        self._insert_key(new_k, rid)
+        self._commit()
+        return True
 
+    @_timed
+    @_writer
     def delete(self, k):
         """Remove uma chave k da árvore B."""
-        if self.search(k) is None:
+        self._check_writable()
+        k = self._encode(k)
+        if not self._maybe_present(k):
             return False
+        rid = self._delete_key(k)
+        if rid is not None:
+            self._free_record(rid)
+            self._count_keys(-1)
+            if self._filter is not None:
+                self._filter.remove(k)
+        self._commit()
+        if rid is None:
+            return False
+        # None indica que a árvore ficou vazia
+        return None if self.root is None else True
+
+    def _delete_key(self, k):
+        """Remove a chave k sem liberar o seu registro.
 
-        self._delete(self.root, k)
+        A descida é única: retorna o rid da chave removida ou None se k
+        não existe.
+        """
+        self._latch_root()
+        if self.root is None:
+            return None
+        rid = self._delete(self.root, k)
+        self._shrink_root(rid is not None)
+        return rid
 
+    def _shrink_root(self, removed):
+        """Ajusta a raiz depois de remoções que podem tê-la esvaziado."""
+        self._latch_root()
         # Após a exclusão, se a raiz está vazia e não é uma folha, promove o primeiro filho para a raiz
         if len(self.root.keys) == 0 and not self.root.leaf:
-            # Salva o antigo UUID da raiz para possível exclusão
+            # Salva o antigo ID da raiz para possível exclusão
             old_root_id = self.root.node_id
 
             # O novo nó raiz é o único filho da raiz atual
-            self.root = self.load_node(self.root.children[0])
-            self.save_root(self.root.node_id)  # Atualiza o UUID da nova raiz
+            self._set_root(self.load_node(self.root.children[0]))
 
             # Remove o antigo nó raiz se ele ainda existir
             if old_root_id != self.root.node_id:
-                self._remove_node_from_disk(old_root_id)
+                self._free_node(old_root_id)
 
-        elif len(self.root.keys) == 0 and self.root.leaf:
+        elif removed and len(self.root.keys) == 0 and self.root.leaf:
             # Se a raiz está vazia e é uma folha, a árvore está vazia, não há mais chaves
-            self.root = None
-            os.remove('database/root.json')
+            self._free_node(self.root.node_id)
+            self._set_root(None)
+        self._unlatch_all()
 
-            return None
+    @_timed
+    @_writer
+    def delete_many(self, keys):
+        """Remove um lote de chaves, agrupando as que caem na mesma folha.
 
-        if self.root:
-            self.save_node(self.root)
+        Cada folha é visitada uma vez por grupo e todo o lote vira uma única
+        transação. Retorna o nº de chaves removidas.
+        """
+        self._check_writable()
+        keys = sorted(k for k in map(self._encode, keys)
+                      if self._maybe_present(k))
+        deleted = []
+        pos = 0
+        while pos < len(keys) and self.root is not None:
+            pos = self._delete_run(keys, pos, deleted)
+        for k, rid in deleted:
+            self._free_record(rid)
+            if self._filter is not None:
+                self._filter.remove(k)
+        self._count_keys(-len(deleted))
+        self._commit()
+        return len(deleted)
 
-        return True
+    def _delete_run(self, keys, pos, deleted):
+        """Remove, a partir de keys[pos], as chaves da mesma folha; retorna a próxima posição.
 
-    def _remove_node_from_disk(self, node_id):
-        """Remove o nó do disco se ele existir."""
-        file_path = f'database/{node_id}.json'
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        Os pares (chave, rid) removidos são acrescentados a deleted.
+        """
+        min_keys = self._min_keys
+        self._latch_root()
+        node = self.root
+        k = keys[pos]
+        bound = None
+        path = []
+        removed = None
+        try:
+            # Desce como _delete, garantindo mais que o mínimo em cada filho
+            while not node.leaf:
+                self.pool.pin(node.node_id)
+                path.append(node.node_id)
+                i, match = self._locate(node, k)
+                if match:
+                    break
+                if len(self.load_node(node.children[i]).keys) <= min_keys:
+                    self._fill(node, i)
+                    i, match = self._locate(node, k)
+                    if match:
+                        break
+                if i < len(node.keys):
+                    bound = node.keys[i]
+                node = self.load_node(node.children[i])
+                self._crab(node)
+            else:
+                end = len(keys)
+                if bound is not None:
+                    end = bisect_left(keys, bound, pos, end)
+                # Só a raiz pode ficar abaixo do mínimo
+                spare = len(node.keys) - min_keys \
+                    if node is not self.root else end - pos
+                removed = 0
+                while pos < end and removed < spare:
+                    i = bisect_left(node.keys, keys[pos])
+                    if i < len(node.keys) and node.keys[i] == keys[pos]:
+                        node.keys.pop(i)
+                        deleted.append((keys[pos], node.values.pop(i)))
+                        removed += 1
+                    pos += 1
+                if removed:
+                    self.save_node(node)
+        finally:
+            for node_id in path:
+                self.pool.unpin(node_id)
+            self._unlatch_all()
+
+        if removed is not None:
+            self._shrink_root(removed > 0)
+            return pos
+
+        # A chave está em um nó interno: usa a remoção individual
+        rid = self._delete_key(k)
+        if rid is not None:
+            deleted.append((k, rid))
+        return pos + 1
 
     def _delete(self, node: BTreeNode, k):
-        t = self.t
-        i = 0
-        while i < len(node.keys) and k > node.keys[i]:
-            i += 1
+        """Remove k da subárvore de node; retorna o rid da chave ou None se ela não existe.
+
+        A descida é iterativa: antes de descer, um filho com o mínimo de
+        chaves (t - 1, ou menos com min_fill < 0.5) recebe mais uma, e uma
+        chave achada em um nó interno é trocada pela predecessora (ou
+        sucessora), que passa a ser a chave removida mais abaixo. Um nó
+        abaixo do mínimo, como o da direita de uma divisão de append, só
+        recebe chaves ao ser descido.
+        """
+        min_keys = self._min_keys
+        rid = None
+        path = []
+        try:
+            while not node.leaf:
+                self.pool.pin(node.node_id)
+                path.append(node.node_id)
+                i, match = self._locate(node, k)
+                child = self.load_node(node.children[i])
+
+                if match:
+                    if rid is None:
+                        rid = node.values[i]
+                    if len(child.keys) > min_keys:
+                        node.keys[i], node.values[i] = self._get_predecessor(node, i)
+                        self.save_node(node)
+                        k = node.keys[i]
+                    elif len(self.load_node(node.children[i + 1]).keys) > min_keys:
+                        node.keys[i], node.values[i] = self._get_successor(node, i)
+                        self.save_node(node)
+                        k = node.keys[i]
+                        i += 1
+                    else:
+                        self._merge(node, i)
+                    node = self.load_node(node.children[i])
+                    self._crab(node)
+                    continue
+
+                # Verifica se o filho a ser descido tem o mínimo de chaves
+                if len(child.keys) <= min_keys:
+                    self._fill(node, i)
+                    # Uma fusão muda as posições: localiza k de novo
+                    i, _ = self._locate(node, k)
+                node = self.load_node(node.children[i])
+                self._crab(node)
 
-        if node.leaf:
             # Se o nó é uma folha e contém a chave, remove a chave
-            if i < len(node.keys) and node.keys[i] == k:
+            i, match = self._locate(node, k)
+            if match:
                 node.keys.pop(i)
+                leaf_rid = node.values.pop(i)
                 self.save_node(node)
-            return
-
-        child = self.load_node(node.children[i])
-
-        if i < len(node.keys) and node.keys[i] == k:
-            if len(child.keys) >= t:
-                node.keys[i] = self._get_predecessor(node, i)
-                self._delete(self.load_node(node.children[i]), node.keys[i])
-            elif len(self.load_node(node.children[i + 1]).keys) >= t:
-                node.keys[i] = self._get_successor(node, i)
-                self._delete(self.load_node(
-                    node.children[i + 1]), node.keys[i])
-            else:
-                self._merge(node, i)
-                self._delete(self.load_node(node.children[i]), k)
-        else:
-            # Verifica se o filho a ser descido tem o mínimo de chaves
-            if len(child.keys) < t:
-                self._fill(node, i)
-            # Corrige o carregamento do nó após possível fusão
-            if i < len(node.children):
-                self._delete(self.load_node(node.children[i]), k)
-            else:
-                self._delete(self.load_node(node.children[i - 1]), k)
+                if rid is None:
+                    rid = leaf_rid
+            return rid
+        finally:
+            for node_id in path:
+                self.pool.unpin(node_id)
+            self._unlatch_all()
 
     def _get_predecessor(self, node: BTreeNode, i):
+        """Retorna a maior chave (e seu registro) da subárvore à esquerda."""
         current = self.load_node(node.children[i])
         while not current.leaf:
             current = self.load_node(current.children[-1])
-        return current.keys[-1]
+        return current.keys[-1], current.values[-1]
 
     def _get_successor(self, node: BTreeNode, i):
+        """Retorna a menor chave (e seu registro) da subárvore à direita."""
         current = self.load_node(node.children[i + 1])
         while not current.leaf:
             current = self.load_node(current.children[0])
-        return current.keys[0]
+        return current.keys[0], current.values[0]
 
     def _merge(self, node: BTreeNode, i):
+        self.metrics.inc('merges_total')
         child = self.load_node(node.children[i])
         sibling = self.load_node(node.children[i + 1])
 
         # Mover chave do nó pai para o nó filho
         child.keys.append(node.keys[i])
+        child.values.append(node.values[i])
         child.keys.extend(sibling.keys)
+        child.values.extend(sibling.values)
 
         if not child.leaf:
             child.children.extend(sibling.children)
 
         node.keys.pop(i)
+        node.values.pop(i)
         node.children.pop(i + 1)
 
         self.save_node(child)
         self.save_node(node)
 
         # Remover nó irmão do disco
-        os.remove(f'database/{sibling.node_id}.json')
+        self._free_node(sibling.node_id)
 
     def _fill(self, node: BTreeNode, i):
-        t = self.t
-        if i != 0 and len(self.load_node(node.children[i - 1]).keys) >= t:
+        # Com os dois vizinhos no mínimo, a fusão cabe em um nó (2 * mínimo + 1)
+        min_keys = self._min_keys
+        if i != 0 and len(self.load_node(node.children[i - 1]).keys) > min_keys:
+            self.metrics.inc('borrows_total')
             self._borrow_from_prev(node, i)
-        elif i != len(node.keys) and len(self.load_node(node.children[i + 1]).keys) >= t:
+        elif i != len(node.keys) and len(self.load_node(node.children[i + 1]).keys) > min_keys:
+            self.metrics.inc('borrows_total')
             self._borrow_from_next(node, i)
         else:
             if i != len(node.keys):
@@ -277,9 +1321,11 @@ class BTree:
         child = self.load_node(node.children[i])
         sibling = self.load_node(node.children[i - 1])
         child.keys.insert(0, node.keys[i - 1])
+        child.values.insert(0, node.values[i - 1])
         if not child.leaf:
             child.children.insert(0, sibling.children.pop())
         node.keys[i - 1] = sibling.keys.pop()
+        node.values[i - 1] = sibling.values.pop()
         self.save_node(child)
         self.save_node(sibling)
         self.save_node(node)
@@ -288,13 +1334,372 @@ class BTree:
         child = self.load_node(node.children[i])
         sibling = self.load_node(node.children[i + 1])
         child.keys.append(node.keys[i])
+        child.values.append(node.values[i])
         if not child.leaf:
             child.children.append(sibling.children.pop(0))
         node.keys[i] = sibling.keys.pop(0)
+        node.values[i] = sibling.values.pop(0)
         self.save_node(child)
         self.save_node(sibling)
         self.save_node(node)
 
+    @_timed
+    @_writer
+    def bulk_load(self, items, fill_factor=1.0, presorted=False, pairs=False):
+        """Constrói a árvore de baixo para cima a partir de muitas chaves de uma vez.
+
+        items são chaves (ou pares (chave, valor) com pairs=True); com
+        presorted=True a ordenação é pulada e apenas verificada. As folhas
+        são gravadas em sequência, já com fill_factor da capacidade, e os
+        níveis internos são montados por cima, gravando cada página uma
+        única vez. A árvore precisa estar vazia. Retorna o nº de chaves.
+        """
+        self._check_writable()
+        if self.root is not None and self.root.keys:
+            raise ValueError('bulk_load exige uma árvore vazia')
+        if not 0 < fill_factor <= 1:
+            raise ValueError('fill_factor deve estar em (0, 1]')
+
+        if pairs:
+            items = [(self._encode(key), value) for key, value in items]
+            if not presorted:
+                items.sort(key=lambda item: item[0])
+            keys = [key for key, _ in items]
+            self._check_key_size(keys)
+            rids = [self._write_record(value) if value is not None else 0
+                    for _, value in items]
+        else:
+            keys = [self._encode(key) for key in items]
+            if not presorted:
+                keys.sort()
+            self._check_key_size(keys)
+            rids = [0] * len(keys)
+        if presorted and any(keys[i] > keys[i + 1]
+                             for i in range(len(keys) - 1)):
+            raise ValueError('As chaves não estão ordenadas')
+        count = len(keys)
+        if not count:
+            return 0
+        all_keys = keys
+
+        max_keys = (2 * self.t) - 1
+        cap = max(self.t - 1, min(max_keys, int(fill_factor * max_keys)))
+
+        self._latch_root()
+        if self.root is not None:
+            self._free_node(self.root.node_id)
+        children, keys, rids, root = self._build_leaves(keys, rids, cap)
+        while len(children) > 1:
+            children, keys, rids, root = self._build_level(
+                keys, rids, children, cap, leaf=False)
+
+        # As páginas foram gravadas direto no pager, fora do cache e do WAL
+        self.pager.flush()
+        self.pool.put(root, dirty=False)
+        self._set_root(root)
+        self._key_count = count
+        self._commit()
+        if self._filter is not None:
+            self._build_filter(all_keys)
+        return count
+
+    def _partition(self, count, cap, gap):
+        """Divide count chaves em nós de até cap chaves (e no mínimo t - 1).
+
+        gap é o nº de chaves que sobem para o pai entre dois nós vizinhos
+        (1 na árvore B; 0 nas folhas da árvore B+, que só copiam a chave).
+        Retorna a lista com o nº de chaves de cada nó.
+        """
+        min_keys = self.t - 1
+        nodes = -(-(count + gap) // (cap + gap))
+        if nodes > 1 and (count + gap) // nodes - gap < min_keys:
+            nodes = max(1, (count + gap) // (min_keys + gap))
+        base, extra = divmod(count - gap * (nodes - 1), nodes)
+        return [base + 1 if n < extra else base for n in range(nodes)]
+
+    def _build_leaves(self, keys, rids, cap):
+        return self._build_level(keys, rids, None, cap, leaf=True)
+
+    def _build_level(self, keys, rids, children, cap, leaf):
+        """Grava um nível completo da árvore e retorna os dados do nível acima.
+
+        Retorna (IDs dos nós, separadores, rids dos separadores, último nó).
+        """
+        ids, up_keys, up_rids = [], [], []
+        pos = child_pos = 0
+        node = None
+        sizes = self._partition(len(keys), cap, gap=1)
+        for n, size in enumerate(sizes):
+            node = self._new_node(leaf=leaf)
+            node.keys = self._key_array(keys[pos:pos + size])
+            node.values = BTreeNode.int_array(rids[pos:pos + size])
+            if not leaf:
+                node.children = BTreeNode.int_array(
+                    children[child_pos:child_pos + size + 1])
+                child_pos += size + 1
+            pos += size
+            self.pager.write_node(node)
+            ids.append(node.node_id)
+            if n < len(sizes) - 1:
+                # A chave entre dois nós vizinhos sobe como separador
+                up_keys.append(keys[pos])
+                up_rids.append(rids[pos])
+                pos += 1
+        return ids, up_keys, up_rids, node
+
+    @_writer
+    def stats(self, fill_factor=0.9):
+        """Retorna o espaço ocupado pela árvore, para decidir quando compact() compensa.
+
+        Traz o nº de nós, folhas e chaves, a altura, o preenchimento médio
+        (chaves por nó sobre a capacidade 2t - 1), as páginas livres e as
+        órfãs (guardadas, mas fora da árvore e da lista livre), o espaço
+        morto em bytes e quantos nós sobrariam com o nó preenchido até
+        fill_factor.
+        """
+        max_keys = 2 * self.t - 1
+        nodes = leaves = keys = leaf_keys = 0
+        live = set()
+        for node in self._all_nodes():
+            live.add(node.node_id)
+            nodes += 1
+            keys += len(node.keys)
+            if node.leaf:
+                leaves += 1
+                leaf_keys += len(node.keys)
+        internal = nodes - leaves
+
+        free = len(self.pager.free_pages())
+        stored = self.pager.node_ids()
+        # Nós liberados com WAL só voltam à lista livre no checkpoint
+        pending = len(self._pending_frees) + len(self._txn_frees)
+        orphans = None if stored is None else \
+            max(0, len(stored - live) - pending)
+        page_size = getattr(self.pager, 'page_size', None)
+        dead = free + pending + (orphans or 0)
+        target = max(1, int(fill_factor * max_keys))
+        return {
+            'height': self.height(),
+            'nodes': nodes,
+            'leaves': leaves,
+            'keys': keys,
+            'avg_fill': keys / (nodes * max_keys) if nodes else 0.0,
+            'leaf_fill': leaf_keys / (leaves * max_keys) if leaves else 0.0,
+            'internal_fill': (keys - leaf_keys) / (internal * max_keys)
+            if internal else 0.0,
+            'free_pages': free + pending,
+            'orphan_pages': orphans,
+            'dead_bytes': dead * page_size if page_size else None,
+            'leaves_after_compact': -(-leaf_keys // target),
+        }
+
+    def compact(self, fill_factor=0.9, max_steps=None):
+        """Reempacota nós pouco cheios e libera páginas órfãs; retorna o que foi feito.
+
+        O trabalho é feito em passos curtos (veja compact_steps), cada um
+        uma transação própria, e buscas e escritas seguem entre eles. Com
+        max_steps a compactação para depois desse nº de passos (done=False
+        no resultado); uma nova chamada recomeça do início.
+        """
+        summary = {'steps': 0, 'merged': 0, 'orphans': 0, 'done': False}
+        steps = self.compact_steps(fill_factor)
+        for progress in steps:
+            summary.update(progress)
+            summary['steps'] += 1
+            if max_steps is not None and summary['steps'] >= max_steps:
+                steps.close()
+                return summary
+        summary['done'] = True
+        return summary
+
+    def compact_steps(self, fill_factor=0.9):
+        """Gerador da compactação: cada next() executa um passo e retorna o progresso.
+
+        Os nós são reempacotados nível a nível, de baixo para cima: cada
+        passo trata os filhos de um único nó, enchendo cada filho até
+        fill_factor com chaves do vizinho da direita e fundindo os vizinhos
+        que cabem juntos em um nó; se pais foram fundidos, a passada se
+        repete. O último passo devolve à lista livre as páginas que não são
+        alcançáveis a partir da raiz.
+        """
+        if not 0 < fill_factor <= 1:
+            raise ValueError('fill_factor deve estar em (0, 1]')
+        self._check_writable()
+        target = max(1, int(fill_factor * (2 * self.t - 1)))
+        progress = {'merged': 0, 'orphans': 0}
+        level = 1  # Nível dos pais cujos filhos são reempacotados (folhas = 0)
+        cursor = None
+        regrouped = False  # Houve fusões acima do nível 1 nesta passada
+        while True:
+            result = self._compact_step(level, cursor, target)
+            if result is None:
+                if not regrouped:
+                    break
+                # Pais fundidos juntam filhos que ainda podem ser reempacotados
+                level, cursor, regrouped = 1, None, False
+                continue
+            merged, cursor = result
+            progress['merged'] += merged
+            regrouped = regrouped or (merged and level > 1)
+            if cursor is None:
+                level += 1  # O nível terminou: recomeça no de cima
+            yield dict(progress)
+        progress['orphans'] = self._reclaim_orphans()
+        yield dict(progress)
+
+    @_writer
+    def _compact_step(self, level, cursor, target):
+        """Reempacota os filhos do nó do nível level que cobre cursor.
+
+        Retorna (nº de fusões, cursor do próximo nó do nível) ou None se o
+        nível não existe mais. O cursor é o menor separador à direita do
+        caminho, como em _insert_run; None indica que o nível terminou.
+        """
+        height = self.height()
+        # height() deixa travado o caminho mais à esquerda
+        self._unlatch_all()
+        if self.root is None or level >= height:
+            return None
+        self._latch_root()
+        node = self.root
+        bound = None
+        path = []
+        try:
+            for _ in range(height - 1 - level):
+                self.pool.pin(node.node_id)
+                path.append(node.node_id)
+                i = 0 if cursor is None else bisect_right(node.keys, cursor)
+                if i < len(node.keys):
+                    bound = node.keys[i]
+                node = self.load_node(node.children[i])
+                self._crab(node)
+            self.pool.pin(node.node_id)
+            path.append(node.node_id)
+            merged = self._repack_children(node, target)
+        finally:
+            for node_id in path:
+                self.pool.unpin(node_id)
+            self._unlatch_all()
+        self._shrink_root(False)
+        self._commit()
+        return merged, bound
+
+    def _repack_children(self, node: BTreeNode, target):
+        """Enche cada filho de node até target chaves e funde os vizinhos que cabem juntos."""
+        merged = 0
+        i = 0
+        while i < len(node.keys):
+            child = self.load_node(node.children[i])
+            sibling = self.load_node(node.children[i + 1])
+            # Na árvore B (e nos nós internos da B+) o separador desce na fusão
+            separator = 1 if self.INTERNAL_ENTRIES or not child.leaf else 0
+            if len(child.keys) + separator + len(sibling.keys) <= target and \
+                    (node is self.root or len(node.keys) > 1):
+                # Fora da raiz, o nó fica com ao menos dois filhos
+                self._merge(node, i)
+                merged += 1
+                continue
+            while len(child.keys) < target and len(sibling.keys) > 1:
+                self._borrow_from_next(node, i)
+                # Sem pin, o nó pode ter saído do cache e sido relido
+                child = self.load_node(node.children[i])
+                sibling = self.load_node(node.children[i + 1])
+            i += 1
+        return merged
+
+    @_writer
+    def _reclaim_orphans(self):
+        """Libera as páginas guardadas que não são alcançáveis a partir da raiz.
+
+        Páginas assim sobram, por exemplo, de uma queda entre a alocação de
+        um nó e a gravação da transação que o liga à árvore. Com snapshots
+        abertos nada é liberado.
+        """
+        if self._snapshots:
+            return 0
+        # Aplica as liberações pendentes do WAL antes de comparar
+        self.checkpoint()
+        stored = self.pager.node_ids()
+        if stored is None:
+            return 0
+        live = {node.node_id for node in self._all_nodes()}
+        self._unlatch_all()
+        orphans = stored - live
+        for node_id in orphans:
+            self._free_node(node_id)
+        self._commit()
+        return len(orphans)
+
+    @_writer
+    def snapshot(self):
+        """Retorna uma visão somente leitura da árvore como ela está agora.
+
+        As escritas seguem normalmente: antes de alterar um nó pela primeira
+        vez depois do snapshot, o escritor guarda a imagem anterior dele, e
+        o snapshot lê essas imagens. Registros removidos ou regravados só
+        são liberados depois que todos os snapshots forem fechados.
+        """
+        epoch = self._epoch
+        self._epoch += 1
+        self._snapshots[epoch] = self._snapshots.get(epoch, 0) + 1
+        return Snapshot(self, epoch,
+                        None if self.root is None else self.root.node_id)
+
+    @_writer
+    def _release_snapshot(self, epoch):
+        """Fecha um snapshot, descartando as imagens que nenhum outro usa."""
+        count = self._snapshots.pop(epoch) - 1
+        if count:
+            self._snapshots[epoch] = count
+        with self._versions_lock:
+            if not self._snapshots:
+                self._versions = {}
+            else:
+                # Nenhum snapshot aberto escolhe imagens de época <= oldest
+                oldest = min(self._snapshots)
+                for node_id, images in list(self._versions.items()):
+                    images = [image for image in images if image[0] > oldest]
+                    if images:
+                        self._versions[node_id] = images
+                    else:
+                        del self._versions[node_id]
+        if not self._snapshots:
+            rids, self._snapshot_record_frees = self._snapshot_record_frees, []
+            for rid in rids:
+                self._free_record(rid)
+
+    def _preserve(self, node):
+        """Guarda a imagem do nó antes que ele seja alterado na época atual."""
+        if node is None:
+            return
+        with self._versions_lock:
+            images = self._versions.setdefault(node.node_id, [])
+            if not images or images[-1][0] != self._epoch:
+                images.append((self._epoch, node.copy()))
+
+    def _node_at(self, node_id, epoch):
+        """Retorna o nó como ele estava quando o snapshot da época foi criado."""
+        def image():
+            with self._versions_lock:
+                for tag, node in self._versions.get(node_id, ()):
+                    if tag > epoch:
+                        return node
+            return None
+
+        node = image()
+        if node is not None:
+            return node
+        if self._latches is None:
+            return self.pool.get(node_id).copy()
+        # O escritor guarda a imagem e altera o nó com o latch exclusivo
+        latch = self._latches.get(node_id)
+        latch.acquire_shared()
+        try:
+            node = image()
+            return node if node is not None else self.pool.get(node_id).copy()
+        finally:
+            latch.release_shared()
+
     def display(self, node=None, level=0):
         """Exibe a árvore (apenas para debug)."""
         if node is None:
@@ -1,22 +1,111 @@
 import json
-import os
+import struct
+import sys
 import uuid
+from array import array
 
 
 class BTreeNode:
+    """Nó da árvore B com chaves, registros e filhos em arrays de inteiros de 64 bits.
+
+    Os atributos ficam em __slots__ e as listas de inteiros em array('q'),
+    sem um objeto int por elemento. Os filhos só ficam em uma lista comum
+    quando os IDs não são inteiros (UUIDs do formato legado em JSON), e as
+    chaves quando são bytes (árvores com um codec de chaves, veja keys.py).
+    Chaves em bytes são gravadas com compressão de prefixo: o prefixo comum
+    a todas as chaves do nó aparece uma só vez.
+    """
+
+    __slots__ = ('leaf', 'keys', 'values', 'children', 'prev_leaf',
+                 'next_leaf', 'node_id')
+
+    # Versão do formato binário gravado por to_bytes (a 2 não tinha
+    # registros, a 3 não tinha os ponteiros entre folhas e a 4 só tinha
+    # chaves inteiras)
+    FORMAT_VERSION = 5
+    SUPPORTED_VERSIONS = (2, 3, 4, 5)
+    # versão, flags, nº de chaves, nº de filhos
+    HEADER = struct.Struct('<BBHH')
+    # folha anterior e próxima (0 = nenhuma), logo após o cabeçalho
+    LINKS = struct.Struct('<qq')
+    FLAG_LEAF = 0x01
+    FLAG_VALUES = 0x02  # Há um rid por chave logo após as chaves
+    FLAG_LINKS = 0x04  # Folha encadeada às vizinhas (árvore B+)
+    FLAG_BYTES_KEYS = 0x08  # Chaves em bytes, com prefixo comum
+    # Tamanho da seção de chaves em bytes, após os ponteiros entre folhas
+    KEYS_SIZE = struct.Struct('<I')
+    # Tamanho do prefixo comum e de cada sufixo
+    KEY_LENGTH = struct.Struct('<H')
+
     def __init__(self, leaf=False, node_id=None):
         self.leaf = leaf  # True se o nó for uma folha
-        self.keys = []  # Lista de chaves
-        self.children = []  # Lista de IDs dos filhos
+        self.keys = array('q')  # Chaves
+        self.values = array('q')  # IDs dos registros de cada chave (0 = sem registro)
+        # IDs dos filhos: páginas do arquivo ou UUIDs do formato legado
+        self.children = array('q') if isinstance(node_id, int) else []
+        # Folhas vizinhas, usadas apenas pela árvore B+
+        self.prev_leaf = None
+        self.next_leaf = None
         # Gerar um UUID único para cada nó se não for fornecido
         self.node_id = node_id or str(uuid.uuid4())
 
+    @staticmethod
+    def int_array(items):
+        """Converte items para array('q'), mantendo uma lista se eles não forem inteiros."""
+        try:
+            return array('q', items)
+        except (TypeError, OverflowError):
+            return list(items)
+
+    @staticmethod
+    def max_size(max_keys, key_size=None):
+        """Maior tamanho em bytes, em to_bytes, de um nó com max_keys chaves.
+
+        key_size é o tamanho máximo de cada chave em bytes, ou None para
+        chaves inteiras.
+        """
+        size = BTreeNode.HEADER.size + BTreeNode.LINKS.size
+        size += max_keys * 8 + (max_keys + 1) * 8  # Registros e filhos
+        if key_size is None:
+            return size + max_keys * 8
+        return size + BTreeNode.KEYS_SIZE.size + BTreeNode.KEY_LENGTH.size + \
+            max_keys * (BTreeNode.KEY_LENGTH.size + key_size)
+
+    def memory_size(self):
+        """Mede os bytes ocupados pelo nó em memória, incluindo os seus arrays."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.node_id)
+        for items in (self.keys, self.values, self.children):
+            size += sys.getsizeof(items)
+            if isinstance(items, list):
+                size += sum(sys.getsizeof(item) for item in items)
+        return size
+
+    def copy(self):
+        """Retorna uma cópia do nó que não compartilha os arrays com ele."""
+        node = BTreeNode(leaf=self.leaf, node_id=self.node_id)
+        node.keys = BTreeNode.int_array(self.keys)
+        node.values = BTreeNode.int_array(self.values)
+        node.children = BTreeNode.int_array(self.children)
+        node.prev_leaf = self.prev_leaf
+        node.next_leaf = self.next_leaf
+        return node
+
+    def _bytes_keys(self):
+        # Um nó vazio de uma árvore com codec também tem as chaves em lista
+        keys = self.keys
+        return isinstance(keys, list) and (not keys or isinstance(keys[0], bytes))
+
     def to_dict(self):
         """Converte o nó em um dicionário para facilitar a serialização JSON."""
         return {
             'leaf': self.leaf,
-            'keys': self.keys,
-            'children': self.children,  # Salva apenas os IDs dos filhos
+            'keys': [key.hex() if isinstance(key, bytes) else key
+                     for key in self.keys],
+            'bytes_keys': self._bytes_keys(),
+            'values': list(self.values),
+            'children': list(self.children),  # Salva apenas os IDs dos filhos
+            'prev_leaf': self.prev_leaf,
+            'next_leaf': self.next_leaf,
             'node_id': self.node_id
         }
 
@@ -24,25 +113,229 @@ class BTreeNode:
     def from_dict(data):
         """Reconstrói um nó a partir de um dicionário."""
         node = BTreeNode(leaf=data['leaf'], node_id=data['node_id'])
-        node.keys = data['keys']
-        node.children = data['children']  # Armazena apenas os IDs dos filhos
+        if data.get('bytes_keys'):
+            node.keys = [bytes.fromhex(key) for key in data['keys']]
+        else:
+            node.keys = BTreeNode.int_array(data['keys'])
+        node.values = BTreeNode.int_array(
+            data.get('values') or [0] * len(node.keys))
+        # Armazena apenas os IDs dos filhos
+        node.children = BTreeNode.int_array(data['children'])
+        node.prev_leaf = data.get('prev_leaf')
+        node.next_leaf = data.get('next_leaf')
         return node
 
-    def save_to_disk(self):
-        """Salva o nó em um arquivo com o nome do seu identificador."""
-        # Certifique-se de que o diretório 'database' existe
-        if not os.path.exists('database'):
-            os.makedirs('database')
+    def to_bytes(self):
+        """Serializa o nó no formato binário: cabeçalho, chaves, registros e filhos em int64."""
+        bytes_keys = self._bytes_keys()
+        if bytes_keys:
+            keys = self._pack_keys(self.keys)
+        else:
+            keys = array('q', self.keys)
+        # Os rids só são gravados se alguma chave tiver registro
+        values = array('q', self.values if any(self.values) else ())
+        children = array('q', self.children)
+        if sys.byteorder != 'little':
+            if not bytes_keys:
+                keys.byteswap()
+            values.byteswap()
+            children.byteswap()
+        flags = self.FLAG_LEAF if self.leaf else 0
+        if values:
+            flags |= self.FLAG_VALUES
+        linked = self.prev_leaf is not None or self.next_leaf is not None
+        if linked:
+            flags |= self.FLAG_LINKS
+        if bytes_keys:
+            flags |= self.FLAG_BYTES_KEYS
+        header = self.HEADER.pack(self.FORMAT_VERSION, flags,
+                                  len(self.keys), len(children))
+        if linked:
+            header += self.LINKS.pack(self.prev_leaf or 0, self.next_leaf or 0)
+        if bytes_keys:
+            header += self.KEYS_SIZE.pack(len(keys))
+        else:
+            keys = keys.tobytes()
+        return header + keys + values.tobytes() + children.tobytes()
+
+    @staticmethod
+    def _pack_keys(keys):
+        """Grava chaves em bytes ordenadas como prefixo comum + sufixos."""
+        prefix = b''
+        if keys:
+            # Em chaves ordenadas o prefixo comum é o da primeira com a última
+            first, last = keys[0], keys[-1]
+            size = 0
+            while size < min(len(first), len(last)) and \
+                    first[size] == last[size]:
+                size += 1
+            prefix = first[:size]
+        length = BTreeNode.KEY_LENGTH.pack
+        parts = [length(len(prefix)), prefix]
+        for key in keys:
+            parts.append(length(len(key) - len(prefix)))
+            parts.append(key[len(prefix):])
+        return b''.join(parts)
+
+    @staticmethod
+    def _unpack_keys(view, count):
+        """Inverso de _pack_keys: retorna a lista de chaves."""
+        data = bytes(view)
+        unpack = BTreeNode.KEY_LENGTH.unpack_from
+        step = BTreeNode.KEY_LENGTH.size
+        size, = unpack(data, 0)
+        prefix = data[step:step + size]
+        pos = step + size
+        keys = []
+        for _ in range(count):
+            size, = unpack(data, pos)
+            pos += step
+            keys.append(prefix + data[pos:pos + size])
+            pos += size
+        return keys
+
+    @staticmethod
+    def _layout(view):
+        """Interpreta o cabeçalho binário: (flags, nº de chaves, folhas vizinhas, limites das seções)."""
+        version, flags, key_count, child_count = \
+            BTreeNode.HEADER.unpack_from(view)
+        if version not in BTreeNode.SUPPORTED_VERSIONS:
+            raise ValueError(f'Versão de nó não suportada: {version}')
 
-        with open(f'database/{self.node_id}.json', 'w') as f:
-            json.dump(self.to_dict(), f)
+        start = BTreeNode.HEADER.size
+        prev_leaf = next_leaf = 0
+        if flags & BTreeNode.FLAG_LINKS:
+            prev_leaf, next_leaf = BTreeNode.LINKS.unpack_from(view, start)
+            start += BTreeNode.LINKS.size
+        if flags & BTreeNode.FLAG_BYTES_KEYS:
+            keys_size, = BTreeNode.KEYS_SIZE.unpack_from(view, start)
+            start += BTreeNode.KEYS_SIZE.size
+            keys_end = start + keys_size
+        else:
+            keys_end = start + key_count * 8
+        values_end = keys_end
+        if flags & BTreeNode.FLAG_VALUES:
+            values_end += key_count * 8
+        end = values_end + child_count * 8
+        return (flags, key_count, prev_leaf or None, next_leaf or None,
+                (start, keys_end, values_end, end))
 
     @staticmethod
-    def load_from_disk(node_id):
-        """Carrega o nó de um arquivo."""
-        file_path = f'database/{node_id}.json'
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                return BTreeNode.from_dict(data)
-        return None
+    def _int_view(view):
+        """Vê bytes little-endian como inteiros de 64 bits, sem copiá-los."""
+        if sys.byteorder != 'little':
+            # memoryview não troca a ordem dos bytes; copia só nesse caso
+            items = array('q')
+            items.frombytes(view)
+            items.byteswap()
+            return memoryview(items)
+        return view.cast('q')
+
+    @staticmethod
+    def _read_keys(view, flags, key_count, start, keys_end):
+        if flags & BTreeNode.FLAG_BYTES_KEYS:
+            return BTreeNode._unpack_keys(view[start:keys_end], key_count)
+        return BTreeNode._int_view(view[start:keys_end])
+
+    @staticmethod
+    def read_keys(data):
+        """Retorna as chaves de um nó binário (inteiras como memoryview, sem copiá-las)."""
+        view = memoryview(data)
+        flags, key_count, _, _, (start, keys_end, _, _) = \
+            BTreeNode._layout(view)
+        return BTreeNode._read_keys(view, flags, key_count, start, keys_end)
+
+    @staticmethod
+    def from_bytes(data, node_id=None):
+        """Reconstrói um nó a partir de to_bytes (ou do JSON de versões antigas)."""
+        view = memoryview(data)
+        if view[0] == ord('{'):
+            # Formato 1: nó serializado como JSON
+            node = BTreeNode.from_dict(json.loads(bytes(view)))
+            if node_id is not None:
+                node.node_id = node_id
+            return node
+
+        flags, key_count, prev_leaf, next_leaf, \
+            (start, keys_end, values_end, end) = BTreeNode._layout(view)
+        node = BTreeNode(leaf=bool(flags & BTreeNode.FLAG_LEAF),
+                         node_id=node_id)
+        node.prev_leaf = prev_leaf
+        node.next_leaf = next_leaf
+        if flags & BTreeNode.FLAG_BYTES_KEYS:
+            node.keys = BTreeNode._unpack_keys(view[start:keys_end], key_count)
+        else:
+            node.keys = array('q')
+            node.keys.frombytes(view[start:keys_end])
+        node.values = array('q')
+        if values_end > keys_end:
+            node.values.frombytes(view[keys_end:values_end])
+        else:
+            node.values.frombytes(bytes(key_count * 8))
+        node.children = array('q')
+        node.children.frombytes(view[values_end:end])
+        if sys.byteorder != 'little':
+            if not isinstance(node.keys, list):
+                node.keys.byteswap()
+            node.values.byteswap()
+            node.children.byteswap()
+        return node
+
+
+class LazyNode(BTreeNode):
+    """Nó somente leitura decodificado sob demanda a partir de um buffer (ex.: mmap).
+
+    Na criação só o cabeçalho é lido e as chaves viram uma memoryview do
+    próprio buffer. Registros e filhos só são interpretados no primeiro
+    acesso, também sem cópia. Os arrays não aceitam inserções: o nó serve
+    apenas para leituras.
+    """
+
+    __slots__ = ('_view', '_bounds', '_values', '_children')
+
+    def __init__(self, view, node_id):
+        flags, key_count, self.prev_leaf, self.next_leaf, self._bounds = \
+            self._layout(view)
+        start, keys_end, _, _ = self._bounds
+        self.leaf = bool(flags & self.FLAG_LEAF)
+        self.node_id = node_id
+        # Chaves em bytes precisam ser remontadas (prefixo + sufixo)
+        self.keys = self._read_keys(view, flags, key_count, start, keys_end)
+        self._view = view
+        self._values = None
+        self._children = None
+
+    @staticmethod
+    def from_view(view, node_id):
+        """Cria o nó sobre view; nós em JSON (formato 1) são decodificados por inteiro."""
+        view = memoryview(view)
+        if view[0] == ord('{'):
+            return BTreeNode.from_bytes(view, node_id)
+        return LazyNode(view, node_id)
+
+    @property
+    def values(self):
+        if self._values is None:
+            _, keys_end, values_end, _ = self._bounds
+            if values_end > keys_end:
+                self._values = self._int_view(self._view[keys_end:values_end])
+            else:
+                self._values = memoryview(bytes(len(self.keys) * 8)).cast('q')
+        return self._values
+
+    @property
+    def children(self):
+        if self._children is None:
+            _, _, values_end, end = self._bounds
+            self._children = self._int_view(self._view[values_end:end])
+        return self._children
+
+    def memory_size(self):
+        # O conteúdo fica no buffer mapeado; contam só os objetos do nó
+        size = sys.getsizeof(self) + sys.getsizeof(self.keys)
+        if isinstance(self.keys, list):
+            size += sum(sys.getsizeof(key) for key in self.keys)
+        for view in (self._values, self._children):
+            if view is not None:
+                size += sys.getsizeof(view)
+        return size
@@ -0,0 +1,242 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class BufferPool:
+    """Cache de nós com política LRU ou CLOCK, pinagem e escrita adiada.
+
+    Nós alterados são apenas marcados como sujos; eles só são gravados no
+    pager quando saem do cache ou quando flush() é chamado. Nós pinados
+    (como os do caminho raiz-folha em uso) nunca são despejados.
+    """
+
+    POLICIES = ('lru', 'clock')
+
+    def __init__(self, pager, capacity=100, max_bytes=None, policy='lru'):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Política de despejo desconhecida: {policy}')
+        self.pager = pager
+        self.capacity = capacity  # Limite em nº de nós (None = sem limite)
+        self.max_bytes = max_bytes  # Limite em bytes medidos (None = sem limite)
+        self.policy = policy
+
+        self.frames = OrderedDict()  # node_id -> nó, do mais antigo ao mais novo
+        self.dirty = set()
+        self.pins = {}  # node_id -> contador de pinos
+        self.referenced = set()  # Bits de referência da política CLOCK
+        self.sizes = {}
+        self.used_bytes = 0
+        # Leituras em andamento: node_id -> Event sinalizado ao fim da carga.
+        # Faltas simultâneas no mesmo nó esperam por uma única leitura
+        self.loading = {}
+        # Protege as estruturas do cache quando várias threads o usam
+        self.lock = threading.RLock()
+        # Todos os nós estavam pinados no último despejo: só vale tentar de
+        # novo depois que algum pino for solto
+        self.stalled = False
+        # Chamado antes de gravar nós sujos no pager (ex.: sincronizar o WAL)
+        self.before_write = None
+        # Chamado ao fim de flush(), com todos os nós já gravados
+        self.after_flush = None
+        # Métricas da árvore (metrics.py); None = sem medir leituras e gravações
+        self.metrics = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dirty_flushes = 0
+        self.coalesced = 0
+
+    def __contains__(self, node_id):
+        return node_id in self.frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _node_size(self, node):
+        return node.memory_size()
+
+    def _touch(self, node_id):
+        if self.policy == 'lru':
+            self.frames.move_to_end(node_id)
+        else:
+            self.referenced.add(node_id)
+
+    def _store(self, node):
+        node_id = node.node_id
+        if self.max_bytes is not None:
+            # Os tamanhos só são acompanhados quando há limite em bytes
+            self.used_bytes -= self.sizes.get(node_id, 0)
+            self.sizes[node_id] = self._node_size(node)
+            self.used_bytes += self.sizes[node_id]
+        self.frames[node_id] = node
+        self._touch(node_id)
+
+    def get(self, node_id):
+        """Retorna o nó do cache ou o carrega do pager."""
+        while True:
+            with self.lock:
+                node = self.frames.get(node_id)
+                if node is not None:
+                    self.hits += 1
+                    self._touch(node_id)
+                    return node
+                pending = self.loading.get(node_id)
+                if pending is None:
+                    self.misses += 1
+                    pending = self.loading[node_id] = threading.Event()
+                    break
+                self.coalesced += 1
+            # Outra thread já está lendo o nó: espera por ela e tenta de novo
+            pending.wait()
+
+        # A leitura é feita fora do lock, para que outras threads sigam
+        # usando o cache enquanto esta espera pelo disco
+        try:
+            if self.metrics is not None:
+                start = time.perf_counter()
+                node = self.pager.read_node(node_id)
+                self.metrics.observe('node_read_seconds',
+                                     time.perf_counter() - start)
+            else:
+                node = self.pager.read_node(node_id)
+            with self.lock:
+                cached = self.frames.get(node_id)
+                if cached is not None:
+                    node = cached  # O nó foi gravado no cache durante a leitura
+                elif node:
+                    self._store(node)
+                    self._evict()
+        finally:
+            with self.lock:
+                del self.loading[node_id]
+            pending.set()
+        return node
+
+    def peek(self, node_id):
+        """Retorna o nó se ele já está no cache, sem nunca ler do pager."""
+        with self.lock:
+            node = self.frames.get(node_id)
+            if node is not None:
+                self.hits += 1
+                self._touch(node_id)
+            return node
+
+    def put(self, node, dirty=True):
+        """Coloca um nó no cache, marcando-o como sujo se foi alterado."""
+        with self.lock:
+            self._store(node)
+            if dirty:
+                self.dirty.add(node.node_id)
+            self._evict()
+
+    def discard(self, node_id):
+        """Remove um nó do cache sem gravá-lo (usado quando o nó é liberado)."""
+        with self.lock:
+            if self.frames.pop(node_id, None) is not None:
+                self.used_bytes -= self.sizes.pop(node_id, 0)
+            self.dirty.discard(node_id)
+            self.referenced.discard(node_id)
+            self.pins.pop(node_id, None)
+            self.stalled = False
+
+    def pin(self, node_id):
+        """Impede que o nó seja despejado até o unpin correspondente."""
+        with self.lock:
+            self.pins[node_id] = self.pins.get(node_id, 0) + 1
+
+    def unpin(self, node_id):
+        with self.lock:
+            count = self.pins.get(node_id, 0) - 1
+            if count > 0:
+                self.pins[node_id] = count
+            else:
+                self.pins.pop(node_id, None)
+                self.stalled = False
+
+    @contextmanager
+    def pinned(self, node_id):
+        """Mantém o nó pinado durante o bloco with."""
+        self.pin(node_id)
+        try:
+            yield
+        finally:
+            self.unpin(node_id)
+
+    def _over_budget(self):
+        if self.capacity is not None and len(self.frames) > self.capacity:
+            return True
+        return self.max_bytes is not None and self.used_bytes > self.max_bytes
+
+    def _choose_victim(self):
+        # Percorre os quadros no máximo duas vezes: na primeira volta a
+        # política CLOCK limpa os bits de referência (segunda chance)
+        for _ in range(2 * len(self.frames)):
+            node_id = next(iter(self.frames))
+            if node_id in self.pins or node_id in self.referenced:
+                self.referenced.discard(node_id)
+                self.frames.move_to_end(node_id)
+                continue
+            return node_id
+        return None  # Todos os nós estão pinados
+
+    def _evict(self):
+        while not self.stalled and self._over_budget():
+            node_id = self._choose_victim()
+            if node_id is None:
+                self.stalled = True
+                return
+            if node_id in self.dirty:
+                if self.before_write is not None:
+                    self.before_write()
+                self._write(self.frames[node_id])
+                self.dirty.discard(node_id)
+                self.dirty_flushes += 1
+            del self.frames[node_id]
+            self.used_bytes -= self.sizes.pop(node_id, 0)
+            self.evictions += 1
+
+    def _write(self, node):
+        if self.metrics is None:
+            self.pager.write_node(node)
+            return
+        start = time.perf_counter()
+        self.pager.write_node(node)
+        self.metrics.observe('node_write_seconds', time.perf_counter() - start)
+
+    def flush(self):
+        """Grava todos os nós sujos no pager, mantendo-os no cache."""
+        with self.lock:
+            if self.dirty and self.before_write is not None:
+                self.before_write()
+            for node_id in list(self.dirty):
+                self._write(self.frames[node_id])
+                self.dirty_flushes += 1
+            self.dirty.clear()
+            self.pager.flush()
+            if self.after_flush is not None:
+                self.after_flush()
+
+    def stats(self):
+        """Retorna os contadores do cache para ajuste do tamanho e da política."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            used_bytes = self.used_bytes if self.max_bytes is not None else \
+                sum(self._node_size(node) for node in self.frames.values())
+            return {
+                'policy': self.policy,
+                'nodes': len(self.frames),
+                'bytes': used_bytes,
+                'bytes_per_node': used_bytes / len(self.frames)
+                if self.frames else 0.0,
+                'dirty': len(self.dirty),
+                'pinned': len(self.pins),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'dirty_flushes': self.dirty_flushes,
+            }
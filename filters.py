@@ -0,0 +1,161 @@
+import hashlib
+import math
+import os
+import random
+import struct
+import sys
+import threading
+from array import array
+
+
+def key_hash(key):
+    """Hash de 64 bits estável entre processos (hash() de bytes muda a cada execução)."""
+    if isinstance(key, int):
+        # splitmix64: espalha bem até chaves sequenciais
+        x = (key + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        return x ^ (x >> 31)
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(),
+                          'little')
+
+
+class CuckooFilter:
+    """Filtro cuckoo: responde "com certeza ausente" sem consultar a árvore.
+
+    Cada chave vira uma impressão digital de poucos bits guardada em um de
+    dois baldes possíveis; ao contrário do filtro de Bloom, a impressão
+    pode ser removida, então o filtro acompanha as remoções da árvore.
+    Falsos positivos ocorrem com a taxa configurada; falsos negativos não.
+    """
+
+    MAGIC = b'BTFILTR1'
+    # magic, bits da impressão, nº de baldes, nº de chaves
+    HEADER = struct.Struct('<8sIQQ')
+    BUCKET_SIZE = 4
+    MAX_KICKS = 500
+
+    def __init__(self, capacity, fp_rate=0.01):
+        if not 0 < fp_rate < 1:
+            raise ValueError('fp_rate deve estar em (0, 1)')
+        self.fp_rate = fp_rate
+        # Com b impressões por balde e dois baldes por chave, a taxa de
+        # falsos positivos é no máximo 2b / 2^f
+        self.bits = min(32, max(4, math.ceil(
+            math.log2(2 * self.BUCKET_SIZE / fp_rate))))
+        buckets = max(1, math.ceil(capacity / (self.BUCKET_SIZE * 0.9)))
+        # Potência de 2, para que o balde alternativo seja um XOR
+        self.buckets = 1 << (buckets - 1).bit_length()
+        self.slots = array('H' if self.bits <= 16 else 'I',
+                           bytes(self.buckets * self.BUCKET_SIZE *
+                                 (2 if self.bits <= 16 else 4)))
+        self.count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        return int(self.buckets * self.BUCKET_SIZE * 0.9)
+
+    def _locate(self, key):
+        h = key_hash(key)
+        fingerprint = (h >> 32) & ((1 << self.bits) - 1) or 1  # 0 = vazio
+        first = h & (self.buckets - 1)
+        return fingerprint, first, self._alternate(first, fingerprint)
+
+    def _alternate(self, bucket, fingerprint):
+        return (bucket ^ key_hash(fingerprint)) & (self.buckets - 1)
+
+    def _find(self, bucket, fingerprint):
+        start = bucket * self.BUCKET_SIZE
+        try:
+            return self.slots.index(fingerprint, start,
+                                    start + self.BUCKET_SIZE)
+        except ValueError:
+            return -1
+
+    def __contains__(self, key):
+        fingerprint, first, second = self._locate(key)
+        with self.lock:
+            return self._find(first, fingerprint) >= 0 or \
+                self._find(second, fingerprint) >= 0
+
+    def add(self, key):
+        """Acrescenta a chave; retorna False se o filtro está cheio demais para ela."""
+        fingerprint, first, second = self._locate(key)
+        with self.lock:
+            for bucket in (first, second):
+                slot = self._find(bucket, 0)
+                if slot >= 0:
+                    self.slots[slot] = fingerprint
+                    self.count += 1
+                    return True
+            # Ambos cheios: desaloja impressões para os baldes alternativos
+            bucket = random.choice((first, second))
+            kicked = []
+            for _ in range(self.MAX_KICKS):
+                slot = bucket * self.BUCKET_SIZE + \
+                    random.randrange(self.BUCKET_SIZE)
+                kicked.append(slot)
+                fingerprint, self.slots[slot] = self.slots[slot], fingerprint
+                bucket = self._alternate(bucket, fingerprint)
+                free = self._find(bucket, 0)
+                if free >= 0:
+                    self.slots[free] = fingerprint
+                    self.count += 1
+                    return True
+            # Desfaz as trocas para não perder nenhuma impressão
+            for slot in reversed(kicked):
+                fingerprint, self.slots[slot] = self.slots[slot], fingerprint
+            return False
+
+    def remove(self, key):
+        """Remove uma impressão da chave; só deve ser chamado para chaves adicionadas."""
+        fingerprint, first, second = self._locate(key)
+        with self.lock:
+            for bucket in (first, second):
+                slot = self._find(bucket, fingerprint)
+                if slot >= 0:
+                    self.slots[slot] = 0
+                    self.count -= 1
+                    return True
+            return False
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.bits, self.buckets,
+                                     self.count))
+            slots = array(self.slots.typecode, self.slots)
+            if sys.byteorder != 'little':
+                slots.byteswap()
+            f.write(slots.tobytes())
+
+    @classmethod
+    def load(cls, path, fp_rate):
+        """Lê um filtro salvo; retorna None se ele não existe ou foi criado com outra taxa."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < cls.HEADER.size:
+            return None
+        magic, bits, buckets, count = cls.HEADER.unpack_from(data)
+        flt = cls(1, fp_rate)
+        if magic != cls.MAGIC or bits != flt.bits:
+            return None
+        flt.buckets = buckets
+        flt.count = count
+        flt.slots = array(flt.slots.typecode)
+        # Um arquivo truncado (queda no meio do save) é descartado
+        if len(data) - cls.HEADER.size != \
+                buckets * cls.BUCKET_SIZE * flt.slots.itemsize:
+            return None
+        flt.slots.frombytes(data[cls.HEADER.size:])
+        if sys.byteorder != 'little':
+            flt.slots.byteswap()
+        return flt
+
+    @staticmethod
+    def discard(path):
+        if os.path.exists(path):
+            os.remove(path)
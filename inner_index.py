@@ -0,0 +1,92 @@
+from bisect import bisect_right
+
+
+class InnerIndex:
+    """Cópia em memória dos níveis internos da árvore, para buscas pontuais.
+
+    Os separadores dos níveis acima do último nível interno ficam em uma
+    única lista ordenada (fences), com o último nível interno guardado nó
+    a nó. Uma busca faz duas bissecções, sem carregar nó nenhum, e só a
+    folha é lida do cache ou do disco.
+
+    A BTree avisa cada nó interno gravado: se é um nó do último nível
+    interno, só a cópia dele é trocada; qualquer outra mudança (divisão ou
+    fusão de um nó interno, nova raiz) descarta o índice, que é refeito na
+    próxima busca.
+    """
+
+    def __init__(self, entries=True):
+        # Na árvore B as chaves internas também são entradas: uma chave
+        # igual a um separador está no nó interno, e a busca segue o
+        # caminho comum
+        self.entries = entries
+        self.stale = True
+        self.nodes = {}  # Nós internos: node_id -> (chaves, filhos)
+        self.bottom = {}  # Só os do último nível interno
+        self.fences = []  # Separadores dos níveis de cima, em ordem
+        self.bottom_ids = []  # Nós do último nível interno entre as fences
+        self.rebuilds = 0
+
+    def invalidate(self):
+        self.stale = True
+        self.nodes = {}
+        self.bottom = {}
+        self.fences = []
+        self.bottom_ids = []
+
+    def node_saved(self, node):
+        """Atualiza a cópia de um nó interno que foi alterado."""
+        if self.stale or node.leaf:
+            return
+        copy = self.nodes.get(node.node_id)
+        if copy is not None and copy[0] == node.keys and \
+                copy[1] == node.children:
+            return  # Só os valores mudaram
+        if node.node_id not in self.bottom:
+            self.invalidate()
+            return
+        copy = (node.keys[:], node.children[:])
+        self.nodes[node.node_id] = self.bottom[node.node_id] = copy
+
+    def node_freed(self, node_id):
+        if node_id in self.nodes:
+            self.invalidate()
+
+    def rebuild(self, root, load):
+        """Copia os níveis internos a partir de root, lendo os nós com load(node_id)."""
+        self.invalidate()
+        self.rebuilds += 1
+        self.stale = False
+        if root is None or root.leaf:
+            return
+        height = 1
+        node = root
+        while not node.leaf:
+            height += 1
+            node = load(node.children[0])
+        self._copy(root, 0, height - 2, load)
+
+    def _copy(self, node, depth, bottom_depth, load):
+        copy = (node.keys[:], node.children[:])
+        self.nodes[node.node_id] = copy
+        if depth == bottom_depth:
+            self.bottom[node.node_id] = copy
+            self.bottom_ids.append(node.node_id)
+            return
+        for i, child_id in enumerate(copy[1]):
+            self._copy(load(child_id), depth + 1, bottom_depth, load)
+            if i < len(copy[0]):
+                self.fences.append(copy[0][i])
+
+    def leaf_for(self, k):
+        """ID da folha em que k deve estar ou None se a busca precisa descer a árvore."""
+        if not self.bottom_ids:
+            return None
+        j = bisect_right(self.fences, k)
+        if self.entries and j and self.fences[j - 1] == k:
+            return None
+        keys, children = self.bottom[self.bottom_ids[j]]
+        i = bisect_right(keys, k)
+        if self.entries and i and keys[i - 1] == k:
+            return None
+        return children[i]
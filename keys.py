@@ -0,0 +1,108 @@
+import struct
+
+
+class KeyCodec:
+    """Converte chaves em bytes cuja ordem lexicográfica é a ordem das chaves.
+
+    Com um codec (BTree(t, key_codec=...)) os nós guardam as chaves já
+    codificadas, e a árvore só compara bytes, seja qual for o tipo da
+    chave. encode_part/decode_part geram partes autodelimitadas, usadas
+    para compor chaves em TupleKey.
+    """
+
+    def encode(self, key):
+        return self.encode_part(key)
+
+    def decode(self, data):
+        key, _ = self.decode_part(data, 0)
+        return key
+
+    def encode_part(self, key):
+        raise NotImplementedError
+
+    def decode_part(self, data, pos):
+        """Decodifica a parte que começa em pos; retorna (chave, posição seguinte)."""
+        raise NotImplementedError
+
+
+class IntKey(KeyCodec):
+    """Inteiros de 64 bits com sinal: big-endian com o bit de sinal invertido."""
+
+    FORMAT = struct.Struct('>Q')
+    BIAS = 1 << 63
+
+    def encode_part(self, key):
+        return self.FORMAT.pack(key + self.BIAS)
+
+    def decode_part(self, data, pos):
+        return self.FORMAT.unpack_from(data, pos)[0] - self.BIAS, \
+            pos + self.FORMAT.size
+
+
+class BytesKey(KeyCodec):
+    """Bytes comparados byte a byte.
+
+    Sozinha a chave é gravada como está. Como parte de uma tupla, cada
+    0x00 vira 0x00 0xFF e a parte termina em 0x00 0x00, o que preserva a
+    ordem e faz um prefixo vir antes das chaves que o estendem.
+    """
+
+    def encode(self, key):
+        return bytes(key)
+
+    def decode(self, data):
+        return bytes(data)
+
+    def encode_part(self, key):
+        return bytes(key).replace(b'\0', b'\0\xff') + b'\0\0'
+
+    def decode_part(self, data, pos):
+        data = bytes(data)
+        out = bytearray()
+        while True:
+            end = data.index(b'\0', pos)
+            out += data[pos:end]
+            if data[end + 1] == 0:
+                return bytes(out), end + 2
+            out += b'\0'
+            pos = end + 2
+
+
+class StrKey(BytesKey):
+    """Strings em UTF-8, cuja ordem de bytes é a ordem dos code points."""
+
+    def encode(self, key):
+        return key.encode()
+
+    def decode(self, data):
+        return bytes(data).decode()
+
+    def encode_part(self, key):
+        return super().encode_part(key.encode())
+
+    def decode_part(self, data, pos):
+        key, pos = super().decode_part(data, pos)
+        return key.decode(), pos
+
+
+class TupleKey(KeyCodec):
+    """Chaves compostas, como (tenant_id, timestamp), ordenadas campo a campo."""
+
+    def __init__(self, *codecs):
+        if not codecs:
+            raise ValueError('TupleKey precisa de ao menos um campo')
+        self.codecs = codecs
+
+    def encode_part(self, key):
+        if len(key) != len(self.codecs):
+            raise ValueError(
+                f'Chave com {len(key)} campos; esperados {len(self.codecs)}')
+        return b''.join(codec.encode_part(field)
+                        for codec, field in zip(self.codecs, key))
+
+    def decode_part(self, data, pos):
+        fields = []
+        for codec in self.codecs:
+            field, pos = codec.decode_part(data, pos)
+            fields.append(field)
+        return tuple(fields), pos
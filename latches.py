@@ -0,0 +1,67 @@
+import threading
+import weakref
+
+
+class WouldBlock(Exception):
+    """Uma operação sem espera precisaria aguardar um latch ou uma leitura de disco."""
+
+
+class RWLatch:
+    """Latch de leitura/escrita: vários leitores ou um único escritor.
+
+    Um escritor à espera bloqueia a entrada de novos leitores, para que um
+    fluxo contínuo de buscas não o deixe esperando para sempre.
+    """
+
+    __slots__ = ('_cond', '_readers', '_writer', '_waiting_writers',
+                 '__weakref__')
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_shared(self, blocking=True):
+        """Entra como leitor; com blocking=False retorna False em vez de esperar."""
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                if not blocking:
+                    return False
+                self._cond.wait()
+            self._readers += 1
+            return True
+
+    def release_shared(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_exclusive(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_exclusive(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class LatchTable:
+    """Um RWLatch por nó, criado sob demanda e descartado quando ninguém o usa."""
+
+    def __init__(self):
+        self._latches = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, node_id):
+        with self._lock:
+            latch = self._latches.get(node_id)
+            if latch is None:
+                latch = self._latches[node_id] = RWLatch()
+            return latch
@@ -1,4 +1,5 @@
 from btree import BTree
+from wal import WriteAheadLog
 import random
 import time
 import psutil
@@ -37,6 +38,11 @@ def measure_memory():
     return mem_info.rss  # Retorna o uso de memória residente
 
 
+def open_btree(t):
+    """Abre a árvore B do diretório 'database' com o log de escrita antecipada."""
+    return BTree(t, wal=WriteAheadLog('database/btree.wal'))
+
+
 def main_menu():
     print("\n=== Menu Principal ===")
     print("1. Inserir dados na Árvore B\t\t5. Gerar dados aleatórios")
@@ -51,7 +57,7 @@ def main():
         os.makedirs('database')
 
     t = 100
-    btree = BTree(t)
+    btree = open_btree(t)
 
     while True:
         main_menu()
@@ -124,7 +130,8 @@ def main():
 
             if deleted or deleted is None:
                 if deleted is None:
-                    btree = BTree(t)
+                    btree.close()
+                    btree = open_btree(t)
                 print("===========================================================")
                 print(
                     f"Valor {k} removido da árvore em {time_elapsed * 1000:.3f} ms.")
@@ -136,23 +143,28 @@ def main():
         elif choice == '5':
             n = int(input("Quantos dados aleatórios deseja gerar? "))
             data = generate_random_data(n)
-            for value in data:
-                btree.insert(value)
+            if not btree.root.keys:
+                # Árvore vazia: constrói de baixo para cima em uma passada
+                btree.bulk_load(data)
+            else:
+                btree.insert_many(data)
             print("Dados inseridos na árvore B.")
 
         elif choice == '6':
             btree.display()
 
         elif choice == '7':
+            btree.close()
             for file in os.listdir('database'):
                 file_path = os.path.join('database', file)
                 os.remove(file_path)
             print("Arquivos de banco de dados removidos.")
 
             # criar uma nova árvore B
-            btree = BTree(t)
+            btree = open_btree(t)
 
         elif choice == '0':
+            btree.close()
             print("Saindo do programa.")
             break
 
@@ -0,0 +1,196 @@
+import json
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Histogram:
+    """Histograma de durações em segundos com baldes fixos, como os do Prometheus."""
+
+    # Limites superiores dos baldes: de 1 µs a 10 s, em passos de 1-2.5-5
+    BOUNDS = tuple(base * scale for scale in
+                   (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+                   for base in (1, 2.5, 5)) + (10.0,)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)  # O último é +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Limite superior do balde que contém o quantil q (0 a 1)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.BOUNDS + (float('inf'),), self.counts):
+            seen += count
+            cumulative.append(['+Inf' if bound == float('inf') else bound,
+                               seen])
+        return {'count': self.count, 'sum': self.sum,
+                'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'buckets': cumulative}
+
+
+class NullMetrics:
+    """Métricas desligadas (padrão da BTree): todos os registros são ignorados.
+
+    O caminho quente só paga uma chamada vazia nos eventos raros (divisões,
+    fusões) e um teste de enabled por operação pública.
+    """
+
+    enabled = False
+    tracer = None
+
+    def inc(self, name, amount=1):
+        pass
+
+    def observe(self, name, seconds):
+        pass
+
+    def operation(self, name, seconds, details=None):
+        pass
+
+    def snapshot(self):
+        return {}
+
+
+class Metrics:
+    """Contadores, histogramas e hook de tracing de uma árvore.
+
+    Com BTree(t, metrics=Metrics()) a árvore conta divisões, fusões e
+    empréstimos, mede a duração de cada operação pública e das leituras e
+    gravações de nós, e a cada exportação lê do buffer pool e dos arquivos
+    os acertos e faltas do cache, os despejos, os bytes lidos e gravados e
+    a altura. tracer, se informado, é chamado ao fim de cada operação com
+    (nome, segundos, detalhes), em que detalhes traz quantas faltas,
+    despejos, divisões etc. ocorreram durante ela; no modo concorrente
+    eles incluem o que outras threads fizeram ao mesmo tempo.
+    """
+
+    enabled = True
+    PREFIX = 'btree_'
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer
+        self.counters = {}
+        self.histograms = {}
+        self.operations = {}  # Nome da operação -> Histogram
+        # Funções chamadas na exportação, que retornam {nome: valor}; nomes
+        # terminados em _total são contadores e os demais, medidas pontuais
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def operation(self, name, seconds, details=None):
+        """Registra a duração de uma operação pública e repassa ao tracer."""
+        with self.lock:
+            histogram = self.operations.get(name)
+            if histogram is None:
+                histogram = self.operations[name] = Histogram()
+            histogram.observe(seconds)
+        if self.tracer is not None:
+            self.tracer(name, seconds, details or {})
+
+    def snapshot(self):
+        """Retorna todas as métricas em um dicionário serializável em JSON."""
+        values = {}
+        for collect in self.collectors:
+            values.update(collect())
+        with self.lock:
+            values.update(self.counters)
+            return {
+                'values': values,
+                'histograms': {name: histogram.snapshot() for name, histogram
+                               in self.histograms.items()},
+                'operations': {name: histogram.snapshot() for name, histogram
+                               in self.operations.items()},
+            }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self):
+        """Exporta as métricas no formato de texto do Prometheus."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['values'].items()):
+            name = self.PREFIX + name
+            kind = 'counter' if name.endswith('_total') else 'gauge'
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value}')
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            self._prometheus_histogram(lines, self.PREFIX + name, '',
+                                       histogram, True)
+        name = self.PREFIX + 'operation_seconds'
+        for i, (op, histogram) in enumerate(
+                sorted(snapshot['operations'].items())):
+            self._prometheus_histogram(lines, name, f'op="{op}"', histogram,
+                                       i == 0)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _prometheus_histogram(lines, name, labels, histogram, header):
+        if header:
+            lines.append(f'# TYPE {name} histogram')
+        sep = ',' if labels else ''
+        for bound, count in histogram['buckets']:
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+        labels = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{labels} {histogram["sum"]}')
+        lines.append(f'{name}_count{labels} {histogram["count"]}')
+
+    def serve(self, port=9464, host='127.0.0.1'):
+        """Atende GET /metrics (Prometheus) e /metrics.json em uma thread própria.
+
+        Retorna o servidor; chame shutdown() nele para parar.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = metrics.to_prometheus().encode()
+                    kind = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body = metrics.to_json().encode()
+                    kind = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,71 @@
+import sys
+
+from pager import FilePager, JsonPager
+
+
+def copy_tree(source, target):
+    """Copia todos os nós alcançáveis a partir da raiz de um pager para outro.
+
+    Os nós recebem novos identificadores reservados pelo pager de destino,
+    e as referências aos filhos são reescritas de acordo.
+    """
+    root_id = source.load_root()
+    if root_id is None:
+        target.save_root(None)
+        return 0
+
+    new_ids = {}
+
+    def new_id(node_id):
+        if node_id not in new_ids:
+            new_ids[node_id] = target.allocate()
+        return new_ids[node_id]
+
+    pending = [root_id]
+    copied = 0
+    while pending:
+        node_id = pending.pop()
+        node = source.read_node(node_id)
+        node.node_id = new_id(node_id)
+        pending.extend(node.children)
+        node.keys = list(node.keys)
+        node.values = list(node.values)
+        node.children = [new_id(child_id) for child_id in node.children]
+        # Ponteiros entre folhas da árvore B+
+        if node.prev_leaf is not None:
+            node.prev_leaf = new_id(node.prev_leaf)
+        if node.next_leaf is not None:
+            node.next_leaf = new_id(node.next_leaf)
+        target.write_node(node)
+        copied += 1
+
+    target.save_root(new_ids[root_id])
+    target.flush()
+    return copied
+
+
+def migrate_json_directory(directory='database', path='database/btree.db'):
+    """Converte um banco no formato legado (um JSON por nó) para o arquivo paginado."""
+    target = FilePager(path)
+    try:
+        return copy_tree(JsonPager(directory), target)
+    finally:
+        target.close()
+
+
+def upgrade_file(path, new_path):
+    """Regrava um arquivo paginado antigo com todos os nós no formato binário atual."""
+    source = FilePager(path)
+    target = FilePager(new_path, page_size=source.page_size)
+    try:
+        return copy_tree(source, target)
+    finally:
+        source.close()
+        target.close()
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'database'
+    path = sys.argv[2] if len(sys.argv) > 2 else 'database/btree.db'
+    count = migrate_json_directory(directory, path)
+    print(f"{count} nós migrados de {directory} para {path}.")
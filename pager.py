@@ -0,0 +1,432 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import uuid
+
+from btree_node import BTreeNode, LazyNode
+
+
+class Pager:
+    """Interface de armazenamento usada pela BTree para ler e gravar nós."""
+
+    directory = 'database'  # Diretório onde ficam os arquivos do banco
+    read_only = False
+    # Maior nó serializado que cabe no armazenamento (None = sem limite)
+    max_node_size = None
+
+    # Contadores de E/S desde a abertura (em FilePager o cabeçalho conta
+    # em bytes_written)
+    pages_read = 0
+    pages_written = 0
+    bytes_read = 0
+    bytes_written = 0
+
+    def load_root(self):
+        """Retorna o identificador do nó raiz ou None se a árvore não existe."""
+        raise NotImplementedError
+
+    def save_root(self, root_id):
+        """Persiste o identificador do nó raiz (None apaga a árvore)."""
+        raise NotImplementedError
+
+    def load_meta(self):
+        """Metadados da árvore guardados junto da raiz ({} se não há).
+
+        Chaves: t (grau mínimo), height (altura) e keys (nº de chaves, ou
+        None se o banco não foi fechado normalmente).
+        """
+        return {}
+
+    def save_meta(self, meta):
+        """Persiste os metadados da árvore (veja load_meta)."""
+
+    def allocate(self):
+        """Reserva um identificador para um novo nó."""
+        raise NotImplementedError
+
+    def read_node(self, node_id):
+        """Lê um nó do armazenamento, retornando None se ele não existe."""
+        raise NotImplementedError
+
+    def write_node(self, node):
+        """Grava um nó no armazenamento."""
+        raise NotImplementedError
+
+    def free_node(self, node_id):
+        """Libera o espaço ocupado por um nó que saiu da árvore."""
+        raise NotImplementedError
+
+    def encode_node(self, node):
+        """Serializa um nó no formato usado por este backend."""
+        raise NotImplementedError
+
+    def allocation_state(self):
+        """Estado de alocação de espaço a registrar no WAL (None se não há)."""
+        return None
+
+    def restore_allocation_state(self, state):
+        """Restaura o estado de alocação registrado no WAL."""
+
+    def decode_node(self, data, node_id):
+        """Reconstrói um nó serializado por encode_node."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Garante que as gravações pendentes cheguem ao disco."""
+
+    def close(self):
+        """Fecha os recursos abertos pelo pager."""
+
+    def node_ids(self):
+        """Conjunto dos IDs de todos os nós guardados (None se o backend não sabe listar)."""
+        return None
+
+    def free_pages(self):
+        """Páginas liberadas à espera de reuso."""
+        return []
+
+    def io_stats(self):
+        """Retorna os contadores de páginas (nós) e bytes lidos e gravados."""
+        return {'pages_read': self.pages_read,
+                'pages_written': self.pages_written,
+                'bytes_read': self.bytes_read,
+                'bytes_written': self.bytes_written}
+
+
+class JsonPager(Pager):
+    """Backend legado: um arquivo JSON por nó e a raiz em root.json."""
+
+    def __init__(self, directory='database'):
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _node_path(self, node_id):
+        return os.path.join(self.directory, f'{node_id}.json')
+
+    def _root_path(self):
+        return os.path.join(self.directory, 'root.json')
+
+    def _read_root_file(self):
+        try:
+            with open(self._root_path(), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_root_file(self, data):
+        if data.get('root_id') is None and len(data) <= 1:
+            if os.path.exists(self._root_path()):
+                os.remove(self._root_path())
+            return
+        with open(self._root_path(), 'w') as f:
+            json.dump(data, f)
+
+    def load_root(self):
+        return self._read_root_file().get('root_id')
+
+    def save_root(self, root_id):
+        data = self._read_root_file()
+        data['root_id'] = root_id
+        self._write_root_file(data)
+
+    def load_meta(self):
+        data = self._read_root_file()
+        data.pop('root_id', None)
+        return data
+
+    def save_meta(self, meta):
+        data = {'root_id': self.load_root()}
+        data.update(meta)
+        self._write_root_file(data)
+
+    def allocate(self):
+        return str(uuid.uuid4())
+
+    def read_node(self, node_id):
+        file_path = self._node_path(node_id)
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                data = f.read()
+            self.pages_read += 1
+            self.bytes_read += len(data)
+            return BTreeNode.from_dict(json.loads(data))
+        return None
+
+    def write_node(self, node):
+        data = json.dumps(node.to_dict())
+        with open(self._node_path(node.node_id), 'w') as f:
+            f.write(data)
+        self.pages_written += 1
+        self.bytes_written += len(data)
+
+    def encode_node(self, node):
+        return json.dumps(node.to_dict()).encode()
+
+    def decode_node(self, data, node_id):
+        return BTreeNode.from_dict(json.loads(data))
+
+    def free_node(self, node_id):
+        file_path = self._node_path(node_id)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    def node_ids(self):
+        return {name[:-len('.json')] for name in os.listdir(self.directory)
+                if name.endswith('.json') and name != 'root.json'}
+
+
+class FilePager(Pager):
+    """Backend paginado: todos os nós em um único arquivo de páginas fixas.
+
+    A página 0 é o cabeçalho (raiz, lista de páginas livres e total de
+    páginas). As demais guardam um nó cada, endereçado pelo número da página.
+    Páginas liberadas formam uma lista encadeada e são reutilizadas.
+    """
+
+    MAGIC = b'BTREEDB1'
+    # Versão 1 gravava os nós em JSON; a 2 usa o formato binário de BTreeNode
+    # e a 3 acrescenta ao cabeçalho os metadados da árvore (META)
+    VERSION = 3
+    SUPPORTED_VERSIONS = (1, 2, 3)
+    # magic, versão, tamanho da página, raiz, início da lista livre, nº de páginas
+    HEADER = struct.Struct('<8sIIqqq')
+    # Logo após o HEADER: t (0 = desconhecido), altura, nº de chaves (-1 =
+    # desconhecido)
+    META = struct.Struct('<IIq')
+    # tipo da página, tamanho do conteúdo
+    PAGE_HEADER = struct.Struct('<BI')
+    # tipo da página, próxima página livre
+    FREE_HEADER = struct.Struct('<Bq')
+
+    PAGE_NODE = 1
+    PAGE_FREE = 2
+
+    DEFAULT_PAGE_SIZE = 8192
+
+    def __init__(self, path='database/btree.db', page_size=DEFAULT_PAGE_SIZE):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.directory = directory
+        self.page_size = page_size
+        self.root_id = None
+        self.free_head = 0  # 0 indica lista vazia (a página 0 é o cabeçalho)
+        self.page_count = 1
+        self.meta = {}
+        # Torna atômicos o seek e a leitura/gravação de cada página
+        self.lock = threading.Lock()
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.file = open(path, 'r+b')
+            self._read_header()
+        else:
+            self.file = open(path, 'w+b')
+            self._write_header()
+
+    @classmethod
+    def page_size_for(cls, t):
+        """Menor tamanho de página (potência de 2, ao menos 8 KB) em que cabe um nó cheio com grau t."""
+        page_size = cls.DEFAULT_PAGE_SIZE
+        while page_size - cls.PAGE_HEADER.size < BTreeNode.max_size(2 * t - 1):
+            page_size *= 2
+        return page_size
+
+    @property
+    def max_node_size(self):
+        return self.page_size - self.PAGE_HEADER.size
+
+    def _read_header(self):
+        self.file.seek(0)
+        data = self.file.read(self.HEADER.size + self.META.size)
+        magic, version, page_size, root, free_head, page_count = \
+            self.HEADER.unpack_from(data)
+        if magic != self.MAGIC:
+            raise ValueError(f'{self.path} não é um arquivo de árvore B')
+        if version not in self.SUPPORTED_VERSIONS:
+            raise ValueError(f'Versão de arquivo não suportada: {version}')
+        self.page_size = page_size
+        self.root_id = root if root > 0 else None
+        self.free_head = free_head
+        self.page_count = page_count
+        self.meta = {}
+        if version >= 3:
+            t, height, keys = self.META.unpack_from(data, self.HEADER.size)
+            if t:
+                self.meta = {'t': t, 'height': height,
+                             'keys': keys if keys >= 0 else None}
+
+    def _write_header(self):
+        meta = self.meta
+        keys = meta.get('keys')
+        with self.lock:
+            self.file.seek(0)
+            self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION,
+                                             self.page_size, self.root_id or 0,
+                                             self.free_head, self.page_count)
+                            + self.META.pack(meta.get('t', 0),
+                                             meta.get('height', 0),
+                                             -1 if keys is None else keys))
+            self.bytes_written += self.HEADER.size + self.META.size
+
+    def _read_page(self, page_id):
+        with self.lock:
+            self.pages_read += 1
+            self.bytes_read += self.page_size
+            self.file.seek(page_id * self.page_size)
+            return self.file.read(self.page_size)
+
+    def _write_page(self, page_id, data):
+        if len(data) > self.page_size:
+            raise ValueError(
+                f'Conteúdo de {len(data)} bytes não cabe em uma página de '
+                f'{self.page_size} bytes; aumente page_size')
+        with self.lock:
+            self.pages_written += 1
+            self.bytes_written += self.page_size
+            self.file.seek(page_id * self.page_size)
+            self.file.write(data.ljust(self.page_size, b'\0'))
+
+    def load_root(self):
+        return self.root_id
+
+    def save_root(self, root_id):
+        self.root_id = root_id
+        self._write_header()
+
+    def load_meta(self):
+        return dict(self.meta)
+
+    def save_meta(self, meta):
+        self.meta = dict(meta)
+        self._write_header()
+
+    def allocate(self):
+        if self.free_head:
+            page_id = self.free_head
+            _, self.free_head = self.FREE_HEADER.unpack_from(
+                self._read_page(page_id))
+        else:
+            page_id = self.page_count
+            self.page_count += 1
+        self._write_header()
+        return page_id
+
+    def read_node(self, node_id):
+        if node_id is None or not 0 < node_id < self.page_count:
+            return None
+        page = self._read_page(node_id)
+        if len(page) < self.PAGE_HEADER.size:
+            return None
+        kind, size = self.PAGE_HEADER.unpack_from(page)
+        if kind != self.PAGE_NODE:
+            return None
+        start = self.PAGE_HEADER.size
+        return self.decode_node(memoryview(page)[start:start + size], node_id)
+
+    def write_node(self, node):
+        payload = self.encode_node(node)
+        self._write_page(node.node_id,
+                         self.PAGE_HEADER.pack(self.PAGE_NODE, len(payload))
+                         + payload)
+
+    def encode_node(self, node):
+        return node.to_bytes()
+
+    def allocation_state(self):
+        return [self.free_head, self.page_count]
+
+    def restore_allocation_state(self, state):
+        self.free_head, self.page_count = state
+        self._write_header()
+
+    def decode_node(self, data, node_id):
+        return BTreeNode.from_bytes(data, node_id=node_id)
+
+    def free_node(self, node_id):
+        page = self._read_page(node_id)
+        if page and page[0] == self.PAGE_FREE:
+            return  # Página já está na lista livre
+        self._write_page(node_id,
+                         self.FREE_HEADER.pack(self.PAGE_FREE, self.free_head))
+        self.free_head = node_id
+        self._write_header()
+
+    def free_pages(self):
+        pages = []
+        seen = set()
+        page_id = self.free_head
+        while page_id and page_id not in seen:
+            seen.add(page_id)
+            pages.append(page_id)
+            _, page_id = self.FREE_HEADER.unpack_from(self._read_page(page_id))
+        return pages
+
+    def node_ids(self):
+        return set(range(1, self.page_count)) - set(self.free_pages())
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if not self.file.closed:
+            self.file.flush()
+            self.file.close()
+
+
+class MmapPager(FilePager):
+    """Leitura somente do arquivo paginado através de um mapeamento em memória.
+
+    As páginas são lidas direto do mapeamento, sem chamadas de read nem
+    cópias, e os nós são decodificados sob demanda (LazyNode): só as chaves
+    são interpretadas até que um filho ou registro seja pedido. O cache
+    de páginas do sistema operacional faz o papel do buffer pool, o que
+    serve bem a réplicas que só fazem buscas. Qualquer escrita é recusada.
+
+    Com root_id a raiz é a informada, e não a do cabeçalho: uma réplica
+    segue a versão publicada pelo processo que grava o arquivo.
+    """
+
+    read_only = True
+
+    def __init__(self, path='database/btree.db', root_id=None):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            raise ValueError(f'{path} não existe ou está vazio')
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.file = open(path, 'rb')
+        self._read_header()
+        if root_id is not None:
+            self.root_id = root_id
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_page(self, page_id):
+        start = page_id * self.page_size
+        return memoryview(self.map)[start:start + self.page_size]
+
+    def decode_node(self, data, node_id):
+        return LazyNode.from_view(data, node_id)
+
+    def _read_only(self, *args):
+        raise ValueError(f'{self.path} foi aberto somente para leitura')
+
+    _write_page = _write_header = _read_only
+    allocate = write_node = free_node = restore_allocation_state = _read_only
+    save_meta = _read_only
+
+    def flush(self):
+        pass
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            # Nós ainda em uso apontam para o mapeamento; ele é liberado
+            # quando o último deles for coletado
+            pass
+        self.file.close()
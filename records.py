@@ -0,0 +1,332 @@
+import json
+import os
+import struct
+import threading
+
+
+def encode_value(value):
+    """Serializa um valor para o arquivo de registros (bytes crus ou JSON)."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return b'b' + bytes(value)
+    return b'j' + json.dumps(value, separators=(',', ':')).encode()
+
+
+def decode_value(data):
+    """Reconstrói um valor serializado por encode_value."""
+    if data[:1] == b'b':
+        return bytes(data[1:])
+    return json.loads(data[1:])
+
+
+class RecordHeap:
+    """Arquivo de registros (heap) com páginas em slots e páginas de overflow.
+
+    Cada registro é endereçado por um ID de registro (rid) que combina o
+    número da página e o slot: rid = página << 16 | slot. O rid de um
+    registro não muda enquanto ele cabe na sua página. Valores maiores que
+    overflow_threshold são gravados em uma cadeia de páginas de overflow, e o
+    slot guarda só um ponteiro para ela, para não desperdiçar as páginas
+    de dados.
+    """
+
+    MAGIC = b'BTHEAP01'
+    # magic, tamanho da página, nº de páginas, início da lista de páginas livres
+    HEADER = struct.Struct('<8sIqq')
+    # tipo da página, nº de slots, início da área de dados
+    PAGE_HEADER = struct.Struct('<BHH')
+    # deslocamento e tamanho de um registro na página (deslocamento 0 = slot livre)
+    SLOT = struct.Struct('<HH')
+    # tipo da página, próxima página da cadeia, tamanho do trecho
+    OVERFLOW_HEADER = struct.Struct('<BqI')
+    # tamanho total do valor, primeira página de overflow
+    OVERFLOW_STUB = struct.Struct('<Qq')
+
+    PAGE_DATA = 1
+    PAGE_OVERFLOW = 2
+    PAGE_FREE = 3
+
+    INLINE = 0
+    OVERFLOW = 1
+
+    SLOT_BITS = 16
+
+    # Contadores de E/S (o cabeçalho conta em bytes_written)
+    pages_read = 0
+    pages_written = 0
+    bytes_read = 0
+    bytes_written = 0
+
+    def __init__(self, path='database/records.db', page_size=8192,
+                 overflow_threshold=None):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.page_size = page_size
+        self.page_count = 1
+        self.free_head = 0
+        # Torna atômicos o seek e a leitura/gravação de cada página
+        self.lock = threading.Lock()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.file = open(path, 'r+b')
+            self._read_header()
+        else:
+            self.file = open(path, 'w+b')
+            self._write_header()
+
+        self.overflow_threshold = overflow_threshold or self.page_size // 4
+        self.current_page = None  # Página de dados que recebe novos registros
+        self.free_space = {}  # Páginas com espaço liberado por remoções
+
+    def _read_header(self):
+        self.file.seek(0)
+        magic, page_size, page_count, free_head = self.HEADER.unpack(
+            self.file.read(self.HEADER.size))
+        if magic != self.MAGIC:
+            raise ValueError(f'{self.path} não é um arquivo de registros')
+        self.page_size = page_size
+        self.page_count = page_count
+        self.free_head = free_head
+
+    def _write_header(self):
+        with self.lock:
+            self.file.seek(0)
+            self.file.write(self.HEADER.pack(self.MAGIC, self.page_size,
+                                             self.page_count, self.free_head))
+            self.bytes_written += self.HEADER.size
+
+    def _read_page(self, page_id):
+        with self.lock:
+            self.pages_read += 1
+            self.bytes_read += self.page_size
+            self.file.seek(page_id * self.page_size)
+            data = self.file.read(self.page_size)
+        return bytearray(data.ljust(self.page_size, b'\0'))
+
+    def _write_page(self, page_id, page):
+        with self.lock:
+            self.pages_written += 1
+            self.bytes_written += len(page)
+            self.file.seek(page_id * self.page_size)
+            self.file.write(page)
+
+    def _allocate_page(self):
+        if self.free_head:
+            page_id = self.free_head
+            _, self.free_head, _ = self.OVERFLOW_HEADER.unpack_from(
+                self._read_page(page_id))
+        else:
+            page_id = self.page_count
+            self.page_count += 1
+        self._write_header()
+        return page_id
+
+    def _free_page(self, page_id):
+        page = bytearray(self.page_size)
+        self.OVERFLOW_HEADER.pack_into(page, 0, self.PAGE_FREE,
+                                       self.free_head, 0)
+        self._write_page(page_id, page)
+        self.free_head = page_id
+        self._write_header()
+
+    # Páginas de dados
+
+    def _new_data_page(self):
+        page = bytearray(self.page_size)
+        self.PAGE_HEADER.pack_into(page, 0, self.PAGE_DATA, 0, self.page_size)
+        return page
+
+    def _slot(self, page, slot):
+        return self.SLOT.unpack_from(
+            page, self.PAGE_HEADER.size + slot * self.SLOT.size)
+
+    def _free_bytes(self, page):
+        """Espaço livre total da página, contando os buracos deixados por remoções."""
+        _, slot_count, _ = self.PAGE_HEADER.unpack_from(page)
+        used = sum(self._slot(page, s)[1] for s in range(slot_count))
+        return (self.page_size - self.PAGE_HEADER.size
+                - slot_count * self.SLOT.size - used)
+
+    def _compact_page(self, page):
+        """Junta os registros no fim da página, mantendo os números dos slots."""
+        kind, slot_count, _ = self.PAGE_HEADER.unpack_from(page)
+        compacted = bytearray(self.page_size)
+        end = self.page_size
+        for slot in range(slot_count):
+            offset, length = self._slot(page, slot)
+            if offset:
+                end -= length
+                compacted[end:end + length] = page[offset:offset + length]
+                offset = end
+            self.SLOT.pack_into(compacted,
+                                self.PAGE_HEADER.size + slot * self.SLOT.size,
+                                offset, length)
+        self.PAGE_HEADER.pack_into(compacted, 0, kind, slot_count, end)
+        return compacted
+
+    def _place(self, page, data, slot=None):
+        """Grava data em um slot da página; retorna o slot ou None se não cabe."""
+        kind, slot_count, free_end = self.PAGE_HEADER.unpack_from(page)
+        if slot is None:
+            # Reaproveita um slot livre antes de criar um novo
+            slot = next((s for s in range(slot_count)
+                         if not self._slot(page, s)[0]), slot_count)
+        new_slots = max(slot_count, slot + 1)
+        needed = len(data) + (new_slots - slot_count) * self.SLOT.size
+        if self._free_bytes(page) < needed:
+            return None
+
+        slots_end = self.PAGE_HEADER.size + new_slots * self.SLOT.size
+        if free_end - slots_end < len(data):
+            page[:] = self._compact_page(page)
+            kind, slot_count, free_end = self.PAGE_HEADER.unpack_from(page)
+
+        offset = free_end - len(data)
+        page[offset:free_end] = data
+        self.SLOT.pack_into(page, self.PAGE_HEADER.size + slot * self.SLOT.size,
+                            offset, len(data))
+        self.PAGE_HEADER.pack_into(page, 0, kind, new_slots, offset)
+        return slot
+
+    def _rid(self, page_id, slot):
+        return page_id << self.SLOT_BITS | slot
+
+    def _split_rid(self, rid):
+        return rid >> self.SLOT_BITS, rid & ((1 << self.SLOT_BITS) - 1)
+
+    # Páginas de overflow
+
+    def _write_overflow(self, data):
+        chunk_size = self.page_size - self.OVERFLOW_HEADER.size
+        chunks = [data[i:i + chunk_size]
+                  for i in range(0, len(data), chunk_size)]
+        page_ids = [self._allocate_page() for _ in chunks]
+        for index, chunk in enumerate(chunks):
+            next_page = page_ids[index + 1] if index + 1 < len(chunks) else 0
+            page = bytearray(self.page_size)
+            self.OVERFLOW_HEADER.pack_into(page, 0, self.PAGE_OVERFLOW,
+                                           next_page, len(chunk))
+            page[self.OVERFLOW_HEADER.size:
+                 self.OVERFLOW_HEADER.size + len(chunk)] = chunk
+            self._write_page(page_ids[index], page)
+        return page_ids[0]
+
+    def _read_overflow(self, page_id, total):
+        parts = []
+        while page_id:
+            page = self._read_page(page_id)
+            _, page_id, length = self.OVERFLOW_HEADER.unpack_from(page)
+            start = self.OVERFLOW_HEADER.size
+            parts.append(page[start:start + length])
+        return bytes(b''.join(parts)[:total])
+
+    def _free_overflow(self, page_id):
+        while page_id:
+            _, next_page, _ = self.OVERFLOW_HEADER.unpack_from(
+                self._read_page(page_id))
+            self._free_page(page_id)
+            page_id = next_page
+
+    def _cell(self, data):
+        """Monta o conteúdo do slot: o valor inteiro ou um ponteiro de overflow."""
+        if len(data) > self.overflow_threshold:
+            first_page = self._write_overflow(data)
+            return bytes([self.OVERFLOW]) + self.OVERFLOW_STUB.pack(
+                len(data), first_page)
+        return bytes([self.INLINE]) + data
+
+    def _release_cell(self, cell):
+        if cell[0] == self.OVERFLOW:
+            _, first_page = self.OVERFLOW_STUB.unpack_from(cell, 1)
+            self._free_overflow(first_page)
+
+    def _read_cell(self, rid):
+        page_id, slot = self._split_rid(rid)
+        if not 0 < page_id < self.page_count:
+            return None, None
+        page = self._read_page(page_id)
+        kind, slot_count, _ = self.PAGE_HEADER.unpack_from(page)
+        if kind != self.PAGE_DATA or slot >= slot_count:
+            return None, None
+        offset, length = self._slot(page, slot)
+        if not offset:
+            return page, None
+        return page, bytes(page[offset:offset + length])
+
+    # Interface pública
+
+    def insert(self, data):
+        """Grava um registro e retorna o seu rid."""
+        return self._insert_cell(self._cell(data))
+
+    def _insert_cell(self, cell):
+        candidates = [self.current_page] if self.current_page else []
+        candidates += [page_id for page_id, free in self.free_space.items()
+                       if free >= len(cell) + self.SLOT.size]
+        for page_id in candidates:
+            page = self._read_page(page_id)
+            slot = self._place(page, cell)
+            if slot is not None:
+                self._write_page(page_id, page)
+                self.free_space.pop(page_id, None)
+                return self._rid(page_id, slot)
+
+        page_id = self._allocate_page()
+        page = self._new_data_page()
+        slot = self._place(page, cell)
+        self._write_page(page_id, page)
+        self.current_page = page_id
+        return self._rid(page_id, slot)
+
+    def read(self, rid):
+        """Lê o registro com o rid informado (None se ele não existe)."""
+        _, cell = self._read_cell(rid)
+        if cell is None:
+            return None
+        if cell[0] == self.OVERFLOW:
+            total, first_page = self.OVERFLOW_STUB.unpack_from(cell, 1)
+            return self._read_overflow(first_page, total)
+        return cell[1:]
+
+    def update(self, rid, data):
+        """Regrava um registro; retorna o rid, que só muda se ele não couber mais na página."""
+        page, old_cell = self._read_cell(rid)
+        if old_cell is None:
+            return self.insert(data)
+        self._release_cell(old_cell)
+
+        page_id, slot = self._split_rid(rid)
+        self.SLOT.pack_into(page, self.PAGE_HEADER.size + slot * self.SLOT.size,
+                            0, 0)
+        cell = self._cell(data)
+        if self._place(page, cell, slot) is not None:
+            self._write_page(page_id, page)
+            return rid
+
+        # Não coube: o registro muda de página e o slot antigo fica livre
+        self._write_page(page_id, page)
+        self.free_space[page_id] = self._free_bytes(page)
+        return self._insert_cell(cell)
+
+    def delete(self, rid):
+        """Remove um registro, liberando seu slot e suas páginas de overflow."""
+        page, cell = self._read_cell(rid)
+        if cell is None:
+            return False
+        self._release_cell(cell)
+        page_id, slot = self._split_rid(rid)
+        self.SLOT.pack_into(page, self.PAGE_HEADER.size + slot * self.SLOT.size,
+                            0, 0)
+        self._write_page(page_id, page)
+        self.free_space[page_id] = self._free_bytes(page)
+        return True
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if not self.file.closed:
+            self.file.flush()
+            self.file.close()
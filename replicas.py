@@ -0,0 +1,162 @@
+import multiprocessing
+import time
+
+from pager import MmapPager
+from records import RecordHeap
+
+# Estado de cada processo leitor, preenchido por _init_reader
+_reader = {}
+
+
+def _init_reader(cls, t, key_codec, path, records_path, cache_size, version):
+    _reader.update(cls=cls, t=t, key_codec=key_codec, path=path,
+                   records_path=records_path, cache_size=cache_size,
+                   version=version, seq=None, tree=None)
+
+
+def _open_reader(root_id):
+    """Reabre a réplica sobre o arquivo atual, partindo da raiz publicada."""
+    old = _reader['tree']
+    if old is not None:
+        old.pager.close()
+        old.records.close()
+    # O cabeçalho pode já apontar para uma raiz ainda não publicada
+    pager = MmapPager(_reader['path'], root_id=root_id)
+    _reader['tree'] = _reader['cls'](
+        _reader['t'], pager=pager, records=RecordHeap(_reader['records_path']),
+        cache_size=_reader['cache_size'], key_codec=_reader['key_codec'])
+
+
+def _consistent(op, *args):
+    """Executa op sobre a última versão publicada, repetindo-a se o dono gravou páginas no meio.
+
+    É um seqlock: o contador de versão fica ímpar enquanto o dono grava
+    páginas no arquivo. Uma leitura só vale se o contador era par e não
+    mudou até o fim; caso contrário, inclusive se ela falhou ao decodificar
+    uma página pela metade, a réplica é reaberta e a leitura repetida.
+    """
+    version = _reader['version']
+    while True:
+        seq = version[0]
+        if seq & 1:
+            time.sleep(0)
+            continue
+        try:
+            if seq != _reader['seq']:
+                _open_reader(version[1])
+                _reader['seq'] = seq
+            result = op(_reader['tree'], *args)
+        except Exception:
+            if version[0] == seq:
+                raise
+            continue
+        if version[0] == seq:
+            return result
+
+
+def _get_many(tree, keys, default):
+    values = []
+    for found in tree.search_many(keys):
+        if found is None:
+            values.append(default)
+        else:
+            node, i = found
+            values.append(tree._read_record(node.values[i]))
+    return values
+
+
+def _range(tree, lo, hi, reverse):
+    return list(tree.range(lo, hi, reverse))
+
+
+def _reader_get_many(keys, default):
+    return _consistent(_get_many, keys, default)
+
+
+def _reader_range(lo, hi, reverse):
+    return _consistent(_range, lo, hi, reverse)
+
+
+class ReplicaPool:
+    """Processos leitores que atendem buscas sobre o banco de um processo dono.
+
+    Só o dono (o processo que criou o pool) altera a árvore. Cada leitor
+    abre o mesmo arquivo com MmapPager, de modo que o cache de páginas do
+    sistema operacional é compartilhado por todos e as buscas escalam com
+    o número de núcleos, sem a trava global do interpretador.
+
+    As páginas de dados só mudam nos checkpoints do dono, e cada checkpoint
+    publica em memória compartilhada a nova raiz junto com um contador de
+    versão; os leitores que encontram uma versão nova reabrem o
+    mapeamento a partir dela. Por isso o dono precisa de WAL (para que
+    registros removidos só sejam liberados no checkpoint) e de cache sem
+    limite (para que nenhum despejo grave páginas fora de um checkpoint).
+    Com WAL, update() grava o valor novo em outro registro e libera o
+    antigo só no checkpoint, então os leitores seguem vendo o valor da
+    última versão publicada.
+    """
+
+    def __init__(self, tree, processes=None, cache_size=1000):
+        if tree.wal is None:
+            raise ValueError('ReplicaPool exige uma árvore com WAL')
+        if tree.pool.capacity is not None or tree.pool.max_bytes is not None:
+            raise ValueError('ReplicaPool exige uma árvore com cache_size=None')
+        self.tree = tree
+        # [contador de versão (ímpar durante gravações), raiz publicada]
+        self.version = multiprocessing.RawArray('q', 2)
+        sync_wal = tree.pool.before_write
+
+        def begin_write():
+            sync_wal()
+            if not self.version[0] & 1:
+                self.version[0] += 1
+
+        def publish_root():
+            if self.version[0] & 1:
+                self.version[1] = tree.root.node_id
+                self.version[0] += 1
+
+        tree.pool.before_write = begin_write
+        tree.pool.after_flush = publish_root
+        self.publish()
+
+        self.processes = processes or multiprocessing.cpu_count()
+        self.workers = multiprocessing.Pool(
+            self.processes, initializer=_init_reader,
+            initargs=(type(tree), tree.t, tree.key_codec, tree.pager.path,
+                      tree.records.path, cache_size, self.version))
+
+    def publish(self):
+        """Faz um checkpoint, tornando visíveis aos leitores as alterações feitas até aqui."""
+        self.tree.checkpoint()
+        if not self.version[1]:
+            self.version[1] = self.tree.root.node_id
+
+    def get(self, k, default=None):
+        """Retorna o valor da chave k na última versão publicada."""
+        return self.workers.apply(_reader_get_many, ([k], default))[0]
+
+    def get_many(self, keys, default=None):
+        """Busca várias chaves, repartidas entre os processos leitores."""
+        keys = list(keys)
+        if not keys:
+            return []
+        size = -(-len(keys) // self.processes)
+        chunks = [keys[i:i + size] for i in range(0, len(keys), size)]
+        results = [self.workers.apply_async(_reader_get_many, (chunk, default))
+                   for chunk in chunks]
+        values = []
+        for result in results:
+            values.extend(result.get())
+        return values
+
+    def range(self, lo=None, hi=None, reverse=False):
+        """Lista os pares com lo <= chave < hi em um leitor (apenas para BPlusTree)."""
+        return self.workers.apply(_reader_range, (lo, hi, reverse))
+
+    def close(self):
+        """Encerra os processos leitores; a árvore do dono continua aberta."""
+        self.workers.close()
+        self.workers.join()
+        self.tree.pool.before_write = self.tree.wal.sync
+        self.tree.pool.after_flush = None
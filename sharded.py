@@ -0,0 +1,455 @@
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+from btree import BTree
+from filters import key_hash
+from pager import FilePager
+from wal import WriteAheadLog
+
+PARTITIONS = ('hash', 'range')
+
+
+def _open_shard(cls, t, directory, wal, options):
+    return cls(t, pager=FilePager(os.path.join(directory, 'btree.db')),
+               wal=WriteAheadLog(os.path.join(directory, 'btree.wal'))
+               if wal else None, **options)
+
+
+class _ShardWorker:
+    """Executa as operações pedidas a uma partição, no mesmo processo ou em outro.
+
+    As varreduras ficam abertas aqui, identificadas por um número, e são
+    lidas em lotes com scan_next.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.scans = {}
+        self.next_scan = itertools.count(1)
+
+    def call(self, method, *args, **kwargs):
+        return getattr(self.tree, method)(*args, **kwargs)
+
+    def lookup_many(self, keys):
+        """(True, valor) para cada chave que existe e (False, None) para as demais."""
+        return [(False, None) if found is None else
+                (True, self.tree._read_record(found[0].values[found[1]]))
+                for found in self.tree.search_many(keys)]
+
+    def scan_open(self, method, *args):
+        scan_id = next(self.next_scan)
+        self.scans[scan_id] = getattr(self.tree, method)(*args)
+        return scan_id
+
+    def scan_next(self, scan_id, count):
+        """Até count pares da varredura; ela é fechada quando acaba."""
+        batch = list(itertools.islice(self.scans[scan_id], count))
+        if len(batch) < count:
+            self.scans.pop(scan_id, None)
+        return batch
+
+    def scan_close(self, scan_id):
+        self.scans.pop(scan_id, None)
+
+
+def _serve(conn, cls, t, directory, wal, options):
+    """Laço do processo dono de uma partição: atende os pedidos até receber None."""
+    worker = _ShardWorker(_open_shard(cls, t, directory, wal, options))
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            method, args, kwargs = request
+            try:
+                conn.send((True, getattr(worker, method)(*args, **kwargs)))
+            except Exception as error:
+                conn.send((False, error))
+    finally:
+        worker.tree.close()
+        conn.close()
+
+
+class _LocalShard:
+    """Partição aberta neste processo; os pedidos em paralelo vão para threads."""
+
+    def __init__(self, worker, executor):
+        self.worker = worker
+        self.tree = worker.tree
+        self.executor = executor
+
+    def call(self, method, *args, **kwargs):
+        return getattr(self.worker, method)(*args, **kwargs)
+
+    def submit(self, method, *args, **kwargs):
+        return self.executor.submit(getattr(self.worker, method),
+                                    *args, **kwargs)
+
+    def close(self):
+        self.tree.close()
+
+
+class _Reply:
+    def __init__(self, shard):
+        self.shard = shard
+
+    def result(self):
+        return self.shard._receive()
+
+
+class _ProcessShard:
+    """Partição servida por um processo próprio, com pedidos por um pipe.
+
+    Cada partição atende um pedido por vez: submit envia o pedido e o
+    resultado é lido em result(), de modo que pedidos a partições
+    diferentes correm em paralelo, cada um em um núcleo.
+    """
+
+    def __init__(self, cls, t, directory, wal, options):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve, args=(child, cls, t, directory, wal, options),
+            daemon=True)
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()
+
+    def submit(self, method, *args, **kwargs):
+        self.lock.acquire()
+        try:
+            self.conn.send((method, args, kwargs))
+        except BaseException:
+            self.lock.release()
+            raise
+        return _Reply(self)
+
+    def _receive(self):
+        try:
+            ok, result = self.conn.recv()
+        finally:
+            self.lock.release()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, method, *args, **kwargs):
+        return self.submit(method, *args, **kwargs).result()
+
+    def close(self):
+        with self.lock:
+            self.conn.send(None)
+            self.process.join()
+            self.conn.close()
+
+
+class ShardedBTree:
+    """Árvore particionada em várias BTree independentes, cada uma no seu diretório.
+
+    Cada chave pertence a uma única partição, escolhida pelo hash da chave
+    (partition='hash') ou pelo intervalo em que ela cai (partition='range',
+    com boundaries: as n - 1 chaves que separam as n partições). Buscas,
+    inserções e remoções de uma chave vão só para a partição dela; lotes
+    são repartidos e as partições os tratam em paralelo. Varreduras por
+    intervalo (com tree_class=BPlusTree) consultam as partições ao mesmo
+    tempo e intercalam os resultados em ordem.
+
+    Com processes=True cada partição é aberta e servida por um processo
+    próprio, o que leva as operações de partições diferentes a núcleos
+    diferentes; sem ele as partições ficam neste processo e os lotes usam
+    threads. A quantidade e o tipo das partições ficam em shards.json e
+    não podem mudar depois que o banco é criado.
+    """
+
+    # Pares lidos por vez de cada partição nas varreduras
+    SCAN_BATCH = 256
+
+    def __init__(self, directory='database/shards', shards=4, t=32,
+                 partition='hash', boundaries=None, tree_class=BTree,
+                 wal=False, processes=False, key_codec=None, **options):
+        if partition not in PARTITIONS:
+            raise ValueError(f'Particionamento desconhecido: {partition}')
+        if partition == 'range':
+            boundaries = list(boundaries or ())
+            if len(boundaries) != shards - 1 or \
+                    boundaries != sorted(boundaries):
+                raise ValueError('boundaries deve ter shards - 1 chaves em '
+                                 'ordem crescente')
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.partition = partition
+        self.key_codec = key_codec
+        self._boundaries = [self._encode(k) for k in boundaries or ()]
+        self._check_layout(shards, t, tree_class)
+        self.t = t
+        self.tree_class = tree_class
+
+        options = dict(options, key_codec=key_codec)
+        self._executor = None
+        self.shards = []
+        for i in range(shards):
+            path = os.path.join(directory, f'shard_{i:03d}')
+            if not os.path.exists(path):
+                os.makedirs(path)
+            if processes:
+                shard = _ProcessShard(tree_class, t, path, wal, options)
+            else:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=shards)
+                shard = _LocalShard(_ShardWorker(_open_shard(
+                    tree_class, t, path, wal, options)), self._executor)
+            self.shards.append(shard)
+
+    def _check_layout(self, shards, t, tree_class):
+        """Grava a configuração das partições ou confere a de um banco existente."""
+        layout = {
+            'shards': shards,
+            't': t,
+            'tree': tree_class.__name__,
+            'partition': self.partition,
+            'boundaries': [k.hex() if isinstance(k, bytes) else k
+                           for k in self._boundaries],
+        }
+        path = os.path.join(self.directory, 'shards.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                stored = json.load(f)
+            if stored != layout:
+                raise ValueError(f'O banco em {self.directory} foi criado com '
+                                 f'outras partições: {stored}')
+            return
+        with open(path, 'w') as f:
+            json.dump(layout, f)
+
+    def _encode(self, k):
+        return k if self.key_codec is None else self.key_codec.encode(k)
+
+    def shard_index(self, k):
+        """Índice da partição que guarda a chave k."""
+        k = self._encode(k)
+        if self.partition == 'range':
+            return bisect_right(self._boundaries, k)
+        return key_hash(k) % len(self.shards)
+
+    def _shard(self, k):
+        return self.shards[self.shard_index(k)]
+
+    def _scatter(self, requests):
+        """Envia (partição, método, argumentos) a todas e retorna os resultados na mesma ordem."""
+        replies = []
+        try:
+            for shard, method, args in requests:
+                replies.append(shard.submit(method, *args))
+        except BaseException:
+            # Cada partição só atende outro pedido depois que a resposta
+            # deste é lida, então as já enviadas são lidas mesmo assim
+            self._gather(replies)
+            raise
+        results, error = self._gather(replies)
+        if error is not None:
+            raise error
+        return results
+
+    @staticmethod
+    def _gather(replies):
+        """Lê a resposta de todos os pedidos, mesmo após um erro; retorna (resultados, primeiro erro)."""
+        results = []
+        error = None
+        for reply in replies:
+            try:
+                results.append(reply.result())
+            except Exception as e:
+                results.append(None)
+                if error is None:
+                    error = e
+        return results, error
+
+    def _broadcast(self, method, *args):
+        return self._scatter([(shard, 'call', (method,) + args)
+                              for shard in self.shards])
+
+    def _group(self, keys):
+        """Posições das chaves agrupadas por partição: {índice: [posições]}."""
+        groups = {}
+        for pos, k in enumerate(keys):
+            groups.setdefault(self.shard_index(k), []).append(pos)
+        return groups
+
+    # Operações de uma chave: vão só para a partição dela
+
+    def insert(self, k, value=None):
+        return self._shard(k).call('call', 'insert', k, value)
+
+    def search(self, k):
+        return self._shard(k).call('call', 'search', k)
+
+    def get(self, k, default=None):
+        found, value = self._shard(k).call('lookup_many', [k])[0]
+        return value if found else default
+
+    def delete(self, k):
+        return self._shard(k).call('call', 'delete', k)
+
+    def update(self, old_k, new_k=None, value=None):
+        """Como BTree.update; se a chave nova é de outra partição, a chave muda de partição.
+
+        Nesse caso a chave nova é inserida antes de a antiga ser removida:
+        uma queda no meio deixa as duas, nunca nenhuma.
+        """
+        source = self._shard(old_k)
+        if new_k is None or source is self._shard(new_k):
+            return source.call('call', 'update', old_k, new_k, value)
+        found, old_value = source.call('lookup_many', [old_k])[0]
+        if not found:
+            return False
+        self._shard(new_k).call('call', 'insert', new_k,
+                                old_value if value is None else value)
+        source.call('call', 'delete', old_k)
+        return True
+
+    # Lotes: cada partição recebe a sua parte e elas trabalham em paralelo
+
+    def insert_many(self, items, pairs=False):
+        items = list(items)
+        keys = [item[0] for item in items] if pairs else items
+        groups = self._group(keys)
+        return sum(self._scatter([
+            (self.shards[i], 'call',
+             ('insert_many', [items[pos] for pos in positions], pairs))
+            for i, positions in groups.items()]))
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        groups = self._group(keys)
+        return sum(self._scatter([
+            (self.shards[i], 'call',
+             ('delete_many', [keys[pos] for pos in positions]))
+            for i, positions in groups.items()]))
+
+    def search_many(self, keys):
+        """Lista alinhada com keys, com (nó, i) ou None, como BTree.search_many."""
+        return self._gather_many('call', 'search_many', list(keys))
+
+    def get_many(self, keys, default=None):
+        """Valores das chaves (default para as ausentes), buscados em paralelo."""
+        return [value if found else default for found, value in
+                self._gather_many('lookup_many', None, list(keys))]
+
+    def _gather_many(self, method, tree_method, keys):
+        """Busca cada grupo de chaves na sua partição e remonta os resultados na ordem de keys."""
+        groups = self._group(keys)
+        prefix = (tree_method,) if tree_method else ()
+        replies = self._scatter([
+            (self.shards[i], method,
+             prefix + ([keys[pos] for pos in positions],))
+            for i, positions in groups.items()])
+        results = [None] * len(keys)
+        for positions, part in zip(groups.values(), replies):
+            for pos, result in zip(positions, part):
+                results[pos] = result
+        return results
+
+    def bulk_load(self, items, fill_factor=1.0, presorted=False, pairs=False):
+        """Reparte as chaves entre as partições, que as carregam em paralelo."""
+        items = list(items)
+        keys = [item[0] for item in items] if pairs else items
+        groups = self._group(keys)
+        return sum(self._scatter([
+            (self.shards[i], 'call',
+             ('bulk_load', [items[pos] for pos in positions], fill_factor,
+              presorted, pairs))
+            for i, positions in groups.items()]))
+
+    # Varreduras (apenas com tree_class=BPlusTree)
+
+    def range(self, lo=None, hi=None, reverse=False):
+        """Gera os pares com lo <= chave < hi em ordem, como BPlusTree.range."""
+        if self.partition == 'range':
+            first = 0 if lo is None else self.shard_index(lo)
+            last = len(self.shards) - 1 if hi is None else self.shard_index(hi)
+            return self._scan('range', (lo, hi, reverse), reverse,
+                              range(first, last + 1))
+        return self._scan('range', (lo, hi, reverse), reverse)
+
+    def scan_from(self, k=None, reverse=False):
+        """Gera pares a partir de k, como BPlusTree.scan_from."""
+        if self.partition == 'range' and k is not None:
+            start = self.shard_index(k)
+            shards = range(start, -1, -1) if reverse else \
+                range(start, len(self.shards))
+            return self._scan('scan_from', (k, reverse), reverse,
+                              sorted(shards))
+        return self._scan('scan_from', (k, reverse), reverse)
+
+    def items(self, reverse=False):
+        return self.scan_from(None, reverse)
+
+    def _scan(self, method, args, reverse, indexes=None):
+        """Abre a varredura nas partições e intercala os resultados em ordem.
+
+        O primeiro lote de cada partição é lido em paralelo; os seguintes,
+        quando a intercalação precisa deles. Com partition='range' as
+        partições já estão em ordem e são lidas uma após a outra.
+        """
+        shards = [self.shards[i] for i in
+                  (range(len(self.shards)) if indexes is None else indexes)]
+        if reverse:
+            shards.reverse()
+        scans = self._scatter([(shard, 'scan_open', (method,) + args)
+                               for shard in shards])
+        try:
+            if self.partition == 'range':
+                for shard, scan_id in zip(shards, scans):
+                    yield from self._stream(shard, scan_id)
+                return
+            batches = self._scatter([(shard, 'scan_next',
+                                      (scan_id, self.SCAN_BATCH))
+                                     for shard, scan_id in zip(shards, scans)])
+            yield from heapq.merge(
+                *(self._stream(shard, scan_id, batch) for shard, scan_id, batch
+                  in zip(shards, scans, batches)),
+                key=itemgetter(0), reverse=reverse)
+        finally:
+            # Varreduras interrompidas antes do fim ficam abertas nas partições
+            for shard, scan_id in zip(shards, scans):
+                shard.call('scan_close', scan_id)
+
+    def _stream(self, shard, scan_id, batch=None):
+        if batch is None:
+            batch = shard.call('scan_next', scan_id, self.SCAN_BATCH)
+        while True:
+            yield from batch
+            if len(batch) < self.SCAN_BATCH:
+                return
+            batch = shard.call('scan_next', scan_id, self.SCAN_BATCH)
+
+    # Operações sobre todas as partições
+
+    def __len__(self):
+        return sum(self._broadcast('__len__'))
+
+    def flush(self):
+        self._broadcast('flush')
+
+    def checkpoint(self):
+        self._broadcast('checkpoint')
+
+    def warm_up(self, levels=None):
+        return sum(self._broadcast('warm_up', levels))
+
+    def stats(self):
+        """Lista com os stats() de cada partição."""
+        return self._broadcast('stats')
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        if self._executor is not None:
+            self._executor.shutdown()
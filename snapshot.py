@@ -0,0 +1,94 @@
+from bisect import bisect_left
+
+
+class Snapshot:
+    """Visão somente leitura da árvore no momento em que BTree.snapshot() foi chamado.
+
+    Os nós são lidos pela árvore como estavam naquele momento (a imagem
+    guardada pelo escritor ou uma cópia do nó atual), então buscas e
+    varreduras podem continuar enquanto a árvore recebe escritas. Feche o
+    snapshot com close() (ou use-o em um bloco with) para liberar as
+    imagens guardadas para ele.
+    """
+
+    def __init__(self, tree, epoch, root_id):
+        self.tree = tree
+        self.epoch = epoch
+        self.root_id = root_id
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.tree._release_snapshot(self.epoch)
+
+    def _node(self, node_id):
+        if self.closed:
+            raise ValueError('O snapshot já foi fechado')
+        return self.tree._node_at(node_id, self.epoch)
+
+    def _find(self, k):
+        """Retorna o rid da chave k no snapshot ou None se ela não existia."""
+        node_id = self.root_id
+        while node_id is not None:
+            node = self._node(node_id)
+            i, match = self.tree._locate(node, k)
+            if match:
+                return node.values[i]
+            if node.leaf:
+                return None
+            node_id = node.children[i]
+        return None
+
+    def __contains__(self, k):
+        return self._find(self.tree._encode(k)) is not None
+
+    def get(self, k, default=None):
+        """Retorna o valor que a chave k tinha no snapshot (default se ela não existia)."""
+        rid = self._find(self.tree._encode(k))
+        return default if rid is None else self.tree._read_record(rid)
+
+    def range(self, lo=None, hi=None, reverse=False):
+        """Gera os pares (chave, valor) com lo <= chave < hi, em ordem."""
+        if self.root_id is None:
+            return
+        tree = self.tree
+        lo = None if lo is None else tree._encode(lo)
+        hi = None if hi is None else tree._encode(hi)
+        for key, rid in self._walk(self.root_id, lo, hi, reverse):
+            yield tree._decode(key), tree._read_record(rid)
+
+    def items(self, reverse=False):
+        """Gera todos os pares (chave, valor) do snapshot em ordem."""
+        return self.range(reverse=reverse)
+
+    def _walk(self, node_id, lo, hi, reverse):
+        node = self._node(node_id)
+        keys = node.keys
+        first = 0 if lo is None else bisect_left(keys, lo)
+        last = len(keys) if hi is None else bisect_left(keys, hi)
+        if node.leaf:
+            order = range(last - 1, first - 1, -1) if reverse \
+                else range(first, last)
+            for i in order:
+                yield keys[i], node.values[i]
+            return
+        # O filho i fica entre keys[i - 1] e keys[i]; só os filhos de first
+        # a last podem ter chaves no intervalo
+        entries = self.tree.INTERNAL_ENTRIES
+        if reverse:
+            for i in range(last, first - 1, -1):
+                if entries and i < last:
+                    yield keys[i], node.values[i]
+                yield from self._walk(node.children[i], lo, hi, True)
+        else:
+            for i in range(first, last + 1):
+                yield from self._walk(node.children[i], lo, hi, False)
+                if entries and i < last:
+                    yield keys[i], node.values[i]
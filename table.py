@@ -0,0 +1,213 @@
+import os
+import threading
+
+from bplustree import BPlusTree
+from keys import BytesKey, IntKey
+from pager import FilePager
+from wal import WriteAheadLog
+
+
+class Table:
+    """Tabela de registros (dicionários) com chave primária e índices secundários.
+
+    A árvore primária mapeia a chave primária para o registro. Cada índice
+    secundário é uma BPlusTree cujas chaves são o valor do campo seguido
+    da chave primária, ambos codificados com os codecs de keys.py, de modo
+    que valores repetidos convivem no índice e uma busca por valor vira
+    uma varredura por prefixo.
+
+    Cada árvore tem o seu próprio WAL, então as alterações são ordenadas
+    para que uma queda no meio nunca deixe um registro sem as suas
+    entradas de índice: entradas novas são gravadas antes do registro e as
+    antigas só são removidas depois dele. Entradas que sobrarem de uma
+    queda são ignoradas nas buscas, que sempre conferem o campo no registro.
+
+    As chaves dos índices têm o tamanho do valor do campo; um registro cujo
+    valor passa do max_key_size das árvores (que cresce com page_size) é
+    recusado com ValueError antes de qualquer gravação.
+    """
+
+    def __init__(self, directory='database/table', primary_key='id',
+                 indexes=None, key_codec=None, t=32, wal=True,
+                 page_size=None, **options):
+        """indexes mapeia o nome de cada campo indexado para o codec dos seus valores.
+
+        page_size é o tamanho das páginas de árvores novas (por padrão o
+        menor que comporta t); árvores já existentes mantêm o seu.
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.primary_key = primary_key
+        self.key_codec = key_codec
+        self.page_size = page_size or FilePager.page_size_for(t)
+        # As entradas dos índices terminam com a chave primária em bytes
+        self._pk_codec = key_codec or IntKey()
+        self.primary = self._open_tree('primary', t, wal, key_codec, options)
+        self.codecs = dict(indexes or {})
+        self.indexes = {field: self._open_tree(f'index_{field}', t, wal,
+                                               BytesKey(), options)
+                        for field in self.codecs}
+        self.lock = threading.RLock()
+
+    def _open_tree(self, name, t, wal, key_codec, options):
+        path = os.path.join(self.directory, name)
+        return BPlusTree(t, pager=FilePager(path + '.db', self.page_size),
+                         wal=WriteAheadLog(path + '.wal') if wal else None,
+                         key_codec=key_codec, **options)
+
+    def _index_key(self, field, value, pk):
+        return self.codecs[field].encode_part(value) + self._pk_codec.encode(pk)
+
+    def _index_entries(self, record, pk):
+        """Entradas (campo, chave do índice) de um registro; campos ausentes ou None ficam de fora."""
+        return {(field, self._index_key(field, record[field], pk))
+                for field in self.indexes if record.get(field) is not None}
+
+    def _check_keys(self, pk, entries):
+        """Recusa um registro cuja chave primária ou entrada de índice não cabe nas árvores."""
+        keys = [(self.primary_key, self.primary, self.primary._encode(pk))]
+        keys += [(field, self.indexes[field], key) for field, key in entries]
+        for field, tree, key in keys:
+            if tree.max_key_size is not None and len(key) > tree.max_key_size:
+                raise ValueError(
+                    f'O campo {field!r} ocupa {len(key)} bytes no índice, '
+                    f'mais que o limite de {tree.max_key_size}; use um '
+                    f'page_size maior ou um t menor')
+
+    def _apply(self, add, remove):
+        """Insere as entradas add e remove as entradas remove dos índices."""
+        done = []
+        try:
+            for field, key in add:
+                index = self.indexes[field]
+                # A entrada pode ter sobrado de uma queda
+                if index.search(key) is None:
+                    index.insert(key)
+                    done.append((field, key))
+        except Exception:
+            # Desfaz as entradas já inseridas antes de propagar o erro
+            for field, key in done:
+                self.indexes[field].delete(key)
+            raise
+        for field, key in remove:
+            self.indexes[field].delete(key)
+
+    def insert(self, record):
+        """Insere um registro novo; a chave primária não pode existir ainda."""
+        pk = record[self.primary_key]
+        with self.lock:
+            if self.primary.search(pk) is not None:
+                raise KeyError(f'Chave primária já existe: {pk!r}')
+            entries = self._index_entries(record, pk)
+            self._check_keys(pk, entries)
+            self._apply(entries, ())
+            try:
+                self.primary.insert(pk, record)
+            except Exception:
+                self._apply((), entries)
+                raise
+
+    def get(self, pk, default=None):
+        """Retorna o registro com a chave primária pk."""
+        return self.primary.get(pk, default)
+
+    def update(self, record):
+        """Substitui o registro com a mesma chave primária; retorna False se ele não existe."""
+        pk = record[self.primary_key]
+        with self.lock:
+            old = self.primary.get(pk)
+            if old is None:
+                return False
+            old_entries = self._index_entries(old, pk)
+            new_entries = self._index_entries(record, pk)
+            self._check_keys(pk, new_entries - old_entries)
+            self._apply(new_entries - old_entries, ())
+            self.primary.update(pk, value=record)
+            self._apply((), old_entries - new_entries)
+            return True
+
+    def delete(self, pk):
+        """Remove o registro com a chave primária pk; retorna False se ele não existe."""
+        with self.lock:
+            old = self.primary.get(pk)
+            if old is None:
+                return False
+            self.primary.delete(pk)
+            self._apply((), self._index_entries(old, pk))
+            return True
+
+    @staticmethod
+    def _prefix_end(prefix):
+        """Menor sequência de bytes maior que todas as que começam com prefix."""
+        end = bytearray(prefix)
+        while end and end[-1] == 0xff:
+            end.pop()
+        if not end:
+            return None
+        end[-1] += 1
+        return bytes(end)
+
+    def _index_scan(self, field, lo, hi):
+        """Gera as chaves primárias cujo campo está em [lo, hi) pela ordem do índice."""
+        codec = self.codecs[field]
+        for key, _ in self.indexes[field].range(lo, hi):
+            _, pos = codec.decode_part(key, 0)
+            yield self._pk_codec.decode(key[pos:])
+
+    def _matching(self, pks, conditions):
+        for pk in pks:
+            record = self.primary.get(pk)
+            # Confere todos os campos, inclusive o do índice (veja a classe)
+            if record is not None and all(record.get(field) == value
+                                          for field, value in
+                                          conditions.items()):
+                yield record
+
+    def find(self, **conditions):
+        """Retorna os registros cujos campos têm os valores dados.
+
+        Usa a chave primária se ela está entre as condições, senão o
+        primeiro campo indexado delas; sem nenhum dos dois, percorre a
+        tabela inteira.
+        """
+        return list(self._find(conditions))
+
+    def _find(self, conditions):
+        if self.primary_key in conditions:
+            return self._matching([conditions[self.primary_key]], conditions)
+        for field in self.indexes:
+            value = conditions.get(field)
+            if value is not None:
+                prefix = self.codecs[field].encode_part(value)
+                pks = self._index_scan(field, prefix, self._prefix_end(prefix))
+                return self._matching(pks, conditions)
+        return (record for _, record in self.primary.items()
+                if all(record.get(field) == value
+                       for field, value in conditions.items()))
+
+    def find_range(self, field, lo=None, hi=None):
+        """Gera os registros com lo <= campo < hi, na ordem do campo."""
+        if field == self.primary_key:
+            return (record for _, record in self.primary.range(lo, hi))
+        if field not in self.indexes:
+            raise KeyError(f'Campo sem índice: {field!r}')
+        codec = self.codecs[field]
+        pks = self._index_scan(
+            field, None if lo is None else codec.encode_part(lo),
+            None if hi is None else codec.encode_part(hi))
+        return (record for record in self._matching(pks, {})
+                if self._in_range(record.get(field), lo, hi))
+
+    @staticmethod
+    def _in_range(value, lo, hi):
+        return value is not None and (lo is None or value >= lo) and \
+            (hi is None or value < hi)
+
+    def flush(self):
+        for tree in (self.primary, *self.indexes.values()):
+            tree.flush()
+
+    def close(self):
+        for tree in (self.primary, *self.indexes.values()):
+            tree.close()
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_btree import AsyncBTree  # noqa: E402
+from bplustree import BPlusTree  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+
+
+class AsyncBTreeTest(TreeTestCase):
+    def test_requires_concurrent_tree(self):
+        with self.assertRaises(ValueError):
+            AsyncBTree(self.open_tree())
+
+    def test_operations(self):
+        async def run(db):
+            await db.insert_many([(k, f'valor-{k}') for k in range(200)],
+                                 pairs=True)
+            await db.insert(500, 'quinhentos')
+            self.assertEqual(await db.get(500), 'quinhentos')
+            self.assertEqual(await db.get(1000, 'nada'), 'nada')
+            self.assertIsNotNone(await db.search(7))
+            await db.update(7, value='sete')
+            self.assertEqual(await db.get(7), 'sete')
+            self.assertTrue(await db.delete(8))
+            self.assertIsNone(await db.search(8))
+
+            # Leituras e escritas em paralelo: as escritas seguem a ordem pedida
+            values = await asyncio.gather(
+                *(db.get(k) for k in range(100)),
+                *(db.insert(k) for k in range(1000, 1050)))
+            self.assertEqual(values[7], 'sete')
+            self.assertIsNone(values[8])
+            self.assertEqual(values[9], 'valor-9')
+
+            pairs = [pair async for pair in db.range(10, 700)]
+            self.assertEqual(len(pairs), 191)
+            self.assertEqual(pairs[-1], (500, 'quinhentos'))
+            await db.close()
+
+        tree = self.open_tree(BPlusTree, t=3, concurrent=True, cache_size=10)
+        db = AsyncBTree(tree)
+        # Com RANGE_BATCH pequeno range() lê vários lotes
+        db.RANGE_BATCH = 16
+        asyncio.run(run(db))
+
+        tree = self.open_tree(BPlusTree, t=3)
+        self.assertEqual(len(tree), 250)
+        self.assertEqual(tree.get(7), 'sete')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bplustree import BPlusTree  # noqa: E402
+from btree import BTree  # noqa: E402
+from keys import StrKey  # noqa: E402
+from pager import FilePager  # noqa: E402
+from wal import WriteAheadLog  # noqa: E402
+
+
+class TreeTestCase(unittest.TestCase):
+    """Abre árvores em um diretório temporário apagado ao fim de cada teste."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.trees = []
+
+    def tearDown(self):
+        for tree in self.trees:
+            if not tree.pager.file.closed:
+                tree.close()
+        shutil.rmtree(self.directory)
+
+    def open_tree(self, cls=BTree, t=3, wal=False, name='btree', **options):
+        path = os.path.join(self.directory, name)
+        tree = cls(t, pager=FilePager(path + '.db'),
+                   wal=WriteAheadLog(path + '.wal') if wal else None,
+                   **options)
+        self.trees.append(tree)
+        return tree
+
+
+class EmptyTreeTest(TreeTestCase):
+    def test_delete_everything_then_reuse(self):
+        for cls in (BTree, BPlusTree):
+            for wal in (False, True):
+                with self.subTest(cls=cls.__name__, wal=wal):
+                    tree = self.open_tree(cls, wal=wal,
+                                          name=f'{cls.__name__}_{wal}')
+                    keys = list(range(50))
+                    tree.insert_many(keys)
+                    for k in keys:
+                        self.assertIsNot(tree.delete(k), False)
+                    self.assertIsNone(tree.root)
+                    self.assertEqual(len(tree), 0)
+
+                    # Com a raiz vazia, insert e delete voltam a funcionar
+                    self.assertFalse(tree.delete(7))
+                    tree.insert(7, 'sete')
+                    self.assertEqual(tree.get(7), 'sete')
+                    self.assertIsNone(tree.delete(7))
+                    self.assertIsNone(tree.search(7))
+                    self.assertFalse(tree.delete(7))
+
+                    tree.insert(1)
+                    tree.insert(2)
+                    self.assertEqual(len(tree), 2)
+                    self.assertTrue(tree.delete(1))
+                    self.assertIsNotNone(tree.search(2))
+
+
+class PageSizeTest(TreeTestCase):
+    def test_full_node_must_fit_in_page(self):
+        path = os.path.join(self.directory, 'btree.db')
+        pager = FilePager(path)
+        with self.assertRaises(ValueError):
+            BTree(300, pager=pager)
+        self.assertEqual(pager.page_count, 1)  # Nada foi gravado
+        pager.close()
+        os.remove(path)
+
+        tree = BTree(300, pager=FilePager(
+            path, page_size=FilePager.page_size_for(300)))
+        self.trees.append(tree)
+        tree.insert_many(range(5000))
+        tree.flush()
+        self.assertEqual(len(tree), 5000)
+        self.assertIsNotNone(tree.search(4321))
+
+    def test_key_size_limit(self):
+        tree = self.open_tree(BPlusTree, t=32, wal=True, key_codec=StrKey())
+        self.assertEqual(tree.max_key_size, 111)
+        tree.insert('a' * 111, 'cabe')
+        for insert in (lambda: tree.insert('b' * 200, 'grande'),
+                       lambda: tree.insert_many([('c', 1), ('d' * 200, 2)],
+                                                pairs=True),
+                       lambda: tree.update('a' * 111, 'e' * 200)):
+            with self.assertRaises(ValueError):
+                insert()
+        self.assertEqual(len(tree), 1)
+        tree.close()
+
+        tree = self.open_tree(BPlusTree, t=32, wal=True, key_codec=StrKey())
+        self.assertEqual(tree.get('a' * 111), 'cabe')
+        self.assertIsNone(tree.get('c'))
+
+
+class RecordTest(TreeTestCase):
+    def test_update_keeps_old_record_until_checkpoint(self):
+        tree = self.open_tree(wal=True)
+        tree.insert(0, 'a')
+        tree.insert(1, 'b')
+        node, i = tree.search(0)
+        old_rid = node.values[i]
+        # O valor maior não cabe no slot antigo
+        tree.update(0, value='x' * 5000)
+        node, i = tree.search(0)
+        self.assertNotEqual(node.values[i], old_rid)
+        self.assertIsNotNone(tree.records.read(old_rid))
+        tree.insert(2, 'c')
+        self.assertEqual(tree.get(1), 'b')
+
+        tree.checkpoint()
+        self.assertIsNone(tree.records.read(old_rid))
+        self.assertEqual(tree.get(0), 'x' * 5000)
+        self.assertEqual(tree.get(2), 'c')
+
+
+class FilterTest(TreeTestCase):
+    def test_filter_reopened_after_change_without_it(self):
+        tree = self.open_tree(filter_fp_rate=0.01)
+        tree.insert(1, 'um')
+        tree.close()
+
+        # Aberta sem o filtro, a árvore ganha uma chave que ele não conhece
+        tree = self.open_tree()
+        tree.insert(999, 'novecentos')
+        tree.close()
+
+        tree = self.open_tree(filter_fp_rate=0.01)
+        self.assertIsNotNone(tree.search(999))
+        self.assertEqual(tree.get(999), 'novecentos')
+        self.assertEqual(tree.get(1), 'um')
+        self.assertTrue(tree.delete(999))
+        self.assertIsNone(tree.search(999))
+
+    def test_filter_persisted_across_close(self):
+        tree = self.open_tree(filter_fp_rate=0.01)
+        tree.insert_many(range(0, 2000, 2))
+        tree.delete(10)
+        tree.close()
+
+        tree = self.open_tree(filter_fp_rate=0.01)
+        for k in range(0, 2000, 2):
+            self.assertEqual(tree.search(k) is not None, k != 10)
+        self.assertIsNone(tree.search(11))
+        tree.insert(11)
+        self.assertIsNotNone(tree.search(11))
+
+
+class MetadataTest(TreeTestCase):
+    def test_key_count_persisted(self):
+        for cls in (BTree, BPlusTree):
+            for wal in (False, True):
+                with self.subTest(cls=cls.__name__, wal=wal):
+                    name = f'{cls.__name__}_{wal}'
+                    tree = self.open_tree(cls, t=4, wal=wal, name=name)
+                    tree.insert_many(range(5000))
+                    tree.delete(7)
+                    tree.close()
+                    self.assertEqual(tree.pager.load_meta()['keys'], 4999)
+
+                    tree = self.open_tree(cls, t=4, wal=wal, name=name)
+                    reads = tree.pager.pages_read
+                    self.assertEqual(len(tree), 4999)
+                    self.assertEqual(tree.pager.pages_read, reads)
+
+    def test_warm_up_reloads_hot_nodes(self):
+        tree = self.open_tree(t=4, cache_size=50)
+        tree.insert_many(range(5000))
+        for k in range(100, 200):
+            tree.search(k)
+        tree.close()
+
+        tree = self.open_tree(t=4, cache_size=50)
+        self.assertEqual(len(tree), 5000)
+        self.assertGreater(tree.warm_up(), 0)
+        reads = tree.pager.pages_read
+        for k in range(100, 200):
+            self.assertIsNotNone(tree.search(k))
+        self.assertEqual(tree.pager.pages_read, reads)
+
+
+if __name__ == '__main__':
+    unittest.main()
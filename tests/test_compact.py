@@ -0,0 +1,88 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bplustree import BPlusTree  # noqa: E402
+from btree import BTree  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+
+
+class CompactTest(TreeTestCase):
+    def sparse_tree(self, cls=BTree, **options):
+        """Árvore que ficou com poucas chaves por nó depois de muitas remoções."""
+        tree = self.open_tree(cls, t=4, min_fill=0.1, **options)
+        tree.insert_many([(k, f'v{k}') for k in range(1500)], pairs=True)
+        for k in range(1500):
+            if k % 5:
+                tree.delete(k)
+        return tree
+
+    def assert_contents(self, tree):
+        self.assertEqual(len(tree), 300)
+        for k in range(1500):
+            self.assertEqual(tree.get(k), f'v{k}' if k % 5 == 0 else None)
+
+    def test_compact_repacks_sparse_nodes(self):
+        for cls in (BTree, BPlusTree):
+            for wal in (False, True):
+                with self.subTest(cls=cls.__name__, wal=wal):
+                    tree = self.sparse_tree(cls, wal=wal,
+                                            name=f'{cls.__name__}_{wal}')
+                    before = tree.stats()
+                    self.assertLess(before['avg_fill'], 0.5)
+
+                    summary = tree.compact(fill_factor=0.9)
+                    self.assertTrue(summary['done'])
+                    self.assertGreater(summary['merged'], 0)
+                    after = tree.stats()
+                    self.assertGreater(after['avg_fill'], 0.6)
+                    self.assertLess(after['nodes'], before['nodes'])
+                    self.assertLess(after['leaves'], before['leaves'] / 2)
+                    self.assertGreater(after['free_pages'], 0)
+                    self.assert_contents(tree)
+                    if cls is BPlusTree:
+                        self.assertEqual([k for k, _ in tree.items()],
+                                         list(range(0, 1500, 5)))
+
+                    tree.close()
+                    tree = self.open_tree(cls, t=4, wal=wal,
+                                          name=f'{cls.__name__}_{wal}')
+                    self.assert_contents(tree)
+
+    def test_steps_interleaved_with_writes(self):
+        tree = self.sparse_tree(BPlusTree)
+        summary = tree.compact(max_steps=2)
+        self.assertFalse(summary['done'])
+        self.assertEqual(summary['steps'], 2)
+
+        steps = tree.compact_steps()
+        next(steps)
+        tree.insert(1501, 'v1501')
+        tree.delete(5)
+        for _ in steps:
+            tree.search(10)
+        self.assertEqual(tree.get(1501), 'v1501')
+        self.assertIsNone(tree.get(5))
+        self.assertEqual(len(tree), 300)
+
+    def test_orphan_pages(self):
+        tree = self.open_tree()
+        tree.insert_many(range(100))
+        tree.flush()
+        # Página alocada e nunca ligada à árvore, como após uma queda
+        orphan = tree.pager.allocate()
+        self.assertEqual(tree.stats()['orphan_pages'], 1)
+        self.assertEqual(tree.compact()['orphans'], 1)
+        self.assertEqual(tree.stats()['orphan_pages'], 0)
+        self.assertIn(orphan, tree.pager.free_pages())
+
+    def test_invalid_fill_factor(self):
+        tree = self.open_tree()
+        with self.assertRaises(ValueError):
+            tree.compact(fill_factor=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bplustree import BPlusTree  # noqa: E402
+from btree import BTree  # noqa: E402
+from pager import FilePager  # noqa: E402
+
+
+class ConcurrentReadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open_tree(self, cls):
+        path = os.path.join(self.directory, cls.__name__ + '.db')
+        return cls(4, pager=FilePager(path), concurrent=True)
+
+    def churn(self, tree, rounds):
+        """Remove e reinsere chaves, reaproveitando os slots dos registros."""
+        for n in range(rounds):
+            k = n % 100
+            tree.delete(k)
+            tree.insert(1000 + n, f'valor-de-{1000 + n}')
+            tree.delete(1000 + n)
+            tree.insert(k, f'valor-de-{k}')
+            tree.update(k, value=f'valor-de-{k}' + '!' * (n % 50))
+
+    def run_readers(self, tree, read):
+        errors = []
+        done = threading.Event()
+
+        def reader():
+            while not done.is_set():
+                try:
+                    read(errors)
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        threads = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        try:
+            self.churn(tree, 1500)
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+
+    def test_get_never_returns_another_keys_value(self):
+        for cls in (BTree, BPlusTree):
+            with self.subTest(cls=cls.__name__):
+                tree = self.open_tree(cls)
+                tree.insert_many([(k, f'valor-de-{k}') for k in range(100)],
+                                 pairs=True)
+
+                def read(errors):
+                    for k in range(100):
+                        value = tree.get(k)
+                        if value is not None and \
+                                not value.startswith(f'valor-de-{k}'):
+                            errors.append((k, value))
+
+                self.run_readers(tree, read)
+                tree.close()
+
+    def test_range_never_returns_another_keys_value(self):
+        tree = self.open_tree(BPlusTree)
+        tree.insert_many([(k, f'valor-de-{k}') for k in range(100)],
+                         pairs=True)
+
+        def read(errors):
+            for k, value in tree.range(0, 100):
+                if value is not None and not value.startswith(f'valor-de-{k}'):
+                    errors.append((k, value))
+            for k, value in tree.range(10, 90, reverse=True):
+                if not 10 <= k < 90:
+                    errors.append((k, 'fora do intervalo'))
+
+        self.run_readers(tree, read)
+        tree.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import CuckooFilter  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+
+
+class CuckooFilterTest(unittest.TestCase):
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        flt = CuckooFilter(5000, fp_rate=0.01)
+        for k in range(5000):
+            self.assertTrue(flt.add(k))
+        self.assertTrue(all(k in flt for k in range(5000)))
+        false_positives = sum(k in flt for k in range(10 ** 6, 10 ** 6 + 20000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_bytes_keys_and_remove(self):
+        flt = CuckooFilter(100)
+        keys = [f'chave-{i}'.encode() for i in range(80)]
+        for key in keys:
+            flt.add(key)
+        for key in keys[:40]:
+            self.assertTrue(flt.remove(key))
+        self.assertEqual(flt.count, 40)
+        self.assertTrue(all(key in flt for key in keys[40:]))
+        self.assertLess(sum(key in flt for key in keys[:40]), 5)
+
+    def test_full_filter_keeps_existing_keys(self):
+        flt = CuckooFilter(64)
+        added = [k for k in range(10 * flt.capacity) if flt.add(k)]
+        self.assertLess(len(added), 10 * flt.capacity)
+        self.assertTrue(all(k in flt for k in added))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'btree.filter')
+        flt = CuckooFilter(1000, fp_rate=0.001)
+        for k in range(700):
+            flt.add(k)
+        flt.save(path)
+
+        loaded = CuckooFilter.load(path, 0.001)
+        self.assertEqual(loaded.count, 700)
+        self.assertEqual(loaded.slots, flt.slots)
+        # Outra taxa muda o tamanho das impressões: o arquivo não serve
+        self.assertIsNone(CuckooFilter.load(path, 0.1))
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 1)
+        self.assertIsNone(CuckooFilter.load(path, 0.001))
+        CuckooFilter.discard(path)
+        self.assertIsNone(CuckooFilter.load(path, 0.001))
+
+
+class TreeFilterTest(TreeTestCase):
+    def test_negative_lookups_skip_the_tree(self):
+        tree = self.open_tree(filter_fp_rate=0.001, cache_size=4)
+        tree.insert_many(range(0, 4000, 2))
+        tree.flush()
+        reads = tree.pager.pages_read
+        misses = sum(tree.search(k) is None for k in range(1, 4000, 2))
+        self.assertEqual(misses, 2000)
+        # Só os falsos positivos descem pela árvore
+        self.assertLess(tree.pager.pages_read - reads, 100)
+
+    def test_filter_follows_deletes_and_growth(self):
+        tree = self.open_tree(filter_fp_rate=0.01)
+        # Mais chaves que a capacidade inicial: o filtro é refeito maior
+        tree.insert_many(range(5000))
+        for k in range(0, 5000, 2):
+            tree.delete(k)
+        self.assertTrue(all(tree.search(k) is not None
+                            for k in range(1, 5000, 2)))
+        self.assertIsNone(tree.search(2))
+        tree.insert(2)
+        self.assertIsNotNone(tree.search(2))
+
+        tree.close()
+        tree = self.open_tree(filter_fp_rate=0.01)
+        self.assertTrue(all(tree.search(k) is not None
+                            for k in range(1, 5000, 2)))
+        self.assertEqual(len(tree), 2501)
+
+
+if __name__ == '__main__':
+    unittest.main()
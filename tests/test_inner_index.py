@@ -0,0 +1,76 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bplustree import BPlusTree  # noqa: E402
+from btree import BTree  # noqa: E402
+from keys import StrKey  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+
+
+class InnerIndexTest(TreeTestCase):
+    def test_lookups_follow_changes(self):
+        rng = random.Random(7)
+        for cls in (BTree, BPlusTree):
+            with self.subTest(cls=cls.__name__):
+                tree = self.open_tree(cls, inner_index=True, cache_size=8,
+                                      name=cls.__name__)
+                present = set()
+                for _ in range(30):
+                    for k in rng.sample(range(3000), 100):
+                        if k in present:
+                            tree.delete(k)
+                            present.discard(k)
+                        else:
+                            tree.insert(k, k * 2)
+                            present.add(k)
+                    # Inclui as chaves que são separadores dos nós internos
+                    for k in rng.sample(range(3000), 300):
+                        self.assertEqual(tree.search(k) is not None,
+                                         k in present)
+                        self.assertEqual(tree.get(k),
+                                         k * 2 if k in present else None)
+                self.assertGreater(tree._inner.rebuilds, 1)
+
+    def test_only_the_leaf_is_read(self):
+        tree = self.open_tree(BPlusTree, inner_index=True, cache_size=4)
+        tree.insert_many(range(5000))
+        self.assertGreaterEqual(tree.height(), 4)
+        tree.search(0)
+        rebuilds = tree._inner.rebuilds
+        for k in range(0, 5000, 97):
+            reads = tree.pager.pages_read
+            self.assertIsNotNone(tree.search(k))
+            self.assertLessEqual(tree.pager.pages_read - reads, 1)
+        self.assertEqual(tree._inner.rebuilds, rebuilds)
+
+    def test_value_updates_keep_the_copy(self):
+        tree = self.open_tree(inner_index=True, metrics=True)
+        tree.insert_many(range(500))
+        tree.search(1)
+        rebuilds = tree._inner.rebuilds
+        for k in range(0, 500, 7):
+            tree.update(k, value=f'v{k}')
+        self.assertEqual(tree.get(70), 'v70')
+        self.assertEqual(tree._inner.rebuilds, rebuilds)
+        values = tree.metrics.snapshot()['values']
+        self.assertEqual(values['inner_index_rebuilds_total'], rebuilds)
+
+    def test_string_keys(self):
+        tree = self.open_tree(BPlusTree, inner_index=True,
+                              key_codec=StrKey())
+        words = [f'w{i:05}' for i in range(0, 4000, 3)]
+        tree.insert_many(words)
+        self.assertTrue(all(tree.search(w) is not None for w in words))
+        self.assertIsNone(tree.search('w00001'))
+
+    def test_not_with_concurrent(self):
+        with self.assertRaises(ValueError):
+            self.open_tree(inner_index=True, concurrent=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
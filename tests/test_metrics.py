@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+import unittest
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Histogram, Metrics, NullMetrics  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+
+
+class HistogramTest(unittest.TestCase):
+    def test_quantiles_and_buckets(self):
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.observe(2e-6)
+        for _ in range(10):
+            histogram.observe(0.3)
+        self.assertAlmostEqual(histogram.quantile(0.5), 2.5e-6)
+        self.assertEqual(histogram.quantile(0.99), 0.5)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 100)
+        self.assertEqual(snapshot['buckets'][-1], ['+Inf', 100])
+        counts = [count for _, count in snapshot['buckets']]
+        self.assertEqual(counts, sorted(counts))
+
+
+class TreeMetricsTest(TreeTestCase):
+    def test_disabled_by_default(self):
+        tree = self.open_tree()
+        self.assertIsInstance(tree.metrics, NullMetrics)
+        self.assertEqual(tree.metrics.snapshot(), {})
+
+    def test_counters_and_tracer(self):
+        traces = []
+        metrics = Metrics(tracer=lambda *trace: traces.append(trace))
+        tree = self.open_tree(metrics=metrics, cache_size=4)
+        for k in range(200):
+            tree.insert(k)
+        for k in range(150):
+            tree.delete(k)
+
+        values = metrics.snapshot()['values']
+        self.assertGreater(values['splits_total'], 0)
+        self.assertGreater(values['append_splits_total'], 0)
+        self.assertGreater(values['merges_total'], 0)
+        self.assertGreater(values['evictions_total'], 0)
+        self.assertEqual(values['height'], tree.height())
+        operations = metrics.snapshot()['operations']
+        self.assertEqual(operations['insert']['count'], 200)
+        self.assertEqual(operations['delete']['count'], 150)
+
+        self.assertEqual(len(traces), 350)
+        name, seconds, details = traces[0]
+        self.assertEqual(name, 'insert')
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(details['merges'], 0)
+        self.assertTrue(any(details['splits'] for _, _, details
+                            in traces))
+
+    def test_exports(self):
+        tree = self.open_tree(metrics=True)
+        tree.insert_many(range(100))
+        tree.search(5)
+
+        data = json.loads(tree.metrics.to_json())
+        self.assertIn('search', data['operations'])
+        text = tree.metrics.to_prometheus()
+        self.assertIn('# TYPE btree_splits_total counter\n', text)
+        self.assertIn('# TYPE btree_height gauge\n', text)
+        self.assertIn('btree_operation_seconds_count{op="search"} 1\n', text)
+
+        server = tree.metrics.serve(port=0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        with urllib.request.urlopen(url + '/metrics') as response:
+            self.assertIn('btree_splits_total', response.read().decode())
+        with urllib.request.urlopen(url + '/metrics.json') as response:
+            self.assertIn('values', json.loads(response.read()))
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + '/outro')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bplustree import BPlusTree  # noqa: E402
+from btree import BTree  # noqa: E402
+from btree_node import BTreeNode, LazyNode  # noqa: E402
+from keys import StrKey  # noqa: E402
+from pager import MmapPager  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+
+
+class MmapPagerTest(TreeTestCase):
+    def open_mmap(self, cls=BTree, t=3, name='btree', **options):
+        pager = MmapPager(os.path.join(self.directory, name + '.db'))
+        tree = cls(t, pager=pager, **options)
+        self.trees.append(tree)
+        return tree
+
+    def test_reads_match_writer(self):
+        for cls in (BTree, BPlusTree):
+            with self.subTest(cls=cls.__name__):
+                name = cls.__name__
+                tree = self.open_tree(cls, name=name)
+                tree.insert_many([(k, f'valor-{k}') for k in range(0, 600, 2)],
+                                 pairs=True)
+                tree.insert(1)  # Chave sem registro
+                tree.close()
+
+                replica = self.open_mmap(cls, name=name)
+                self.assertTrue(replica.pager.read_only)
+                self.assertIsInstance(replica.root, LazyNode)
+                self.assertEqual(len(replica), 301)
+                for k in range(0, 600, 2):
+                    self.assertEqual(replica.get(k), f'valor-{k}')
+                self.assertIsNotNone(replica.search(1))
+                self.assertIsNone(replica.get(1))
+                self.assertIsNone(replica.search(3))
+                if cls is BPlusTree:
+                    self.assertEqual([k for k, _ in replica.range(10, 20)],
+                                     [10, 12, 14, 16, 18])
+                with self.assertRaises(ValueError):
+                    replica.insert(3)
+
+    def test_string_keys(self):
+        tree = self.open_tree(BPlusTree, key_codec=StrKey())
+        words = [f'palavra-{i:04}' for i in range(500)]
+        tree.insert_many(words)
+        tree.close()
+
+        replica = self.open_mmap(BPlusTree, key_codec=StrKey())
+        self.assertEqual([k for k, _ in replica.items()], words)
+        self.assertIsNotNone(replica.search('palavra-0123'))
+        self.assertIsNone(replica.search('palavra'))
+
+    def test_missing_file(self):
+        with self.assertRaises(ValueError):
+            MmapPager(os.path.join(self.directory, 'nada.db'))
+
+
+class LazyNodeTest(unittest.TestCase):
+    def test_matches_eager_decoding(self):
+        node = BTreeNode(leaf=False, node_id=7)
+        node.keys = BTreeNode.int_array([3, 9, 27])
+        node.values = BTreeNode.int_array([11, 0, 13])
+        node.children = BTreeNode.int_array([2, 4, 6, 8])
+        node.next_leaf = 5
+        lazy = LazyNode.from_view(node.to_bytes(), 7)
+        eager = BTreeNode.from_bytes(node.to_bytes(), 7)
+        for decoded in (lazy, eager):
+            self.assertEqual(list(decoded.keys), [3, 9, 27])
+            self.assertEqual(list(decoded.values), [11, 0, 13])
+            self.assertEqual(list(decoded.children), [2, 4, 6, 8])
+            self.assertFalse(decoded.leaf)
+            self.assertEqual(decoded.next_leaf, 5)
+
+    def test_leaf_without_records(self):
+        node = BTreeNode(leaf=True, node_id=1)
+        node.keys = [b'abc', b'abd', b'b']
+        lazy = LazyNode.from_view(node.to_bytes(), 1)
+        self.assertEqual(list(lazy.keys), [b'abc', b'abd', b'b'])
+        self.assertEqual(list(lazy.values), [0, 0, 0])
+        self.assertTrue(lazy.leaf)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharded import ShardedBTree  # noqa: E402
+
+
+class ShardedTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_failed_scatter_releases_shards(self):
+        tree = ShardedBTree(self.directory, shards=2, partition='range',
+                            boundaries=[50], processes=True)
+        try:
+            # O pedido à segunda partição falha ao ser enviado (o valor não
+            # pode ser serializado) depois que a primeira já o recebeu
+            with self.assertRaises(Exception):
+                tree.insert_many([(1, 'um'), (100, lambda: None)], pairs=True)
+            tree.insert_many([(2, 'dois'), (200, 'duzentos')], pairs=True)
+            self.assertEqual(tree.get(1), 'um')
+            self.assertEqual(tree.get(200), 'duzentos')
+            self.assertIsNone(tree.get(100))
+        finally:
+            tree.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
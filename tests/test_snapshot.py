@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bplustree import BPlusTree  # noqa: E402
+from btree import BTree  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+
+
+class SnapshotTest(TreeTestCase):
+    def test_isolation_from_later_writes(self):
+        for cls in (BTree, BPlusTree):
+            for wal in (False, True):
+                with self.subTest(cls=cls.__name__, wal=wal):
+                    tree = self.open_tree(cls, wal=wal, cache_size=8,
+                                          name=f'{cls.__name__}_{wal}')
+                    tree.insert_many([(k, f'v{k}') for k in range(300)],
+                                     pairs=True)
+                    expected = [(k, f'v{k}') for k in range(300)]
+
+                    with tree.snapshot() as snap:
+                        # Divisões, fusões, regravações e despejos do cache
+                        for k in range(0, 300, 2):
+                            tree.delete(k)
+                        for k in range(1, 300, 4):
+                            tree.update(k, value='novo' * 500)
+                        tree.insert_many(range(1000, 1400))
+
+                        self.assertEqual(list(snap.items()), expected)
+                        self.assertEqual(list(snap.range(10, 14)),
+                                         expected[10:14])
+                        self.assertEqual(list(snap.range(10, 14, reverse=True)),
+                                         expected[13:9:-1])
+                        self.assertEqual(snap.get(2), 'v2')
+                        self.assertEqual(snap.get(1), 'v1')
+                        self.assertNotIn(1000, snap)
+
+                    self.assertIsNone(tree.search(2))
+                    self.assertEqual(tree.get(1), 'novo' * 500)
+                    self.assertEqual(len(tree), 550)
+                    with self.assertRaises(ValueError):
+                        snap.get(1)
+
+    def test_snapshots_of_different_epochs(self):
+        tree = self.open_tree()
+        tree.insert(1, 'a')
+        first = tree.snapshot()
+        tree.update(1, value='b')
+        second = tree.snapshot()
+        tree.delete(1)
+        self.assertEqual(first.get(1), 'a')
+        self.assertEqual(second.get(1), 'b')
+        first.close()
+        self.assertEqual(second.get(1), 'b')
+        second.close()
+        self.assertIsNone(tree.get(1))
+
+    def test_reads_during_concurrent_writes(self):
+        tree = self.open_tree(BPlusTree, concurrent=True, cache_size=16)
+        tree.insert_many([(k, k) for k in range(500)], pairs=True)
+        snap = tree.snapshot()
+        errors = []
+
+        def reader():
+            for _ in range(5):
+                items = list(snap.items())
+                if items != [(k, k) for k in range(500)]:
+                    errors.append(len(items))
+
+        threads = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for k in range(500):
+            if k % 3:
+                tree.delete(k)
+            else:
+                tree.update(k, value=-k)
+        for k in range(500, 800):
+            tree.insert(k, k)
+        for thread in threads:
+            thread.join()
+        snap.close()
+        self.assertEqual(errors, [])
+        self.assertEqual(tree.get(3), -3)
+        self.assertIsNone(tree.get(4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keys import StrKey  # noqa: E402
+from table import Table  # noqa: E402
+
+
+class TableTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_oversized_index_value(self):
+        table = Table(self.directory, indexes={'name': StrKey()})
+        table.insert({'id': 1, 'name': 'curto'})
+        with self.assertRaisesRegex(ValueError, "'name'"):
+            table.insert({'id': 2, 'name': 'x' * 200})
+        with self.assertRaisesRegex(ValueError, "'name'"):
+            table.update({'id': 1, 'name': 'y' * 200})
+        self.assertIsNone(table.get(2))
+        self.assertEqual(table.find(name='curto'), [{'id': 1, 'name': 'curto'}])
+        table.close()
+
+        # Com páginas maiores o mesmo valor cabe no índice
+        directory = os.path.join(self.directory, 'grande')
+        table = Table(directory, indexes={'name': StrKey()}, page_size=16384)
+        table.insert({'id': 2, 'name': 'x' * 200})
+        table.flush()
+        self.assertEqual(len(table.find(name='x' * 200)), 1)
+        table.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
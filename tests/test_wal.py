@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+PACKAGE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE)
+
+from btree import BTree  # noqa: E402
+from pager import FilePager  # noqa: E402
+from test_btree import TreeTestCase  # noqa: E402
+from wal import WriteAheadLog  # noqa: E402
+
+
+class RecoveryTest(TreeTestCase):
+    def crash(self, body, **options):
+        """Executa body sobre a árvore em outro processo, que termina sem close()."""
+        code = textwrap.dedent(f'''
+            import os, sys
+            sys.path.insert(0, {PACKAGE!r})
+            from btree import BTree
+            from pager import FilePager
+            from wal import WriteAheadLog
+            path = os.path.join({self.directory!r}, 'btree')
+            tree = BTree(3, pager=FilePager(path + '.db'),
+                         wal=WriteAheadLog(path + '.wal'), **{options!r})
+        ''') + textwrap.dedent(body) + '\nos._exit(0)\n'
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+    def wal_path(self):
+        return os.path.join(self.directory, 'btree.wal')
+
+    def test_recovery_after_crash(self):
+        # Com cache pequeno os despejos gravam páginas entre os checkpoints
+        self.crash('''
+            for k in range(300):
+                tree.insert(k, f'valor-{k}')
+            for k in range(0, 300, 3):
+                tree.delete(k)
+            tree.update(1, value='x' * 3000)
+        ''', cache_size=5, checkpoint_bytes=20000)
+        self.assertGreater(os.path.getsize(self.wal_path()), 0)
+
+        tree = self.open_tree(wal=True)
+        expected = [k for k in range(300) if k % 3]
+        self.assertEqual(len(tree), len(expected))
+        for k in range(300):
+            self.assertEqual(tree.get(k), None if k % 3 == 0 else
+                             'x' * 3000 if k == 1 else f'valor-{k}')
+        # A recuperação termina com um checkpoint
+        self.assertEqual(os.path.getsize(self.wal_path()), 0)
+        tree.insert(1000, 'depois')
+        self.assertEqual(tree.get(1000), 'depois')
+
+    def test_incomplete_transaction_is_discarded(self):
+        self.crash('''
+            for k in range(100):
+                tree.insert(k)
+            tree.wal.sync()
+            size = tree.wal.size()
+            tree.insert(500)
+            with open(os.path.join(os.path.dirname(path), 'size'), 'w') as f:
+                f.write(str(size))
+        ''', cache_size=None)
+        # Corta o log no meio da última transação, como uma queda no fsync
+        with open(os.path.join(self.directory, 'size')) as f:
+            size = int(f.read())
+        with open(self.wal_path(), 'r+b') as f:
+            f.truncate(os.path.getsize(self.wal_path()) - 3)
+        self.assertGreater(os.path.getsize(self.wal_path()), size)
+
+        tree = self.open_tree(wal=True)
+        self.assertIsNone(tree.search(500))
+        for k in range(100):
+            self.assertIsNotNone(tree.search(k))
+        self.assertEqual(len(tree), 100)
+
+    def test_group_commit(self):
+        path = os.path.join(self.directory, 'btree')
+        wal = WriteAheadLog(path + '.wal', group_commit=10)
+        tree = BTree(3, pager=FilePager(path + '.db'), wal=wal)
+        self.trees.append(tree)
+        syncs = wal.syncs
+        for k in range(100):
+            tree.insert(k)
+        self.assertLessEqual(wal.syncs - syncs, 10)
+        tree.close()
+
+        tree = self.open_tree(wal=True)
+        self.assertEqual(len(tree), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+
+class WriteAheadLog:
+    """Log de escrita antecipada (WAL) com commit em grupo.
+
+    Cada operação da árvore vira uma transação com as imagens dos nós
+    alterados, os nós liberados e a nova raiz, terminada por um registro
+    de COMMIT. As transações são acrescentadas ao final do arquivo e só
+    as que chegaram completas ao disco são reaplicadas na recuperação.
+
+    Com group_commit=N o fsync é feito uma vez a cada N transações (ou
+    quando max_delay segundos se passaram desde a primeira pendente),
+    trocando uma pequena janela de perda por muito mais vazão.
+    """
+
+    # tipo do registro, tamanho do conteúdo, CRC32 do conteúdo
+    RECORD = struct.Struct('<BII')
+    # tamanho do identificador do nó dentro de um registro NODE
+    ID_SIZE = struct.Struct('<H')
+
+    NODE = 1
+    FREE = 2
+    ROOT = 3
+    COMMIT = 4
+    ALLOC = 5
+
+    def __init__(self, path='database/btree.wal', group_commit=1,
+                 max_delay=None):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.group_commit = group_commit
+        self.max_delay = max_delay
+        self.file = open(path, 'a+b')
+        self.unsynced = 0  # Transações gravadas e ainda sem fsync
+        self.first_unsynced_at = None
+        self.syncs = 0
+        self.bytes_written = 0
+        # sync() também pode ser chamado por leitores que despejam nós do cache
+        self.lock = threading.RLock()
+        # Chamado antes de cada fsync (ex.: gravar os registros referenciados)
+        self.before_sync = None
+
+    @staticmethod
+    def _encode_id(node_id):
+        return json.dumps(node_id).encode()
+
+    def _record(self, kind, payload):
+        return self.RECORD.pack(kind, len(payload), zlib.crc32(payload)) \
+            + payload
+
+    def log_transaction(self, nodes, frees, root, alloc=None):
+        """Acrescenta uma transação ao log.
+
+        nodes é uma lista de (node_id, bytes do nó), frees uma lista de
+        IDs liberados, root uma tupla (root_id,) quando a raiz mudou e
+        alloc o estado de alocação do pager ao fim da transação.
+        """
+        records = []
+        for node_id, data in nodes:
+            encoded_id = self._encode_id(node_id)
+            records.append(self._record(
+                self.NODE,
+                self.ID_SIZE.pack(len(encoded_id)) + encoded_id + data))
+        for node_id in frees:
+            records.append(self._record(self.FREE, self._encode_id(node_id)))
+        if root:
+            records.append(self._record(self.ROOT, self._encode_id(root[0])))
+        if alloc is not None:
+            records.append(self._record(self.ALLOC, json.dumps(alloc).encode()))
+        records.append(self._record(self.COMMIT, b''))
+
+        with self.lock:
+            data = b''.join(records)
+            self.file.write(data)
+            self.bytes_written += len(data)
+            self.unsynced += 1
+            if self.first_unsynced_at is None:
+                self.first_unsynced_at = time.monotonic()
+
+            if self.unsynced >= self.group_commit or (
+                    self.max_delay is not None and
+                    time.monotonic() - self.first_unsynced_at >= self.max_delay):
+                self.sync()
+
+    def sync(self):
+        """Força as transações pendentes para o disco (um único fsync)."""
+        with self.lock:
+            if not self.unsynced:
+                return
+            if self.before_sync is not None:
+                self.before_sync()
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+            self.first_unsynced_at = None
+            self.syncs += 1
+
+    def size(self):
+        """Retorna o tamanho atual do log em bytes."""
+        self.file.flush()
+        return os.path.getsize(self.path)
+
+    def replay(self):
+        """Gera as transações completas do log como (nós, liberados, raiz, alocação).
+
+        A leitura para no primeiro registro truncado ou corrompido; uma
+        transação sem COMMIT (interrompida por uma queda) é descartada.
+        """
+        self.file.flush()
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        nodes, frees, root, alloc = [], [], None, None
+        while offset + self.RECORD.size <= len(data):
+            kind, size, crc = self.RECORD.unpack_from(data, offset)
+            start = offset + self.RECORD.size
+            payload = data[start:start + size]
+            if len(payload) < size or zlib.crc32(payload) != crc:
+                break
+            offset = start + size
+
+            if kind == self.NODE:
+                id_size, = self.ID_SIZE.unpack_from(payload)
+                id_end = self.ID_SIZE.size + id_size
+                node_id = json.loads(payload[self.ID_SIZE.size:id_end])
+                nodes.append((node_id, payload[id_end:]))
+            elif kind == self.FREE:
+                frees.append(json.loads(payload))
+            elif kind == self.ROOT:
+                root = (json.loads(payload),)
+            elif kind == self.ALLOC:
+                alloc = json.loads(payload)
+            elif kind == self.COMMIT:
+                yield nodes, frees, root, alloc
+                nodes, frees, root, alloc = [], [], None, None
+            else:
+                break
+
+    def truncate(self):
+        """Descarta o log depois que um checkpoint gravou tudo no arquivo de dados."""
+        with self.lock:
+            self.file.flush()
+            self.file.truncate(0)
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+            self.first_unsynced_at = None
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()